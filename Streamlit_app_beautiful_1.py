@@ -5,8 +5,6 @@ Upload an image and transform your space with AI
 import streamlit as st
 import sys
 import os
-from PIL import Image
-import io
 from datetime import datetime
 
 # Fix UTF-8 encoding
@@ -18,8 +16,17 @@ if sys.platform == 'win32':
         sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
 
 # Import our agents
-from agents.visual_assessor import VisualAssessor
-from agents.project_coordinator import ProjectCoordinator
+import config
+from agents.pool import get_agent_pool
+from tools.compositor import get_compositor
+from tools.memory_profile import get_memory_profiler
+from tools.previews import preview_path
+from tools.upload_store import get_upload_store
+from pipeline import run_design_workflow
+
+# PROFILE_MEMORY=1 traces allocations from the first script run on (report in output/profiles/)
+if config.PROFILE_MEMORY:
+    get_memory_profiler()
 
 # Page config
 st.set_page_config(
@@ -185,63 +192,81 @@ if 'analysis_result' not in st.session_state:
     st.session_state.analysis_result = None
 if 'transformation_result' not in st.session_state:
     st.session_state.transformation_result = None
-if 'temp_image_path' not in st.session_state:
-    st.session_state.temp_image_path = None
+if 'upload_id' not in st.session_state:
+    st.session_state.upload_id = None
+
+# Display width in pixels - views show the smallest stored preview at least this wide
+PREVIEW_WIDTH = 768
+
+# Before/after views (label -> tools.compositor mode)
+COMPOSITE_MODES = {"Side by side": "side_by_side", "Wipe": "wipe", "Blend": "blend", "Difference": "diff"}
+
+@st.cache_resource
+def get_shared_agent_pool():
+    """Agent pool shared by every session; warm-up starts on the first script run"""
+    pool = get_agent_pool()
+    pool.warm_up(background=True)
+    return pool
+
+get_shared_agent_pool()
 
 def save_uploaded_file(uploaded_file):
-    """Save uploaded file to temp directory"""
+    """Store the upload by content hash - written once, however often the script reruns"""
     try:
-        temp_dir = os.path.join("temp", "uploads")
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_path = os.path.join(temp_dir, f"upload_{timestamp}_{uploaded_file.name}")
-        
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        return file_path
+        return get_upload_store().put(uploaded_file.getvalue(), uploaded_file.name)
     except Exception as e:
         st.error(f"❌ Error saving file: {str(e)}")
         return None
 
-def analyze_room(image_path):
-    """Analyze the uploaded room image"""
-    with st.spinner("🔍 Analyzing your room..."):
-        try:
-            assessor = VisualAssessor()
-            analysis = assessor.analyze(image_path)
-            
-            if "error" in analysis:
-                st.error(f"❌ Analysis failed: {analysis['error']}")
-                return None
-            
-            return analysis
-        except Exception as e:
-            st.error(f"❌ Error during analysis: {str(e)}")
-            return None
+def show_before_after(upload_id, image_path):
+    """Before/after composite of the uploaded photo and its rendering"""
+    if not upload_id or not image_path or not os.path.exists(image_path):
+        return
 
-def transform_room(analysis, design_prompt, design_style, budget_range, image_path):
-    """Generate transformation with custom prompt"""
-    with st.spinner("🎨 Creating your dream space..."):
-        try:
-            # Verify image path exists
-            if not os.path.exists(image_path):
-                st.error(f"❌ Reference image not found at: {image_path}")
-                return None
+    try:
+        mode_label = st.radio("Compare", list(COMPOSITE_MODES), horizontal=True, key="composite_mode")
+        mode = COMPOSITE_MODES[mode_label]
+        position = 0.5
+        if mode in ("wipe", "blend"):
+            position = st.slider("Original ← → Design", 0.0, 1.0, 0.5, 0.05, key="composite_position")
+
+        composite = get_compositor().compose(get_upload_store().load(upload_id), image_path, mode, position)
+        st.image(composite["image_path"], use_container_width=True)
+    except FileNotFoundError:
+        st.info("The original photo is no longer stored - upload it again to compare")
+    except Exception as e:
+        st.warning(f"⚠️ Could not build the comparison: {str(e)}")
 
-            st.info(f"📍 Using reference image: {image_path}")
+def design_room(upload_id, design_prompt, design_style, budget_range):
+    """Analyze the uploaded room and generate its transformation in one pipeline run"""
+    with st.spinner("🎨 Analyzing your room and creating your dream space..."):
+        try:
+            # Verify the upload is still stored
+            if not upload_id or get_upload_store().path(upload_id) is None:
+                st.error("❌ Reference image not found - please upload your photo again")
+                return None, None
 
-            coordinator = ProjectCoordinator()
+            room_image = get_upload_store().load(upload_id)
+            st.info(f"📍 Using reference image: {room_image.label}")
 
-            project_plan = coordinator.generate_project_plan(
-                room_analysis=analysis,
+            # Rendering runs alongside the assessment crew; the budget crew follows the rendering
+            workflow = run_design_workflow(
+                image_path=room_image,
                 design_style=design_style,
                 budget_range=budget_range,
-                reference_image=image_path
+                custom_prompt=design_prompt,
+                pool=get_shared_agent_pool()
             )
 
+            if workflow["analysis"] is None:
+                st.error(f"❌ Analysis failed: {workflow['errors'].get('analyze', 'Unknown error')}")
+                return None, None
+
+            for stage, error in workflow["errors"].items():
+                st.warning(f"⚠️ {stage.title()} step failed: {error}")
+
             # Validate the response
+            project_plan = workflow["project_plan"]
             if project_plan and "rendering" in project_plan:
                 rendering = project_plan["rendering"]
                 st.info(f"🎨 Rendering status: {'Success' if rendering.get('success') else 'Failed'}")
@@ -250,12 +275,12 @@ def transform_room(analysis, design_prompt, design_style, budget_range, image_pa
                     st.info(f"📁 Generated image path: {abs_path}")
                     st.info(f"✅ Image file exists: {os.path.exists(abs_path)}")
 
-            return project_plan
+            return workflow["analysis"], workflow["project_plan"]
         except Exception as e:
             st.error(f"❌ Error during transformation: {str(e)}")
             import traceback
             st.code(traceback.format_exc(), language="python")
-            return None
+            return None, None
 
 # Main App
 def main():
@@ -377,13 +402,12 @@ def main():
         )
         
         if uploaded_file is not None:
-            image = Image.open(uploaded_file)
-            st.image(image, use_container_width=True)
-            
-            image_path = save_uploaded_file(uploaded_file)
-            st.session_state.temp_image_path = image_path
+            # Store by content hash; the session only keeps the ID
+            upload_id = save_uploaded_file(uploaded_file)
+            st.session_state.upload_id = upload_id
             
-            if image_path:
+            if upload_id:
+                st.image(preview_path(get_upload_store().path(upload_id), PREVIEW_WIDTH), use_container_width=True)
                 st.success("✅ Image uploaded!")
     
     with col_right:
@@ -412,9 +436,8 @@ def main():
                     st.info("💡 The image may have been generated but the path is incorrect.")
                 else:
                     try:
-                        # Load and display image
-                        transformed_image = Image.open(image_path)
-                        st.image(transformed_image, use_container_width=True)
+                        # Display the column-sized preview; the download keeps full resolution
+                        st.image(preview_path(image_path, PREVIEW_WIDTH), use_container_width=True)
                         st.success("✅ Transformed image loaded successfully!")
 
                         # Download button
@@ -422,8 +445,8 @@ def main():
                             st.download_button(
                                 label="📥 Download Design",
                                 data=f,
-                                file_name=f"transformed_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-                                mime="image/png",
+                                file_name=f"transformed_{datetime.now().strftime('%Y%m%d_%H%M%S')}{os.path.splitext(image_path)[1]}",
+                                mime=rendering.get("mime_type") or "image/png",
                                 use_container_width=True
                             )
                     except Exception as e:
@@ -436,26 +459,29 @@ def main():
         else:
             st.info("✨ Your transformed design will appear here")
     
+    # Before / After
+    result_rendering = (st.session_state.transformation_result or {}).get("rendering", {})
+    if uploaded_file is not None and result_rendering.get("image_path"):
+        st.markdown("---")
+        st.markdown("**🔍 Before / After**")
+        show_before_after(st.session_state.upload_id, result_rendering["image_path"])
+    
     # Transform Button
     if uploaded_file is not None and custom_prompt.strip():
         st.markdown("---")
         
         if st.button("🎨 Transform My Space Now", type="primary", use_container_width=True):
-            # Analysis
-            analysis = analyze_room(st.session_state.temp_image_path)
+            # Analysis, assessment, rendering and budget plan
+            analysis, transformation = design_room(
+                st.session_state.upload_id,
+                custom_prompt,
+                design_style.lower(),
+                budget_range.lower()
+            )
             
             if analysis:
                 st.session_state.analysis_result = analysis
                 
-                # Transformation
-                transformation = transform_room(
-                    analysis,
-                    custom_prompt,
-                    design_style.lower(),
-                    budget_range.lower(),
-                    st.session_state.temp_image_path
-                )
-                
                 if transformation:
                     st.session_state.transformation_result = transformation
                     
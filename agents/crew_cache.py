@@ -0,0 +1,56 @@
+"""
+Crew Cache - Memoized CrewAI kickoffs
+Reuses a previous crew output when the same agent and LLM receive an identical task
+"""
+from crewai import Agent, Task
+from tools.cache import get_cache, make_key
+from tools.cost import record_usage
+from tools.model_backend import get_model_backend
+from tools.tracing import payload_bytes, record_bytes, set_attribute, traced
+import config
+
+
+def _crew_cache():
+    if not config.CREW_CACHE_ENABLED:
+        return None
+    return get_cache(
+        'crew',
+        max_entries=config.CREW_CACHE_MAX_ENTRIES,
+        ttl_seconds=config.CREW_CACHE_TTL_SECONDS
+    )
+
+
+@traced("crew.kickoff")
+def kickoff_cached(agent: Agent, task: Task) -> str:
+    """
+    Run a single-agent crew for a task, memoizing the output on disk
+
+    Args:
+        agent: Agent that executes the task
+        task: Fully rendered task
+
+    Returns:
+        Crew output as a string
+    """
+    cache = _crew_cache()
+    model = getattr(agent.llm, 'model', None) or str(agent.llm)
+    cache_key = make_key(agent.role, model, task.description, task.expected_output)
+    set_attribute("agent", agent.role)
+
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print(f"⚡ Crew cache hit for '{agent.role}' - skipping LLM round trip")
+            set_attribute("cache_hit", True)
+            return cached
+
+    # The backend runs the crew (or replays/fakes it offline)
+    response = get_model_backend().kickoff(agent, task)
+    record_usage(model, response)
+    result = response.text
+    record_bytes(sent=payload_bytes(task.description), received=payload_bytes(result))
+
+    if cache:
+        cache.set(cache_key, result)
+
+    return result
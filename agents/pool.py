@@ -0,0 +1,181 @@
+"""
+Agent Pool - Shared, pre-initialized agents
+Keeps configured VisualAssessor / ProjectCoordinator instances (and the Gemini
+clients they own) alive across requests so callers skip per-request setup
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from agents.visual_assessor import VisualAssessor
+from agents.project_coordinator import ProjectCoordinator
+import config
+
+
+class AgentPool:
+    """Thread-safe pool of agents, checked out exclusively for one request at a time"""
+
+    def __init__(self, size: Optional[int] = None):
+        """
+        Args:
+            size: Maximum number of instances per agent kind (defaults to config.AGENT_POOL_SIZE)
+        """
+        self.size = size or config.AGENT_POOL_SIZE
+        self._factories: Dict[str, Callable[[], Any]] = {
+            "assessor": VisualAssessor,
+            "coordinator": ProjectCoordinator
+        }
+        self._idle: Dict[str, List[Any]] = {kind: [] for kind in self._factories}
+        self._metrics: Dict[str, Dict[str, float]] = {
+            kind: {"created": 0, "in_use": 0, "checkouts": 0, "waits": 0, "init_seconds": 0.0}
+            for kind in self._factories
+        }
+        self._cond = threading.Condition()
+
+    def _create(self, kind: str) -> Any:
+        start = time.perf_counter()
+        agent = self._factories[kind]()
+        with self._cond:
+            self._metrics[kind]["init_seconds"] += time.perf_counter() - start
+        return agent
+
+    def _checkout(self, kind: str, timeout: Optional[float]) -> Any:
+        metrics = self._metrics[kind]
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._cond:
+            waited = False
+            while True:
+                if self._idle[kind]:
+                    agent = self._idle[kind].pop()
+                    break
+                if metrics["created"] < self.size:
+                    # Reserve the slot, then build outside the lock
+                    metrics["created"] += 1
+                    agent = None
+                    break
+                if not waited:
+                    metrics["waits"] += 1
+                    waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No {kind} available in agent pool after {timeout}s")
+                self._cond.wait(remaining)
+
+            metrics["in_use"] += 1
+            metrics["checkouts"] += 1
+
+        if agent is None:
+            try:
+                agent = self._create(kind)
+            except Exception:
+                with self._cond:
+                    metrics["created"] -= 1
+                    metrics["in_use"] -= 1
+                    self._cond.notify()
+                raise
+        return agent
+
+    def _checkin(self, kind: str, agent: Any) -> None:
+        with self._cond:
+            self._idle[kind].append(agent)
+            self._metrics[kind]["in_use"] -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def acquire(self, kind: str, timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Check out an agent for the duration of a with-block
+
+        Args:
+            kind: "assessor" or "coordinator"
+            timeout: Seconds to wait for a free instance (defaults to config.AGENT_POOL_TIMEOUT_SECONDS)
+        """
+        if kind not in self._factories:
+            raise ValueError(f"Unknown agent kind: {kind}")
+        agent = self._checkout(kind, config.AGENT_POOL_TIMEOUT_SECONDS if timeout is None else timeout)
+        try:
+            yield agent
+        finally:
+            self._checkin(kind, agent)
+
+    def assessor(self, timeout: Optional[float] = None):
+        """Check out a VisualAssessor"""
+        return self.acquire("assessor", timeout)
+
+    def coordinator(self, timeout: Optional[float] = None):
+        """Check out a ProjectCoordinator"""
+        return self.acquire("coordinator", timeout)
+
+    def warm_up(self, count: Optional[int] = None, background: bool = False) -> Optional[threading.Thread]:
+        """
+        Pre-create idle instances of every agent kind
+
+        Args:
+            count: Instances per kind to have ready (defaults to config.AGENT_POOL_WARM_SIZE)
+            background: Build in a daemon thread and return it instead of blocking
+
+        Returns:
+            The warm-up thread when background=True, else None
+        """
+        count = min(self.size, config.AGENT_POOL_WARM_SIZE if count is None else count)
+
+        def _warm():
+            for kind in self._factories:
+                while True:
+                    with self._cond:
+                        metrics = self._metrics[kind]
+                        if metrics["created"] >= count or metrics["created"] >= self.size:
+                            break
+                        metrics["created"] += 1
+                    try:
+                        agent = self._create(kind)
+                    except Exception as e:
+                        with self._cond:
+                            self._metrics[kind]["created"] -= 1
+                        print(f"⚠️ Agent pool warm-up failed for {kind}: {e}")
+                        break
+                    with self._cond:
+                        self._idle[kind].append(agent)
+                        self._cond.notify()
+            print(f"✅ Agent pool warmed up: {self.stats()}")
+
+        if background:
+            thread = threading.Thread(target=_warm, name="agent-pool-warmup", daemon=True)
+            thread.start()
+            return thread
+
+        _warm()
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Pool-size metrics per agent kind"""
+        with self._cond:
+            return {
+                kind: {
+                    "max_size": self.size,
+                    "created": int(metrics["created"]),
+                    "idle": len(self._idle[kind]),
+                    "in_use": int(metrics["in_use"]),
+                    "checkouts": int(metrics["checkouts"]),
+                    "waits": int(metrics["waits"]),
+                    "avg_init_seconds": (
+                        metrics["init_seconds"] / metrics["created"] if metrics["created"] else 0.0
+                    )
+                }
+                for kind, metrics in self._metrics.items()
+            }
+
+
+_pool: Optional[AgentPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_agent_pool() -> AgentPool:
+    """Return the process-wide agent pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = AgentPool()
+        return _pool
@@ -2,9 +2,11 @@
 Project Coordinator Agent
 Generates photorealistic renderings, budget breakdowns, and project timelines
 """
-from crewai import Agent, Task, Crew, LLM
+from crewai import Agent, Task, LLM
+from agents.crew_cache import kickoff_cached
 from tools.image_generator import ImageGenerator
-from typing import Dict, Any
+from tools.room_image import RoomImage
+from typing import Dict, Any, Union
 import json
 import config
 
@@ -13,6 +15,10 @@ llm = LLM(
     model="gemini/gemini-2.0-flash-exp",
     api_key=config.GOOGLE_API_KEY
 )
+
+# Rendering fields the budget task is built from (stable for a given design)
+PLAN_TASK_FIELDS = ('rendering_description', 'style', 'custom_prompt', 'room_type')
+
 class ProjectCoordinator:
     """Agent responsible for coordinating design execution and rendering generation"""
 
@@ -35,7 +41,8 @@ class ProjectCoordinator:
         room_analysis: Dict[str, Any],
         design_style: str = "modern minimalist",
         budget_range: str = "moderate",
-        reference_image: str = None
+        reference_image: Union[str, RoomImage] = None,
+        custom_prompt: str = None
     ) -> Dict[str, Any]:
         """
         Generate complete project plan including rendering, budget, and timeline
@@ -44,15 +51,59 @@ class ProjectCoordinator:
             room_analysis: Analysis from VisualAssessor
             design_style: Target design style
             budget_range: low, moderate, high
-            reference_image: Optional reference photo
+            reference_image: Optional reference photo (path or RoomImage)
+            custom_prompt: Optional user's own description of the desired design
 
         Returns:
             Complete project plan
         """
+        raw_analysis = room_analysis.get("raw_analysis", {})
+
+        rendering = self.create_rendering(
+            raw_analysis=raw_analysis,
+            design_style=design_style,
+            budget_range=budget_range,
+            reference_image=reference_image,
+            custom_prompt=custom_prompt
+        )
+        project_details = self.plan_project(
+            rendering=rendering,
+            raw_analysis=raw_analysis,
+            budget_range=budget_range
+        )
+
+        return {
+            "rendering": rendering,
+            "project_plan": project_details,
+            "design_style": design_style,
+            "budget_range": budget_range,
+            "room_type": raw_analysis.get("room_type", "room")
+        }
+
+    def create_rendering(
+        self,
+        raw_analysis: Dict[str, Any],
+        design_style: str = "modern minimalist",
+        budget_range: str = "moderate",
+        reference_image: Union[str, RoomImage] = None,
+        custom_prompt: str = None
+    ) -> Dict[str, Any]:
+        """
+        Generate the rendering (description and transformed image) for a design
+
+        Args:
+            raw_analysis: Raw analysis from ImageAnalyzer
+            design_style: Target design style
+            budget_range: low, moderate, high
+            reference_image: Optional reference photo (path or RoomImage)
+            custom_prompt: Optional user's own description of the desired design
+
+        Returns:
+            Rendering result from ImageGenerator
+        """
         print(f"\n🎨 Project Coordinator creating plan for {design_style} design...")
 
         # Extract room details
-        raw_analysis = room_analysis.get("raw_analysis", {})
         room_type = raw_analysis.get("room_type", "room")
         size = raw_analysis.get("dimensions_estimate", "medium")
 
@@ -71,17 +122,43 @@ Design goals:
 """
 
         # Generate rendering
-        rendering = self.image_generator.generate_rendering(
+        return self.image_generator.generate_rendering(
             room_analysis=raw_analysis,
             design_brief=design_brief,
             style=design_style,
-            reference_image_path=reference_image
+            reference_image_path=reference_image,
+            custom_prompt=custom_prompt
         )
 
+    def plan_project(
+        self,
+        rendering: Dict[str, Any],
+        raw_analysis: Dict[str, Any],
+        budget_range: str = "moderate"
+    ) -> str:
+        """
+        Have the agent produce the budget, timeline and shopping list for a rendering
+
+        Args:
+            rendering: Result of create_rendering
+            raw_analysis: Raw analysis from ImageAnalyzer
+            budget_range: low, moderate, high
+
+        Returns:
+            Project plan text
+        """
+        room_type = raw_analysis.get("room_type", "room")
+        size = raw_analysis.get("dimensions_estimate", "medium")
+
+        # Only the design itself goes into the task - paths, timings and status notes
+        # differ per run, and identical designs must produce identical tasks (and
+        # share crew cache entries)
+        task_rendering = {k: rendering[k] for k in PLAN_TASK_FIELDS if k in rendering}
+
         # Create budget and timeline task
         task = Task(
             description=f"""Based on this design rendering:
-            {json.dumps(rendering, indent=2)}
+            {json.dumps(task_rendering, indent=2)}
 
             For a {size} {room_type} with {budget_range} budget, create:
 
@@ -112,21 +189,8 @@ Design goals:
             expected_output="Structured project plan with budget and timeline"
         )
 
-        # Execute task using Crew
-        crew = Crew(
-            agents=[self.agent],
-            tasks=[task],
-            verbose=True
-        )
-        project_details = crew.kickoff()
-
-        return {
-            "rendering": rendering,
-            "project_plan": str(project_details),
-            "design_style": design_style,
-            "budget_range": budget_range,
-            "room_type": room_type
-        }
+        # Execute task using Crew (memoized on identical tasks)
+        return kickoff_cached(self.agent, task)
 
     def refine_design(
         self,
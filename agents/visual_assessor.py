@@ -2,9 +2,11 @@
 Visual Assessor Agent
 Analyzes room photos and inspiration images to provide detailed assessment
 """
-from crewai import Agent, Task, Crew, LLM
+from crewai import Agent, Task, LLM
+from agents.crew_cache import kickoff_cached
 from tools.image_analyzer import ImageAnalyzer
-from typing import Dict, Any
+from tools.room_image import RoomImage
+from typing import Dict, Any, Union
 import json
 import config
 
@@ -30,29 +32,67 @@ class VisualAssessor:
             allow_delegation=False
         )
 
-    def analyze(self, image_path: str) -> Dict[str, Any]:
+    def analyze(self, image_path: Union[str, RoomImage]) -> Dict[str, Any]:
         """
         Analyze a room photo and return comprehensive assessment
 
         Args:
-            image_path: Path to room photo
+            image_path: Path to room photo, or an already loaded RoomImage
 
         Returns:
             Detailed analysis dictionary
         """
-        print(f"\n🔍 Visual Assessor analyzing: {image_path}")
+        analysis = self.analyze_image(image_path)
+
+        if "error" in analysis:
+            return analysis
+
+        # Combine tool analysis with agent assessment
+        return {
+            "raw_analysis": analysis,
+            "professional_assessment": self.assess(analysis),
+            "image_path": analysis.get("image_path")
+        }
+
+    def analyze_image(self, image_path: Union[str, RoomImage]) -> Dict[str, Any]:
+        """
+        Run the vision analysis tool on a room photo (no agent reasoning)
+
+        Args:
+            image_path: Path to room photo, or an already loaded RoomImage
+
+        Returns:
+            Raw analysis from ImageAnalyzer, or a dict with an "error" key
+        """
+        label = image_path.label if isinstance(image_path, RoomImage) else image_path
+        print(f"\n🔍 Visual Assessor analyzing: {label}")
 
         # Use ImageAnalyzer tool
         analysis = self.image_analyzer.analyze_room(image_path)
 
         if "error" in analysis:
             print(f"❌ Analysis failed: {analysis['error']}")
-            return analysis
+
+        return analysis
+
+    def assess(self, analysis: Dict[str, Any]) -> str:
+        """
+        Have the agent write a professional assessment of a raw analysis
+
+        Args:
+            analysis: Raw analysis from analyze_image
+
+        Returns:
+            Professional assessment text
+        """
+        # Upload paths differ per session - keep them out of the task so identical
+        # photos produce identical tasks (and share crew cache entries)
+        task_analysis = {k: v for k, v in analysis.items() if k != 'image_path'}
 
         # Create assessment task for the agent
         task = Task(
             description=f"""Based on this room analysis:
-            {json.dumps(analysis, indent=2)}
+            {json.dumps(task_analysis, indent=2)}
 
             Provide a professional assessment including:
             1. Overall impression of the space
@@ -64,22 +104,11 @@ class VisualAssessor:
             expected_output="Structured assessment with recommendations"
         )
 
-        # Execute task using Crew
-        crew = Crew(
-            agents=[self.agent],
-            tasks=[task],
-            verbose=True
-        )
-        result = crew.kickoff()
-
-        # Combine tool analysis with agent assessment
-        return {
-            "raw_analysis": analysis,
-            "professional_assessment": str(result),
-            "image_path": image_path
-        }
+        # Execute task using Crew (memoized on identical tasks)
+        return kickoff_cached(self.agent, task)
 
-    def get_room_summary(self, analysis: Dict[str, Any]) -> str:
+    @staticmethod
+    def get_room_summary(analysis: Dict[str, Any]) -> str:
         """Generate a human-readable summary of the analysis"""
         raw = analysis.get("raw_analysis", {})
 
@@ -0,0 +1,255 @@
+"""
+Batch Mode - Run the design workflow over a whole photo directory
+Streams one JSONL result line per photo as it finishes, and skips photos
+already completed in the output file so interrupted jobs can be resumed
+"""
+import fnmatch
+import json
+import math
+import os
+import threading
+import time
+import concurrent.futures
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from agents.pool import AgentPool
+from pipeline import run_design_workflow
+import config
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def find_photos(
+    root: str,
+    patterns: Optional[Sequence[str]] = None,
+    recursive: bool = True
+) -> List[str]:
+    """
+    List room photos under a directory
+
+    Args:
+        root: Directory to scan
+        patterns: Optional glob filters matched against the path relative to root
+            or the file name (e.g. "kitchens/*", "*_living_*.jpg")
+        recursive: Also scan sub-directories
+
+    Returns:
+        Sorted list of photo paths
+    """
+    photos = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if not recursive:
+            dirnames.clear()
+        dirnames.sort()
+
+        for name in sorted(filenames):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, name)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            if patterns and not any(
+                fnmatch.fnmatch(relative, pattern) or fnmatch.fnmatch(name, pattern)
+                for pattern in patterns
+            ):
+                continue
+            photos.append(path)
+
+    return photos
+
+
+def load_completed(output_path: str) -> Set[str]:
+    """Absolute paths of photos with a successful result line in output_path"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A job killed mid-write leaves a truncated last line
+                continue
+            if record.get("status") == "success":
+                completed.add(os.path.abspath(record["image_path"]))
+    return completed
+
+
+def trim_partial_line(output_path: str) -> None:
+    """Cut a truncated last line (left by a job killed mid-write) so appends start on a fresh line"""
+    if not os.path.exists(output_path):
+        return
+
+    with open(output_path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the last newline; result lines are small, so read in modest blocks
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of values (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _process_photo(image_path: str, design_style: str, budget_range: str, pool: AgentPool) -> Dict[str, Any]:
+    """Run the workflow on one photo and build its result line"""
+    start = time.perf_counter()
+    record = {
+        "image_path": image_path,
+        "timestamp": datetime.now().isoformat(),
+        "target_style": design_style,
+        "budget_range": budget_range
+    }
+
+    try:
+        workflow = run_design_workflow(
+            image_path=image_path,
+            design_style=design_style,
+            budget_range=budget_range,
+            pool=pool
+        )
+        record.update({
+            "status": "success" if workflow["project_plan"] is not None else "error",
+            "stage_seconds": workflow["stage_seconds"],
+            "stage_errors": workflow["errors"],
+            "analysis": workflow["analysis"],
+            "project_plan": workflow["project_plan"],
+            "cost": workflow["cost"]
+        })
+        if record["status"] == "error":
+            record["error"] = next(iter(workflow["errors"].values()), "Workflow failed")
+    except Exception as e:
+        record.update({"status": "error", "error": str(e)})
+
+    record["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_batch(
+    root: str,
+    output_path: Optional[str] = None,
+    patterns: Optional[Sequence[str]] = None,
+    recursive: bool = True,
+    concurrency: Optional[int] = None,
+    design_style: str = "modern minimalist",
+    budget_range: str = "moderate",
+    resume: bool = True
+) -> Dict[str, Any]:
+    """
+    Run the design workflow on every photo under a directory
+
+    Args:
+        root: Directory of room photos
+        output_path: JSONL results file (defaults to output/batch_results.jsonl)
+        patterns: Optional glob filters (see find_photos)
+        recursive: Also scan sub-directories
+        concurrency: Photos processed at once (defaults to config.BATCH_CONCURRENCY)
+        design_style: Target design style for every photo
+        budget_range: Budget category for every photo
+        resume: Skip photos that already have a successful line in output_path
+
+    Returns:
+        Dictionary containing:
+        - found / skipped / processed / succeeded / failed: Photo counts
+        - elapsed_seconds: Wall-clock time of the batch
+        - photos_per_minute: Throughput of this run
+        - p50_seconds / p95_seconds: Per-photo latency percentiles
+        - cost_usd: Model spend of this run (tools.cost)
+        - output_path: Where the result lines were written
+    """
+    output_path = output_path or os.path.join(config.OUTPUT_DIR, 'batch_results.jsonl')
+    concurrency = max(1, concurrency or config.BATCH_CONCURRENCY)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    photos = find_photos(root, patterns, recursive)
+    completed = load_completed(output_path) if resume else set()
+    trim_partial_line(output_path)
+    todo = [p for p in photos if os.path.abspath(p) not in completed]
+
+    print(f"\n📂 Found {len(photos)} photos in '{root}' ({len(photos) - len(todo)} already completed)")
+    print(f"⚙️ Processing {len(todo)} photos with concurrency {concurrency} → {output_path}")
+
+    # One agent set per worker, so no worker waits on the pool
+    pool = AgentPool(size=concurrency)
+    write_lock = threading.Lock()
+    latencies: List[float] = []
+    succeeded = failed = 0
+    total_cost = 0.0
+
+    start = time.perf_counter()
+    with open(output_path, 'a', encoding='utf-8') as out, concurrent.futures.ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="batch"
+    ) as executor:
+        # Submit in a bounded window and drop futures as they finish, so finished
+        # records don't pile up on batches of thousands of photos
+        queued = iter(todo)
+        running = set()
+        done = 0
+        while True:
+            for path in queued:
+                running.add(executor.submit(_process_photo, path, design_style, budget_range, pool))
+                if len(running) >= concurrency * 2:
+                    break
+            if not running:
+                break
+
+            finished, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                done += 1
+                record = future.result()
+                with write_lock:
+                    out.write(json.dumps(record, default=str) + "\n")
+                    out.flush()
+
+                latencies.append(record["elapsed_seconds"])
+                total_cost += record.get("cost", {}).get("cost_usd", 0.0)
+                if record["status"] == "success":
+                    succeeded += 1
+                    print(f"✅ [{done}/{len(todo)}] {record['image_path']} ({record['elapsed_seconds']:.1f}s)")
+                else:
+                    failed += 1
+                    print(f"❌ [{done}/{len(todo)}] {record['image_path']}: {record.get('error')}")
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "found": len(photos),
+        "skipped": len(photos) - len(todo),
+        "processed": len(todo),
+        "succeeded": succeeded,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 3),
+        "photos_per_minute": round(len(todo) / elapsed * 60, 2) if todo and elapsed > 0 else 0.0,
+        "p50_seconds": percentile(latencies, 50),
+        "p95_seconds": percentile(latencies, 95),
+        "cost_usd": round(total_cost, 6),
+        "output_path": output_path
+    }
+
+    print("\n📊 BATCH SUMMARY:")
+    print(f"✓ Processed: {len(todo)} ({succeeded} succeeded, {failed} failed, {summary['skipped']} skipped)")
+    print(f"✓ Throughput: {summary['photos_per_minute']} photos/min")
+    if latencies:
+        print(f"✓ Latency: p50 {summary['p50_seconds']:.1f}s, p95 {summary['p95_seconds']:.1f}s")
+    print(f"✓ Cost: ${summary['cost_usd']:.4f}")
+    print(f"✓ Results: {output_path}")
+
+    return summary
@@ -0,0 +1,123 @@
+"""
+Decode Memory Benchmark - Peak RSS per upload, full decode vs reduced decode
+Each measurement runs in a fresh process so the peaks don't mask each other.
+Run from the project root:
+
+    python -m benchmarks.decode_memory [photo ...] [--megapixels 50]
+
+Without arguments it writes a synthetic JPEG of the given size to a temp file.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("full", "reduced")
+
+
+def peak_rss_mb() -> float:
+    """High-water mark of this process's resident memory"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def synthetic_photo(path: str, megapixels: float) -> None:
+    """Large JPEG with photo-like content (gradients plus noise)"""
+    from PIL import Image
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT))).save(
+        path, format="JPEG", quality=90
+    )
+
+
+def child(mode: str, path: str) -> None:
+    """Decode one photo the given way and print the RSS numbers as JSON"""
+    from PIL import Image, ImageOps
+    from tools.image_prep import normalize_image
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+
+    if mode == "full":
+        # What the apps did before: Image.open + full decode, then downscale
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((1536, 1536))
+        size = img.size
+    else:
+        size = normalize_image(data)["size"]
+
+    print(json.dumps({
+        "baseline_mb": baseline,
+        "peak_mb": peak_rss_mb(),
+        "seconds": time.perf_counter() - start,
+        "size": size
+    }))
+
+
+def measure(mode: str, path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, path],
+        capture_output=True, text=True, check=True
+    ).stdout
+    # The last line is the JSON; anything before it is log output
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Peak RSS of full vs reduced photo decodes")
+    parser.add_argument("photos", nargs="*", help="Photos to decode (default: a synthetic JPEG)")
+    parser.add_argument("--megapixels", type=float, default=50, help="Size of the synthetic photo")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(*args.child)
+        return
+
+    photos = args.photos
+    temp_path = None
+    if not photos:
+        temp_path = os.path.join(tempfile.mkdtemp(), "synthetic.jpg")
+        print(f"ℹ️ Writing a synthetic {args.megapixels:.0f} MP JPEG...")
+        synthetic_photo(temp_path, args.megapixels)
+        photos = [temp_path]
+
+    print(f"\n📊 DECODE MEMORY BENCHMARK (peak RSS above baseline, per upload)")
+    print("=" * 70)
+    print(f"{'Photo':<28}{'Mode':<10}{'Peak (MB)':>12}{'Time (s)':>10}{'Output':>12}")
+    print("-" * 70)
+    for path in photos:
+        name = os.path.basename(path)[:26]
+        for mode in MODES:
+            row = measure(mode, path)
+            print(
+                f"{name:<28}{mode:<10}{row['peak_mb'] - row['baseline_mb']:>12.0f}"
+                f"{row['seconds']:>10.2f}{'x'.join(map(str, row['size'])):>12}"
+            )
+    print("=" * 70)
+
+    if temp_path:
+        os.remove(temp_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Encoding Benchmark - Encode time and file size per output format
+Run from the project root:
+
+    python -m benchmarks.encoding [image ...] [--formats PNG,WEBP,AVIF,JPEG] [--quality 85]
+
+Without arguments it uses the renders in output/rendered_images (or a synthetic
+1024x1024 image if there are none).
+"""
+import argparse
+import glob
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from tools.image_encoding import encode_image, output_extensions
+from tools.previews import PREVIEW_DIR_NAME
+
+
+def synthetic_render(size: int = 1024) -> bytes:
+    """PNG with smooth gradients, hard edges and texture - roughly what a room render looks like"""
+    img = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        x = (i * 83) % size
+        draw.rectangle([x, size // 3, x + size // 6, size - 40], fill=(140 + i * 8, 110, 90 - i * 5))
+    noise = Image.effect_noise((size, size), 24).convert("RGB")
+    img = Image.blend(img, noise, 0.12).filter(ImageFilter.SMOOTH)
+    buffered = io.BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def benchmark(samples, formats, quality, repeat):
+    """Encode every sample in every requested format; return {format: {actual, ms, kb, ratio}}"""
+    results = {}
+    for fmt in formats:
+        timings, sizes, ratios, actual = [], [], [], set()
+        for data in samples:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                encoded = encode_image(data, fmt=fmt, quality=quality, strip_metadata=True)
+                timings.append((time.perf_counter() - start) * 1000)
+            sizes.append(len(encoded["data"]))
+            actual.add(encoded["format"])
+            ratios.append(len(encoded["data"]) / len(data))
+        # Keyed by the requested format - an unavailable one (AVIF) falls back to WEBP
+        results[fmt] = {
+            "actual": ",".join(sorted(actual)),
+            "encode_ms": statistics.median(timings),
+            "size_kb": statistics.mean(sizes) / 1024,
+            "ratio": statistics.mean(ratios)
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare render output formats")
+    parser.add_argument("images", nargs="*", help="Images to encode (default: output/rendered_images/**)")
+    parser.add_argument("--formats", default="PNG,WEBP,AVIF,JPEG", help="Comma-separated formats")
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--repeat", type=int, default=3, help="Encodes per image per format")
+    args = parser.parse_args(argv)
+
+    paths = args.images or sorted(
+        path
+        for extension in output_extensions()
+        for path in glob.glob(os.path.join("output", "rendered_images", "**", f"*{extension}"), recursive=True)
+        if PREVIEW_DIR_NAME not in path.split(os.sep)  # full-size renders only
+    )[:10]
+    samples = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            samples.append(f.read())
+    if not samples:
+        print("ℹ️ No renders found - using a synthetic 1024x1024 image")
+        samples = [synthetic_render()]
+
+    source_kb = statistics.mean(len(data) for data in samples) / 1024
+    print(f"\n📊 ENCODING BENCHMARK ({len(samples)} images, avg source {source_kb:.0f} KB, quality {args.quality})")
+    print("=" * 70)
+    print(f"{'Format':<10}{'Actual':<10}{'Encode (ms, p50)':>18}{'Size (KB)':>14}{'vs source':>12}")
+    print("-" * 70)
+
+    formats = [fmt.strip().upper() for fmt in args.formats.split(",") if fmt.strip()]
+    for fmt, row in benchmark(samples, formats, args.quality, args.repeat).items():
+        print(f"{fmt:<10}{row['actual']:<10}{row['encode_ms']:>18.1f}{row['size_kb']:>14.1f}{row['ratio']:>11.0%}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Workflow Benchmark - End-to-end latency, throughput, memory and bytes of the design pipeline
+Runs run_poc, the batch path and the Streamlit glue functions against the fake
+model backend (no network, no key), each scenario in a fresh process with
+caches off. Run from the project root:
+
+    python -m benchmarks.workflow [--concurrency 1,8,64] [--latency-scale 0.05] [--baseline old.json]
+
+Results are written as JSON (default output/benchmarks/workflow_<branch>_<commit>.json)
+so runs on different branches can be compared with --baseline.
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import importlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.decode_memory import peak_rss_mb, synthetic_photo
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("run_poc", "batch", "streamlit")
+
+
+def percentiles(values) -> dict:
+    """p50/p95/p99/mean of a list of seconds (None when empty)"""
+    from batch import percentile
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    return {
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "mean": round(sum(values) / len(values), 4)
+    }
+
+
+def trace_bytes(trace: dict) -> tuple:
+    """(sent, received) model payload bytes summed over a span tree"""
+    sent, received = trace.get("bytes_sent", 0), trace.get("bytes_received", 0)
+    for child in trace.get("children", []):
+        child_sent, child_received = trace_bytes(child)
+        sent += child_sent
+        received += child_received
+    return sent, received
+
+
+def _job_row(elapsed, stage_seconds, ok, result_bytes, trace=None) -> dict:
+    sent, received = trace_bytes(trace) if trace else (0, 0)
+    return {
+        "elapsed": elapsed,
+        "stages": stage_seconds or {},
+        "ok": ok,
+        "result_bytes": result_bytes,
+        "model_bytes_sent": sent,
+        "model_bytes_received": received
+    }
+
+
+def _run_poc(photos, concurrency):
+    """main.run_poc, one photo after another (the CLI path)"""
+    from main import run_poc
+    rows = []
+    for photo in photos:
+        start = time.perf_counter()
+        results = run_poc(photo)
+        rows.append(_job_row(
+            time.perf_counter() - start,
+            results.get("stage_seconds"),
+            results.get("status") == "success",
+            len(json.dumps(results, indent=2, default=str).encode('utf-8')),
+            results.get("trace")
+        ))
+    return rows
+
+
+def _run_batch(photos, concurrency):
+    """batch.run_batch over a directory of the photos"""
+    from batch import run_batch
+    photo_dir = tempfile.mkdtemp(dir='.')
+    for photo in photos:
+        shutil.copy(photo, photo_dir)
+    output_path = os.path.join(photo_dir, "batch_results.jsonl")
+    run_batch(photo_dir, output_path=output_path, concurrency=concurrency, resume=False)
+
+    rows = []
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            rows.append(_job_row(
+                record["elapsed_seconds"],
+                record.get("stage_seconds"),
+                record["status"] == "success",
+                len(line.encode('utf-8'))
+            ))
+    return rows
+
+
+class _Upload:
+    """What st.file_uploader hands the app"""
+
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            self._data = f.read()
+
+    def getvalue(self):
+        return self._data
+
+
+def _run_streamlit(photos, concurrency):
+    """streamlit_app glue (upload → design_room → preview → before/after), one session per job"""
+    # Bare-mode Streamlit: widgets return defaults, and the missing-runtime warnings are noise here
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import streamlit_app as app
+    from tools.previews import preview_path
+
+    # Keep each session's workflow result (design_room returns only analysis and plan)
+    workflows = threading.local()
+    run_design_workflow = app.run_design_workflow
+
+    def recording_workflow(*args, **kwargs):
+        workflows.last = run_design_workflow(*args, **kwargs)
+        return workflows.last
+
+    app.run_design_workflow = recording_workflow
+
+    def session(photo):
+        start = time.perf_counter()
+        workflows.last = None
+        upload_id = app.save_uploaded_file(_Upload(photo))
+        analysis, project_plan = app.design_room(
+            upload_id, "", "modern minimalist", "moderate", user_id=f"bench-{threading.get_ident()}"
+        )
+        image_path = (project_plan or {}).get("rendering", {}).get("image_path")
+        if image_path:
+            preview_path(image_path, app.PREVIEW_WIDTH)
+            app.show_before_after(upload_id, image_path)
+        workflow = workflows.last or {}
+        return _job_row(
+            time.perf_counter() - start,
+            workflow.get("stage_seconds"),
+            image_path is not None,
+            len(json.dumps([analysis, project_plan], default=str).encode('utf-8')),
+            workflow.get("trace")
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(session, photos))
+
+
+RUNNERS = {"run_poc": _run_poc, "batch": _run_batch, "streamlit": _run_streamlit}
+ENTRY_MODULES = {"run_poc": "main", "batch": "batch", "streamlit": "streamlit_app"}
+
+
+def child(scenario: str, concurrency: int, photo_dir: str, jobs: int) -> None:
+    """Run one scenario in this process and print its measurements as JSON"""
+    photos = sorted(os.path.join(photo_dir, name) for name in os.listdir(photo_dir))[:jobs]
+
+    # Imports are not part of the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        importlib.import_module(ENTRY_MODULES[scenario])
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = RUNNERS[scenario](photos, concurrency)
+    wall = time.perf_counter() - start
+
+    stage_names = sorted({name for row in rows for name in row["stages"]})
+    # Batch builds an agent set per worker; the apps and run_poc share the process-wide pool
+    import config
+    pool_size = concurrency if scenario == "batch" else config.AGENT_POOL_SIZE
+    print(json.dumps({
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "agent_pool_size": pool_size,
+        "pool_bound": scenario == "streamlit" and pool_size < concurrency,
+        "jobs": len(rows),
+        "succeeded": sum(row["ok"] for row in rows),
+        "wall_seconds": round(wall, 3),
+        "throughput_per_minute": round(len(rows) / wall * 60, 2) if wall > 0 else None,
+        "latency_seconds": percentiles([row["elapsed"] for row in rows]),
+        "stage_seconds": {
+            name: percentiles([row["stages"][name] for row in rows if name in row["stages"]])
+            for name in stage_names
+        },
+        "memory_mb": {"baseline": round(baseline, 1), "peak": round(peak_rss_mb(), 1)},
+        "bytes": {
+            "result_serialized": sum(row["result_bytes"] for row in rows),
+            "result_per_job": round(sum(row["result_bytes"] for row in rows) / max(1, len(rows))),
+            "model_sent": sum(row["model_bytes_sent"] for row in rows),
+            "model_received": sum(row["model_bytes_received"] for row in rows)
+        }
+    }))
+
+
+def measure(scenario, concurrency, photo_dir, jobs, workdir, latency_scale, pool_size=None) -> dict:
+    env = dict(
+        os.environ,
+        MODEL_BACKEND="fake",
+        FAKE_LATENCY_SCALE=str(latency_scale),
+        HOME_DESIGN_CACHE="0",
+        # One agent set per concurrent session, so the numbers measure the workflow rather
+        # than queueing for the shared pool (pass --pool-size to measure a fixed pool)
+        AGENT_POOL_SIZE=str(pool_size or max(1, concurrency)),
+        PYTHONIOENCODING="utf-8"
+    )
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", scenario, str(concurrency), photo_dir, str(jobs)],
+        capture_output=True, text=True, cwd=workdir, env=env
+    )
+    if process.returncode != 0:
+        error = (process.stderr.strip().splitlines() or [f"exited with status {process.returncode}"])[-1]
+        return {"scenario": scenario, "concurrency": concurrency, "jobs": jobs, "error": error}
+    # The last line is the JSON; anything before it is log output
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, cwd=ROOT, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Print p50/p95 and throughput changes against a previous results file"""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"] if "error" not in r}
+    print(f"\n📊 VS BASELINE ({baseline['meta']['branch']} @ {baseline['meta']['commit'][:8]})")
+    print("-" * 78)
+    for row in current["results"]:
+        old = previous.get((row["scenario"], row["concurrency"]))
+        if not old or "error" in row:
+            continue
+        changes = []
+        for label, new_value, old_value in (
+            ("p50", row["latency_seconds"]["p50"], old["latency_seconds"]["p50"]),
+            ("p95", row["latency_seconds"]["p95"], old["latency_seconds"]["p95"]),
+            ("jobs/min", row["throughput_per_minute"], old["throughput_per_minute"])
+        ):
+            if new_value and old_value:
+                changes.append(f"{label} {new_value / old_value - 1:+.0%}")
+        print(f"{row['scenario']:<12}x{row['concurrency']:<5}{', '.join(changes)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the design pipeline (fake model backend)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated: run_poc, batch, streamlit")
+    parser.add_argument("--concurrency", default="1,8,64", help="Concurrent jobs for batch and streamlit")
+    parser.add_argument("--jobs", type=int, help="Jobs per run (default: 2x concurrency, at least 8)")
+    parser.add_argument("--poc-runs", type=int, default=5, help="Sequential run_poc runs")
+    parser.add_argument("--latency-scale", type=float, default=0.05,
+                        help="Multiplier on config.FAKE_LATENCY_SECONDS (1.0 = realistic model latency)")
+    parser.add_argument("--pool-size", type=int,
+                        help="Shared agent pool size for the Streamlit sessions (default: match the concurrency)")
+    parser.add_argument("--megapixels", type=float, default=2.0, help="Size of the synthetic room photos")
+    parser.add_argument("--output", help="Results JSON path")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--child", nargs=4, metavar=("SCENARIO", "CONCURRENCY", "PHOTOS", "JOBS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        scenario, concurrency, photo_dir, jobs = args.child
+        child(scenario, int(concurrency), photo_dir, int(jobs))
+        return
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    runs = []
+    for scenario in scenarios:
+        if scenario == "run_poc":
+            runs.append((scenario, 1, args.poc_runs))
+        else:
+            runs.extend((scenario, level, args.jobs or max(8, 2 * level)) for level in levels)
+
+    workdir = tempfile.mkdtemp(prefix="workflow_bench_")
+    photo_dir = os.path.join(workdir, "photos")
+    os.makedirs(photo_dir)
+    count = max(jobs for _, _, jobs in runs)
+    print(f"ℹ️ Writing {count} synthetic {args.megapixels:g} MP photos...")
+    for i in range(count):
+        synthetic_photo(os.path.join(photo_dir, f"room_{i:04d}.jpg"), args.megapixels)
+
+    branch, commit = _git("rev-parse", "--abbrev-ref", "HEAD"), _git("rev-parse", "HEAD")
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "branch": branch,
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "latency_scale": args.latency_scale,
+            "pool_size": args.pool_size,
+            "megapixels": args.megapixels
+        },
+        "results": []
+    }
+
+    print(f"\n📊 WORKFLOW BENCHMARK (fake backend, latency x{args.latency_scale:g})")
+    print("=" * 78)
+    print(f"{'Scenario':<12}{'Conc':>5}{'Jobs':>6}{'p50 (s)':>9}{'p95 (s)':>9}{'p99 (s)':>9}"
+          f"{'Jobs/min':>10}{'Peak MB':>9}{'KB/job':>9}")
+    print("-" * 78)
+    try:
+        for scenario, concurrency, jobs in runs:
+            row = measure(scenario, concurrency, photo_dir, jobs, workdir, args.latency_scale, args.pool_size)
+            report["results"].append(row)
+            if "error" in row:
+                print(f"❌ {scenario:<10}{concurrency:>5}{jobs:>6}  {row['error']}")
+                continue
+            latency = row["latency_seconds"]
+            print(f"{scenario:<12}{concurrency:>5}{row['jobs']:>6}{latency['p50']:>9.2f}{latency['p95']:>9.2f}"
+                  f"{latency['p99']:>9.2f}{row['throughput_per_minute']:>10.1f}{row['memory_mb']['peak']:>9.0f}"
+                  f"{row['bytes']['result_per_job'] / 1024:>9.1f}"
+                  f"{'  (pool-bound: ' + str(row['agent_pool_size']) + ' agent sets)' if row['pool_bound'] else ''}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print("=" * 78)
+
+    output = args.output or os.path.join(
+        ROOT, "output", "benchmarks", f"workflow_{branch.replace('/', '-')}_{commit[:8]}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Results: {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,11 +17,130 @@ if GOOGLE_API_KEY:
 GEMINI_VISION_MODEL = 'gemini-2.5-flash-image'
 GEMINI_IMAGE_MODEL = 'gemini-2.5-flash-image'  # Will use imagen-3.0-generate-001 when available
 
+# Model Backend (gemini = live API, record = live API + save every request/response pair,
+# replay = answer from recordings, fake = synthetic responses; replay and fake run offline)
+MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'gemini')
+MODEL_RECORDINGS_DIR = os.getenv('MODEL_RECORDINGS_DIR', os.path.join('output', 'recordings'))
+REPLAY_FALLBACK_TO_FAKE = True  # unrecorded requests get synthetic answers instead of an error
+# Log-normal (median seconds, sigma) per call kind; sigma 0 gives a fixed delay
+FAKE_LATENCY_SECONDS = {
+    'json': (3.0, 0.3),  # room analysis
+    'text': (8.0, 0.3),  # rendering description
+    'image': (10.0, 0.35),  # Nano Banana
+    'crew': (6.0, 0.4)  # CrewAI kickoff
+}
+FAKE_LATENCY_SCALE = float(os.getenv('FAKE_LATENCY_SCALE', '1.0'))  # 0 answers instantly
+
 # POC Settings
 MAX_PHOTOS = 5
 OUTPUT_DIR = 'output'
 TEST_PHOTOS_DIR = 'test_photos'
 
+# Cache Settings
+CACHE_ENABLED = os.getenv('HOME_DESIGN_CACHE', '1') != '0'
+CACHE_DIR = os.path.join(OUTPUT_DIR, 'cache')
+ANALYSIS_CACHE_MAX_ENTRIES = 1000
+ANALYSIS_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 50 MB
+ANALYSIS_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60  # 1 week
+
+# Near-duplicate photo lookup (perceptual hash, Hamming distance out of 64 bits)
+PHASH_INDEX_ENABLED = CACHE_ENABLED
+PHASH_MAX_DISTANCE = 4
+
+# Rendering cache (generated images keyed on reference image + prompt + generation config)
+RENDER_CACHE_ENABLED = CACHE_ENABLED
+RENDER_CACHE_VARIANTS = 3  # variants kept per key for "regenerate" to rotate through
+RENDER_CACHE_MAX_ENTRIES = 500
+RENDER_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 days
+
+# CrewAI kickoff memoization (agent role + LLM model + rendered task)
+CREW_CACHE_ENABLED = CACHE_ENABLED
+CREW_CACHE_MAX_ENTRIES = 500
+CREW_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60  # 1 week
+
+# Upload normalization (every photo sent to a model is oriented, downscaled and re-encoded)
+IMAGE_MAX_EDGE = int(os.getenv('IMAGE_MAX_EDGE', '1536'))  # longest side in pixels
+IMAGE_UPLOAD_FORMAT = 'JPEG'  # JPEG or WEBP
+IMAGE_UPLOAD_QUALITY = 85
+
+# Decode Limits (per image; JPEGs are decoded at a reduced DCT scale where possible)
+MAX_SOURCE_PIXELS = 100_000_000  # reject larger images outright (header check, nothing decoded)
+MAX_DECODE_PIXELS = 25_000_000  # most pixels any single decode may allocate (~75 MB as RGB)
+
+# Per-call model timeouts (seconds)
+DESCRIPTION_TIMEOUT_SECONDS = 90
+IMAGE_TIMEOUT_SECONDS = 120
+
+# Agent Pool (shared pre-initialized agents for the Streamlit apps)
+AGENT_POOL_SIZE = int(os.getenv('AGENT_POOL_SIZE', '4'))  # max instances per agent kind
+AGENT_POOL_WARM_SIZE = 1  # instances per kind built at server start
+AGENT_POOL_TIMEOUT_SECONDS = 120
+
+# Batch Mode
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))  # photos processed at once
+
+# Upload Store (content-addressed Streamlit uploads)
+UPLOAD_DIR = os.path.join('temp', 'uploads')
+UPLOAD_STORE_MAX_BYTES = 500 * 1024 * 1024  # 500 MB
+UPLOAD_CLEANUP_INTERVAL_SECONDS = 300
+
+# Image Previews (WebP copies written alongside every stored image; full size is the original)
+PREVIEW_SIZES = (256, 768)  # widths in pixels
+PREVIEW_QUALITY = 80
+
+# Rendered Image Output (ORIGINAL keeps the model's bytes untouched)
+RENDER_OUTPUT_FORMAT = os.getenv('RENDER_OUTPUT_FORMAT', 'WEBP')  # ORIGINAL, PNG, WEBP, AVIF or JPEG (progressive)
+RENDER_OUTPUT_QUALITY = 85
+RENDER_STRIP_METADATA = True
+ENCODE_WORKERS = 2  # encode pool threads
+
+# Reference Photo File Handles (upload once, pass the handle to every later call)
+FILE_SERVICE = os.getenv('FILE_SERVICE', 'gemini')  # gemini, local (stand-in for fake/replay runs) or none (always inline)
+FILE_HANDLE_TTL_SECONDS = 48 * 60 * 60  # Gemini Files API retention
+FILE_HANDLE_EXPIRY_MARGIN_SECONDS = 60 * 60  # stop reusing a handle this long before it expires
+FILE_HANDLE_CACHE_MAX_ENTRIES = 1000
+FILE_HANDLE_RETRY_SECONDS = 5 * 60  # after a failed upload, send that photo inline this long before retrying
+
+# Before/After Compositor
+COMPOSITE_MAX_EDGE = 1024  # longest side of each panel in pixels
+COMPOSITE_GRID_CACHE_SIZE = 8  # resized photo/render pairs kept in memory
+COMPOSITE_CACHE_MAX_FILES = 500
+
+# Output Storage (unique IDs, files spread over 256^levels hash-sharded subdirectories)
+STORAGE_SHARD_LEVELS = 2
+
+# Tracing (per-stage spans are always returned with results; set a path to also export OTLP/JSON)
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH', '')  # e.g. output/traces/traces.jsonl
+TRACE_SERVICE_NAME = 'home-design-assistant'
+
+# Cost Accounting (USD per 1M tokens; image models are billed per generated image)
+MODEL_PRICES = {
+    'gemini-2.0-flash-exp': {'input': 0.10, 'output': 0.40, 'image': 0.0},
+    'gemini-2.5-flash-image': {'input': 0.30, 'output': 2.50, 'image': 0.039},
+    'imagen-3.0-generate-001': {'input': 0.0, 'output': 0.0, 'image': 0.03},
+    'default': {'input': 0.30, 'output': 2.50, 'image': 0.039}  # unknown models
+}
+COST_LEDGER_PATH = os.path.join(OUTPUT_DIR, 'costs', 'ledger.jsonl')
+DEFAULT_USER_ID = os.getenv('HOME_DESIGN_USER', 'local')
+COST_ENFORCE_BUDGET = os.getenv('COST_ENFORCE_BUDGET', '1') != '0'
+COST_SKIP_OPTIONAL_FRACTION = 0.8  # skip optional stages once a run's projected cost reaches this share of its ceiling
+# Typical calls, for projecting what a run's remaining stages will cost: (model, input tokens, output tokens, images)
+COST_CALL_ESTIMATES = {
+    'analysis': (GEMINI_VISION_MODEL, 1500, 600, 0),
+    'assessment': ('gemini-2.0-flash-exp', 2500, 1500, 0),  # crew kickoff
+    'description': (GEMINI_VISION_MODEL, 1500, 1500, 0),
+    'image': (GEMINI_IMAGE_MODEL, 1500, 0, 1),
+    'plan': ('gemini-2.0-flash-exp', 3000, 2500, 0)  # crew kickoff
+}
+
+# Memory Profiling (tracemalloc snapshots at stage and run boundaries; slows runs down, for diagnosis only)
+PROFILE_MEMORY = os.getenv('PROFILE_MEMORY', '0') != '0'  # also enabled by main.py --profile-memory
+PROFILE_MEMORY_DIR = os.path.join(OUTPUT_DIR, 'profiles')
+PROFILE_MEMORY_FRAMES = 10  # stack depth recorded per allocation, to attribute library allocations to our code
+PROFILE_MEMORY_TOP_N = 10  # allocation sites listed per stage and per run
+PROFILE_MEMORY_HISTORY = 10  # runs kept for leak detection
+PROFILE_MEMORY_LEAK_MIN_KB = 64  # growth across the kept runs before a site is reported as a leak
+
 # Success Metrics
 TARGET_LATENCY_SECONDS = 60
 TARGET_COST_PER_RUN = 2.0
@@ -13,7 +13,7 @@ if sys.platform == 'win32':
         sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
 
 from agents.visual_assessor import VisualAssessor
-from agents.project_coordinator import ProjectCoordinator
+from pipeline import run_design_workflow
 import config
 
 def demo_custom_prompt():
@@ -43,48 +43,30 @@ def demo_custom_prompt():
     print(f"   {custom_prompt}")
 
     print("\n" + "="*70)
-    print("STEP 1: Analyzing Room")
+    print("Analyzing Room & Generating Custom Transformation")
     print("="*70)
 
-    # Analyze the room
-    assessor = VisualAssessor()
-    analysis = assessor.analyze(image_path)
+    # Analysis, then the assessment crew alongside rendering, then the budget crew
+    workflow = run_design_workflow(
+        image_path=image_path,
+        design_style="cozy reading nook",
+        budget_range="moderate",
+        custom_prompt=custom_prompt
+    )
 
-    if "error" in analysis:
-        print(f"❌ Error: {analysis['error']}")
+    analysis = workflow["analysis"]
+    if analysis is None:
+        print(f"❌ Error: {workflow['errors'].get('analyze', 'Analysis failed')}")
         return
 
     # Print summary
-    summary = assessor.get_room_summary(analysis)
+    summary = VisualAssessor.get_room_summary(analysis)
     print(summary)
 
-    print("\n" + "="*70)
-    print("STEP 2: Generating Custom Transformation")
-    print("="*70)
-
-    # Generate transformation with custom prompt
-    coordinator = ProjectCoordinator()
-
-    # Create custom design brief
-    raw_analysis = analysis.get("raw_analysis", {})
-    custom_brief = f"""Transform this space into a cozy reading nook.
-
-USER'S SPECIFIC VISION: {custom_prompt}
-
-Current room: {raw_analysis.get('room_type', 'room')}
-Size: {raw_analysis.get('dimensions_estimate', 'medium')}
-Features to incorporate: {', '.join(raw_analysis.get('features', []))}
-
-Create a detailed design that fulfills this vision while working with the existing space."""
-
-    # Note: We'll need to update the coordinator to accept custom_prompt parameter
-    # For now, the custom prompt is embedded in the design_brief
-    project_plan = coordinator.generate_project_plan(
-        room_analysis=analysis,
-        design_style="cozy reading nook",
-        budget_range="moderate",
-        reference_image=image_path
-    )
+    project_plan = workflow["project_plan"]
+    if project_plan is None:
+        print(f"❌ Error: {workflow['errors'].get('render', 'Rendering failed')}")
+        return
 
     print("\n✅ Transformation Complete!")
 
@@ -6,8 +6,9 @@ import os
 import sys
 from datetime import datetime
 from agents.visual_assessor import VisualAssessor
-from agents.project_coordinator import ProjectCoordinator
+from pipeline import run_design_workflow
 import config
+from tools.storage import save_json
 
 # Fix UTF-8 encoding for Windows console
 if sys.platform == 'win32':
@@ -132,14 +133,8 @@ def get_budget():
     return budget_map.get(choice, 'moderate')
 
 def save_results(results: dict, output_dir: str = "output"):
-    """Save results to JSON file"""
-    import json
-    os.makedirs(output_dir, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filepath = os.path.join(output_dir, f"interactive_results_{timestamp}.json")
-
-    with open(filepath, 'w') as f:
-        json.dump(results, f, indent=2)
+    """Save results to a uniquely named JSON file (safe for concurrent runs)"""
+    filepath = save_json(results, os.path.join(output_dir, "results"), "interactive_results")
 
     print(f"\n💾 Results saved to: {filepath}")
     return filepath
@@ -184,22 +179,30 @@ def run_interactive_design():
     }
 
     try:
-        # STEP 1: Visual Assessment
+        # Analysis, then the assessment crew alongside rendering, then the budget crew
         print("\n" + "="*70)
-        print("📍 STEP 1: Analyzing Your Space")
+        print("📍 Analyzing Your Space & Creating Your Custom Design Transformation")
         print("="*70)
 
-        assessor = VisualAssessor()
-        analysis = assessor.analyze(image_path)
-
-        if "error" in analysis:
-            print(f"❌ Analysis failed: {analysis['error']}")
-            results["error"] = analysis["error"]
+        workflow = run_design_workflow(
+            image_path=image_path,
+            design_style=design_style,
+            budget_range=budget_range,
+            custom_prompt=design_prompt
+        )
+        results["stage_seconds"] = workflow["stage_seconds"]
+        results["elapsed_seconds"] = workflow["elapsed_seconds"]
+
+        analysis = workflow["analysis"]
+        if analysis is None:
+            error = workflow["errors"].get("analyze", "Analysis failed")
+            print(f"❌ Analysis failed: {error}")
+            results["error"] = error
             save_results(results)
             return
 
         # Display summary
-        summary = assessor.get_room_summary(analysis)
+        summary = VisualAssessor.get_room_summary(analysis)
         print(summary)
 
         results["workflow_steps"].append({
@@ -208,37 +211,11 @@ def run_interactive_design():
             "output": analysis
         })
 
-        # STEP 2: Generate Transformation with Custom Prompt
-        print("\n" + "="*70)
-        print("📍 STEP 2: Creating Your Custom Design Transformation")
-        print("="*70)
-
-        coordinator = ProjectCoordinator()
-
-        # Create custom design brief incorporating user's prompt
         raw_analysis = analysis.get("raw_analysis", {})
-        custom_brief = f"""Transform this space based on the following request:
-
-USER'S VISION: {design_prompt}
-
-Current room details:
-- Type: {raw_analysis.get('room_type', 'room')}
-- Size: {raw_analysis.get('dimensions_estimate', 'medium')}
-- Current condition: {raw_analysis.get('condition', 'needs refresh')}
-- Key features: {', '.join(raw_analysis.get('features', []))}
-
-Create a design that:
-1. Fulfills the user's specific vision: "{design_prompt}"
-2. Works with the existing space and features
-3. Stays within {budget_range} budget range
-4. Provides specific, actionable recommendations"""
 
-        project_plan = coordinator.generate_project_plan(
-            room_analysis=analysis,
-            design_style=design_style,
-            budget_range=budget_range,
-            reference_image=image_path
-        )
+        project_plan = workflow["project_plan"]
+        if project_plan is None:
+            raise RuntimeError(workflow["errors"].get("render", "Rendering failed"))
 
         print("\n✅ Custom Design Plan Generated!")
         print(f"Design Style: {project_plan['design_style']}")
@@ -251,6 +228,9 @@ Create a design that:
             "output": project_plan
         })
 
+        if workflow["errors"]:
+            results["stage_errors"] = workflow["errors"]
+
         # Display rendering description if available
         rendering = project_plan.get("rendering", {})
         if rendering.get("success"):
@@ -4,11 +4,13 @@ Demonstrates multi-agent workflow for interior design planning
 """
 import os
 import sys
-import json
+import argparse
 from datetime import datetime
 from agents.visual_assessor import VisualAssessor
-from agents.project_coordinator import ProjectCoordinator
+from pipeline import run_design_workflow, run_style_comparison
 import config
+from tools.memory_profile import format_report, get_memory_profiler
+from tools.storage import save_json
 
 # Fix UTF-8 encoding for Windows console
 if sys.platform == 'win32':
@@ -19,13 +21,8 @@ if sys.platform == 'win32':
         sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
 
 def save_results(results: dict, output_dir: str = "output"):
-    """Save POC results to JSON file"""
-    os.makedirs(output_dir, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filepath = os.path.join(output_dir, f"poc_results_{timestamp}.json")
-
-    with open(filepath, 'w') as f:
-        json.dump(results, f, indent=2)
+    """Save POC results to a uniquely named JSON file (safe for concurrent runs)"""
+    filepath = save_json(results, os.path.join(output_dir, "results"), "poc_results")
 
     print(f"\n💾 Results saved to: {filepath}")
     return filepath
@@ -52,21 +49,31 @@ def run_poc(image_path: str, design_style: str = "modern minimalist", budget_ran
     }
 
     try:
-        # STEP 1: Visual Assessment
-        print("\n📍 STEP 1: Visual Assessment")
+        # Analysis, then the assessment crew alongside rendering, then the budget crew
+        print("\n📍 Running workflow: analysis → (assessment ‖ rendering → budget plan)")
         print("-" * 70)
 
-        assessor = VisualAssessor()
-        analysis = assessor.analyze(image_path)
-
-        if "error" in analysis:
-            print(f"❌ Visual assessment failed: {analysis['error']}")
-            results["error"] = analysis["error"]
+        workflow = run_design_workflow(
+            image_path=image_path,
+            design_style=design_style,
+            budget_range=budget_range
+        )
+        results["stage_seconds"] = workflow["stage_seconds"]
+        results["elapsed_seconds"] = workflow["elapsed_seconds"]
+        results["within_target_latency"] = workflow["within_target_latency"]
+        results["trace"] = workflow["trace"]
+        results["cost"] = workflow["cost"]
+
+        analysis = workflow["analysis"]
+        if analysis is None:
+            error = workflow["errors"].get("analyze", "Visual assessment failed")
+            print(f"❌ Visual assessment failed: {error}")
+            results["error"] = error
             save_results(results)
             return results
 
         # Display summary
-        summary = assessor.get_room_summary(analysis)
+        summary = VisualAssessor.get_room_summary(analysis)
         print(summary)
 
         results["workflow_steps"].append({
@@ -75,17 +82,9 @@ def run_poc(image_path: str, design_style: str = "modern minimalist", budget_ran
             "output": analysis
         })
 
-        # STEP 2: Project Coordination & Rendering
-        print("\n📍 STEP 2: Project Coordination & Rendering Generation")
-        print("-" * 70)
-
-        coordinator = ProjectCoordinator()
-        project_plan = coordinator.generate_project_plan(
-            room_analysis=analysis,
-            design_style=design_style,
-            budget_range=budget_range,
-            reference_image=image_path
-        )
+        project_plan = workflow["project_plan"]
+        if project_plan is None:
+            raise RuntimeError(workflow["errors"].get("render", "Rendering failed"))
 
         print("\n✅ Project Plan Generated!")
         print(f"Design Style: {project_plan['design_style']}")
@@ -97,6 +96,9 @@ def run_poc(image_path: str, design_style: str = "modern minimalist", budget_ran
             "output": project_plan
         })
 
+        if workflow["errors"]:
+            results["stage_errors"] = workflow["errors"]
+
         # Display rendering description
         rendering = project_plan.get("rendering", {})
         if rendering.get("success"):
@@ -118,6 +120,14 @@ def run_poc(image_path: str, design_style: str = "modern minimalist", budget_ran
         print(f"✓ Room analyzed: {analysis.get('raw_analysis', {}).get('room_type', 'Unknown')}")
         print(f"✓ Design style: {design_style}")
         print(f"✓ Project plan generated")
+        print(f"✓ Total time: {workflow['elapsed_seconds']:.1f}s (target {config.TARGET_LATENCY_SECONDS}s)")
+        print(f"✓ Cost: ${workflow['cost']['cost_usd']:.4f} (target ${config.TARGET_COST_PER_RUN:.2f}, "
+              f"{workflow['cost']['input_tokens'] + workflow['cost']['output_tokens']:,} tokens, "
+              f"{workflow['cost']['images']} images)")
+        if workflow["cost"]["skipped_optional"]:
+            print(f"💸 Skipped to stay within budget: {', '.join(workflow['cost']['skipped_optional'])}")
+        if not workflow["within_target_latency"]:
+            print("⚠️ Over the latency target - see results['trace'] for the slowest spans")
         print(f"✓ Results saved: {output_file}")
 
         return results
@@ -129,8 +139,119 @@ def run_poc(image_path: str, design_style: str = "modern minimalist", budget_ran
         save_results(results)
         return results
 
-def main():
+def run_comparison(image_path: str, styles: list, budget_range: str = "moderate"):
+    """
+    Design one room photo in several styles from a single analysis
+
+    Args:
+        image_path: Path to room photo
+        styles: Design styles to compare
+        budget_range: Budget category (low, moderate, high)
+    """
+    print("\n" + "="*70)
+    print(f"🏠 HOME DESIGN POC - Comparing {len(styles)} styles")
+    print("="*70)
+
+    comparison = run_style_comparison(
+        image_path=image_path,
+        styles=styles,
+        budget_range=budget_range
+    )
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "input_image": image_path,
+        "budget_range": budget_range,
+        "comparison": comparison
+    }
+
+    if comparison["analysis"] is None:
+        error = comparison["errors"].get("analyze", "Visual assessment failed")
+        print(f"❌ Visual assessment failed: {error}")
+        results["status"] = "error"
+        results["error"] = error
+        save_results(results)
+        return results
+
+    print(VisualAssessor.get_room_summary(comparison["analysis"]))
+
+    print("\n📊 STYLE COMPARISON:")
+    for label, entry in comparison["styles"].items():
+        rendering = (entry["project_plan"] or {}).get("rendering", {})
+        if entry["project_plan"] is None:
+            print(f"❌ {label}: {next(iter(entry['errors'].values()), 'failed')}")
+        else:
+            print(f"✓ {label}: {rendering.get('image_path') or 'text description only'} "
+                  f"(render {entry['render_seconds']}s, plan {entry['plan_seconds']}s)")
+    print(f"✓ Total time: {comparison['elapsed_seconds']:.1f}s (target {config.TARGET_LATENCY_SECONDS}s)")
+    print(f"✓ Cost: ${comparison['cost']['cost_usd']:.4f} (ceiling ${comparison['cost']['ceiling_usd']:.2f})")
+
+    results["status"] = "success"
+    save_results(results)
+    return results
+
+def parse_args(argv=None):
+    """Command-line options"""
+    parser = argparse.ArgumentParser(description="Home Design POC - multi-agent interior design planner")
+    parser.add_argument("--batch", metavar="DIR",
+                        help="Run the workflow on every photo under DIR instead of a single test photo")
+    parser.add_argument("--pattern", action="append", dest="patterns", metavar="GLOB",
+                        help="Only batch photos matching GLOB (repeatable, e.g. 'kitchens/*')")
+    parser.add_argument("--no-recursive", action="store_true",
+                        help="Don't descend into sub-directories in batch mode")
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_CONCURRENCY,
+                        help="Photos processed at once in batch mode")
+    parser.add_argument("--output", help="JSONL results file for batch mode")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Reprocess photos already completed in the batch output file")
+    parser.add_argument("--style", default="modern minimalist", help="Target design style")
+    parser.add_argument("--styles", metavar="STYLE[,STYLE...]",
+                        help="Compare several comma-separated styles from one analysis of the test photo")
+    parser.add_argument("--budget", default="moderate", choices=["low", "moderate", "high"],
+                        help="Budget range")
+    parser.add_argument("--repeat", type=int, default=1, metavar="N",
+                        help="Run the test photo N times in one process (use with --profile-memory to find leaks)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Take tracemalloc snapshots at every stage boundary and report top allocation "
+                             "sites, retained memory and growth across runs")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main entry point for POC"""
+    args = parse_args(argv)
+
+    if not (args.profile_memory or config.PROFILE_MEMORY):
+        run(args)
+        return
+
+    profiler = get_memory_profiler()
+    profiler.start()
+    try:
+        run(args)
+    finally:
+        report = profiler.report()
+        print(format_report(report))
+        report_path = save_json(report, config.PROFILE_MEMORY_DIR, "memory_profile")
+        print(f"💾 Memory profile saved to: {report_path}")
+
+def run(args):
+    """Run the batch, comparison or single-photo workflow chosen on the command line"""
+    if args.batch:
+        from batch import run_batch
+
+        print("\n🚀 Starting Home Design batch run...")
+        run_batch(
+            root=args.batch,
+            output_path=args.output,
+            patterns=args.patterns,
+            recursive=not args.no_recursive,
+            concurrency=args.concurrency,
+            design_style=args.style,
+            budget_range=args.budget,
+            resume=not args.no_resume
+        )
+        return
+
     # Example usage
     print("\n🚀 Starting Home Design POC...")
 
@@ -153,15 +274,27 @@ def main():
     test_image = os.path.join(test_photos_dir, photos[0])
 
     print(f"\nUsing test image: {test_image}")
-    print("Design style: modern minimalist")
-    print("Budget range: moderate\n")
-
-    # Run POC
-    results = run_poc(
-        image_path=test_image,
-        design_style="modern minimalist",
-        budget_range="moderate"
-    )
+    print(f"Design style: {args.style}")
+    print(f"Budget range: {args.budget}\n")
+
+    for attempt in range(max(args.repeat, 1)):
+        if args.repeat > 1:
+            print(f"\n🔁 Run {attempt + 1} of {args.repeat}")
+
+        if args.styles:
+            styles = [style.strip() for style in args.styles.split(",") if style.strip()]
+            run_comparison(test_image, styles, budget_range=args.budget)
+            continue
+
+        # Run POC
+        results = run_poc(
+            image_path=test_image,
+            design_style=args.style,
+            budget_range=args.budget
+        )
+
+    if args.styles:
+        return
 
     # Interactive refinement option
     if results.get("status") == "success":
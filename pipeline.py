@@ -0,0 +1,460 @@
+"""
+Design Pipeline - Dependency-graph executor for the design workflow
+Each stage declares the values it consumes and produces, and runs as soon as
+its inputs exist, so independent stages (assessment and rendering) overlap
+"""
+import concurrent.futures
+import contextvars
+import time
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import config
+from tools.cost import current_meter, skip_optional, start_run
+from tools.memory_profile import profile_run, profile_stage
+from tools.room_image import RoomImage
+from tools.tracing import span, start_trace
+
+
+class StageError(Exception):
+    """Raised by a stage function to fail its stage (dependent stages are skipped)"""
+
+
+class Stage:
+    """A unit of work in a Pipeline"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Dict[str, Any]],
+        inputs: Sequence[str],
+        outputs: Sequence[str],
+        calls: Sequence[str] = ()
+    ):
+        """
+        Args:
+            name: Unique stage name
+            func: Called with the inputs as keyword arguments; returns a dict with every output
+            inputs: Context keys the stage needs
+            outputs: Context keys the stage produces
+            calls: Model calls the stage typically makes (config.COST_CALL_ESTIMATES names),
+                counted in the run's projected cost until the stage finishes
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.calls = list(calls)
+
+
+class Pipeline:
+    """Runs stages in dependency order, in parallel wherever the graph allows"""
+
+    def __init__(self, stages: List[Stage], max_workers: Optional[int] = None):
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate stage names: {names}")
+
+        producers: Dict[str, str] = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"'{output}' is produced by both {producers[output]} and {stage.name}")
+                producers[output] = stage.name
+
+        self.stages = stages
+        self.max_workers = max_workers or len(stages)
+
+    def run(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Execute the pipeline
+
+        Args:
+            context: Initial values (e.g. image_path, design_style)
+
+        Returns:
+            Dictionary containing:
+            - context: Initial values plus every produced output
+            - stage_seconds: Wall-clock seconds per completed stage
+            - errors: Error message per failed stage
+            - skipped: Stages that never ran because an input was missing
+        """
+        context = dict(context)
+        pending = list(self.stages)
+        stage_seconds: Dict[str, float] = {}
+        errors: Dict[str, str] = {}
+
+        # Optional stages are skipped on spend so far plus what the unfinished stages will cost
+        meter = current_meter()
+        if meter is not None:
+            for stage in pending:
+                meter.expect(stage.calls)
+
+        def _run_stage(stage: Stage, kwargs: Dict[str, Any]):
+            start = time.perf_counter()
+            with span(f"stage:{stage.name}"), profile_stage(stage.name):
+                produced = stage.func(**kwargs)
+            return produced, time.perf_counter() - start
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="pipeline"
+        ) as executor:
+            running: Dict[concurrent.futures.Future, Stage] = {}
+
+            while True:
+                for stage in [s for s in pending if all(i in context for i in s.inputs)]:
+                    pending.remove(stage)
+                    kwargs = {name: context[name] for name in stage.inputs}
+                    # Each stage runs in a copy of the caller's context, so its span nests under the run
+                    running[executor.submit(contextvars.copy_context().run, _run_stage, stage, kwargs)] = stage
+
+                if not running:
+                    break
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    if meter is not None:
+                        meter.settle(stage.calls)
+                    try:
+                        produced, seconds = future.result()
+                        missing = [o for o in stage.outputs if o not in (produced or {})]
+                        if missing:
+                            raise StageError(f"did not produce {missing}")
+                    except Exception as e:
+                        errors[stage.name] = str(e)
+                        print(f"❌ Stage '{stage.name}' failed: {e}")
+                        continue
+
+                    stage_seconds[stage.name] = round(seconds, 3)
+                    for output in stage.outputs:
+                        context[output] = produced[output]
+
+        return {
+            "context": context,
+            "stage_seconds": stage_seconds,
+            "errors": errors,
+            "skipped": [stage.name for stage in pending]
+        }
+
+
+def _analysis_stages(assessor) -> List[Stage]:
+    """The analyze and assess stages shared by every workflow graph"""
+    def analyze(image_path):
+        # Read the photo once; every later stage gets the same RoomImage
+        image = RoomImage.coerce(image_path)
+        analysis = assessor.analyze_image(image)
+        if "error" in analysis:
+            raise StageError(analysis["error"])
+        return {"image": image, "raw_analysis": analysis}
+
+    def assess(raw_analysis):
+        # Optional: the rendering and budget plan don't depend on it
+        if skip_optional("assessment"):
+            return {"professional_assessment": "Professional assessment skipped to stay within the run's cost ceiling."}
+        return {"professional_assessment": assessor.assess(raw_analysis)}
+
+    return [
+        Stage("analyze", analyze, inputs=["image_path"], outputs=["image", "raw_analysis"], calls=["analysis"]),
+        Stage("assess", assess, inputs=["raw_analysis"], outputs=["professional_assessment"], calls=["assessment"])
+    ]
+
+
+def build_design_pipeline(assessor, coordinator) -> Pipeline:
+    """
+    Build the design workflow graph
+
+        analyze ──┬── assess
+                  └── render ── plan
+
+    Rendering only needs the raw analysis, so it runs alongside the assessment
+    crew, and the budget crew starts as soon as the rendering exists.
+
+    Args:
+        assessor: VisualAssessor used for analysis and assessment
+        coordinator: ProjectCoordinator used for rendering and planning
+    """
+    def render(raw_analysis, image, design_style, budget_range, custom_prompt):
+        return {"rendering": coordinator.create_rendering(
+            raw_analysis=raw_analysis,
+            design_style=design_style,
+            budget_range=budget_range,
+            reference_image=image,
+            custom_prompt=custom_prompt
+        )}
+
+    def plan(rendering, raw_analysis, budget_range):
+        return {"project_plan": coordinator.plan_project(
+            rendering=rendering,
+            raw_analysis=raw_analysis,
+            budget_range=budget_range
+        )}
+
+    return Pipeline(_analysis_stages(assessor) + [
+        Stage("render", render,
+              inputs=["raw_analysis", "image", "design_style", "budget_range", "custom_prompt"],
+              outputs=["rendering"], calls=["description", "image"]),
+        Stage("plan", plan, inputs=["rendering", "raw_analysis", "budget_range"], outputs=["project_plan"],
+              calls=["plan"])
+    ])
+
+
+def run_design_workflow(
+    image_path: Union[str, RoomImage],
+    design_style: str = "modern minimalist",
+    budget_range: str = "moderate",
+    custom_prompt: Optional[str] = None,
+    assessor=None,
+    coordinator=None,
+    pool=None,
+    user_id: Optional[str] = None,
+    cost_ceiling: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Run analysis, assessment, rendering and budget planning for one photo
+
+    Agents not passed in are checked out of the shared agent pool for the
+    duration of the run.
+
+    Args:
+        image_path: Path to room photo, or an already loaded RoomImage
+        design_style: Target design style
+        budget_range: low, moderate, high
+        custom_prompt: Optional user's own description of the desired design
+        assessor: Optional VisualAssessor to use
+        coordinator: Optional ProjectCoordinator to use
+        pool: Optional AgentPool to check agents out of (defaults to the process-wide pool)
+        user_id: Who the run's cost is charged to (defaults to config.DEFAULT_USER_ID)
+        cost_ceiling: USD ceiling for the run (defaults to config.TARGET_COST_PER_RUN);
+            optional stages are skipped as spend approaches it
+
+    Returns:
+        Dictionary containing:
+        - analysis: Same shape as VisualAssessor.analyze (None if analysis failed)
+        - project_plan: Same shape as ProjectCoordinator.generate_project_plan (None if rendering failed)
+        - stage_seconds / errors / skipped: Pipeline bookkeeping
+        - elapsed_seconds / within_target_latency: End-to-end timing vs config.TARGET_LATENCY_SECONDS
+        - trace: Span tree (tools.tracing) - wall/CPU seconds and bytes per stage, tool and agent call
+        - cost: Tokens, images and USD for the run (tools.cost), including skipped_optional stages
+    """
+    start = time.perf_counter()
+
+    with profile_run("design_workflow"), \
+            start_trace("design_workflow", design_style=design_style, budget_range=budget_range) as trace, \
+            start_run(user_id, cost_ceiling) as meter, ExitStack() as stack:
+        if assessor is None or coordinator is None:
+            if pool is None:
+                from agents.pool import get_agent_pool
+                pool = get_agent_pool()
+            if assessor is None:
+                assessor = stack.enter_context(pool.assessor())
+            if coordinator is None:
+                coordinator = stack.enter_context(pool.coordinator())
+
+        run = build_design_pipeline(assessor, coordinator).run({
+            "image_path": image_path,
+            "design_style": design_style,
+            "budget_range": budget_range,
+            "custom_prompt": custom_prompt
+        })
+
+    context = run["context"]
+
+    elapsed = time.perf_counter() - start
+    return {
+        "analysis": _analysis_result(context),
+        "project_plan": _project_plan_result(
+            context, "rendering", "project_plan", design_style, budget_range
+        ),
+        "stage_seconds": run["stage_seconds"],
+        "errors": run["errors"],
+        "skipped": run["skipped"],
+        "elapsed_seconds": round(elapsed, 3),
+        "within_target_latency": elapsed <= config.TARGET_LATENCY_SECONDS,
+        "trace": trace.to_dict(),
+        "cost": meter.to_dict()
+    }
+
+
+def _analysis_result(context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Shape the analysis like VisualAssessor.analyze (None if analysis failed)"""
+    if context.get("raw_analysis") is None:
+        return None
+    return {
+        "raw_analysis": context["raw_analysis"],
+        "professional_assessment": context.get("professional_assessment", ""),
+        "image_path": context["image"].path
+    }
+
+
+def _project_plan_result(
+    context: Dict[str, Any],
+    rendering_key: str,
+    plan_key: str,
+    design_style: str,
+    budget_range: str
+) -> Optional[Dict[str, Any]]:
+    """Shape a plan like ProjectCoordinator.generate_project_plan (None if rendering failed)"""
+    if rendering_key not in context:
+        return None
+    return {
+        "rendering": context[rendering_key],
+        "project_plan": context.get(plan_key, ""),
+        "design_style": design_style,
+        "budget_range": budget_range,
+        "room_type": context["raw_analysis"].get("room_type", "room")
+    }
+
+
+StyleOption = Union[str, Dict[str, str]]
+
+
+def _style_variants(styles: Sequence[StyleOption], custom_prompt: Optional[str]) -> List[Tuple[str, str, Optional[str]]]:
+    """Normalize styles / presets into unique (label, style, custom_prompt) triples"""
+    variants = []
+    seen = set()
+    for option in styles:
+        if isinstance(option, str):
+            label, style, prompt = option, option, custom_prompt
+        else:
+            style = option["style"]
+            label = option.get("name") or style
+            prompt = option.get("custom_prompt", custom_prompt)
+        if label in seen:
+            continue
+        seen.add(label)
+        variants.append((label, style, prompt))
+    return variants
+
+
+def build_comparison_pipeline(assessor, pool, variants: List[Tuple[str, str, Optional[str]]]) -> Pipeline:
+    """
+    Build the multi-style graph: one analysis, then a render and plan per style
+
+        analyze ──┬── assess
+                  ├── render:<style A> ── plan:<style A>
+                  └── render:<style B> ── plan:<style B> ...
+
+    Every render / plan stage checks its own ProjectCoordinator out of the pool,
+    so styles proceed in parallel up to the pool size.
+
+    Args:
+        assessor: VisualAssessor used for the single analysis and assessment
+        pool: AgentPool supplying coordinators
+        variants: (label, style, custom_prompt) per style, from _style_variants
+    """
+    stages = _analysis_stages(assessor)
+
+    for label, style, prompt in variants:
+        def render(raw_analysis, image, budget_range, _label=label, _style=style, _prompt=prompt):
+            with pool.coordinator() as coordinator:
+                return {f"rendering:{_label}": coordinator.create_rendering(
+                    raw_analysis=raw_analysis,
+                    design_style=_style,
+                    budget_range=budget_range,
+                    reference_image=image,
+                    custom_prompt=_prompt
+                )}
+
+        def plan(raw_analysis, budget_range, _label=label, **rendering):
+            with pool.coordinator() as coordinator:
+                return {f"project_plan:{_label}": coordinator.plan_project(
+                    rendering=rendering[f"rendering:{_label}"],
+                    raw_analysis=raw_analysis,
+                    budget_range=budget_range
+                )}
+
+        stages.append(Stage(f"render:{label}", render,
+                            inputs=["raw_analysis", "image", "budget_range"],
+                            outputs=[f"rendering:{label}"], calls=["description", "image"]))
+        stages.append(Stage(f"plan:{label}", plan,
+                            inputs=[f"rendering:{label}", "raw_analysis", "budget_range"],
+                            outputs=[f"project_plan:{label}"], calls=["plan"]))
+
+    # The assess stage holds the assessor checked out by the caller; every other
+    # worker needs a coordinator, so more workers than the pool size would only queue
+    return Pipeline(stages, max_workers=min(len(stages), pool.size + 1))
+
+
+def run_style_comparison(
+    image_path: Union[str, RoomImage],
+    styles: Sequence[StyleOption],
+    budget_range: str = "moderate",
+    custom_prompt: Optional[str] = None,
+    assessor=None,
+    pool=None,
+    user_id: Optional[str] = None,
+    cost_ceiling: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Analyze a photo once and design it in several styles concurrently
+
+    Args:
+        image_path: Path to room photo, or an already loaded RoomImage
+        styles: Style names, or presets {"style": ..., "name": ..., "custom_prompt": ...}
+        budget_range: low, moderate, high
+        custom_prompt: Optional design description applied to styles without their own
+        assessor: Optional VisualAssessor to use
+        pool: Optional AgentPool (defaults to the process-wide pool)
+        user_id: Who the run's cost is charged to (defaults to config.DEFAULT_USER_ID)
+        cost_ceiling: USD ceiling for the whole comparison (defaults to
+            config.TARGET_COST_PER_RUN per style)
+
+    Returns:
+        Dictionary containing:
+        - analysis: Same shape as VisualAssessor.analyze (None if analysis failed)
+        - styles: {label: {"design_style", "project_plan", "errors", "render_seconds", "plan_seconds"}}
+          in request order; project_plan has the generate_project_plan shape (None if rendering failed)
+        - stage_seconds / errors / skipped: Pipeline bookkeeping
+        - elapsed_seconds / within_target_latency: End-to-end timing vs config.TARGET_LATENCY_SECONDS
+        - trace: Span tree (tools.tracing) - wall/CPU seconds and bytes per stage, tool and agent call
+        - cost: Tokens, images and USD for the run (tools.cost), including skipped_optional stages
+    """
+    start = time.perf_counter()
+    variants = _style_variants(styles, custom_prompt)
+    if not variants:
+        raise ValueError("At least one style is required")
+
+    if pool is None:
+        from agents.pool import get_agent_pool
+        pool = get_agent_pool()
+
+    with profile_run("style_comparison"), \
+            start_trace("style_comparison", styles=", ".join(label for label, _, _ in variants),
+                        budget_range=budget_range) as trace, \
+            start_run(user_id, cost_ceiling or config.TARGET_COST_PER_RUN * len(variants)) as meter, \
+            ExitStack() as stack:
+        if assessor is None:
+            assessor = stack.enter_context(pool.assessor())
+
+        run = build_comparison_pipeline(assessor, pool, variants).run({
+            "image_path": image_path,
+            "budget_range": budget_range
+        })
+
+    context = run["context"]
+    results = {}
+    for label, style, _ in variants:
+        stage_names = (f"render:{label}", f"plan:{label}")
+        results[label] = {
+            "design_style": style,
+            "project_plan": _project_plan_result(
+                context, f"rendering:{label}", f"project_plan:{label}", style, budget_range
+            ),
+            "errors": {name: run["errors"][name] for name in stage_names if name in run["errors"]},
+            "render_seconds": run["stage_seconds"].get(stage_names[0]),
+            "plan_seconds": run["stage_seconds"].get(stage_names[1])
+        }
+
+    elapsed = time.perf_counter() - start
+    return {
+        "analysis": _analysis_result(context),
+        "styles": results,
+        "stage_seconds": run["stage_seconds"],
+        "errors": run["errors"],
+        "skipped": run["skipped"],
+        "elapsed_seconds": round(elapsed, 3),
+        "within_target_latency": elapsed <= config.TARGET_LATENCY_SECONDS,
+        "trace": trace.to_dict(),
+        "cost": meter.to_dict()
+    }
@@ -5,9 +5,8 @@ Upload an image and transform your space with AI
 import streamlit as st
 import sys
 import os
-from PIL import Image
-import io
-import tempfile
+import json
+import uuid
 from datetime import datetime
 
 # Fix UTF-8 encoding
@@ -19,8 +18,18 @@ if sys.platform == 'win32':
         sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
 
 # Import our agents
-from agents.visual_assessor import VisualAssessor
-from agents.project_coordinator import ProjectCoordinator
+import config
+from agents.pool import get_agent_pool
+from tools.compositor import get_compositor
+from tools.cost import get_cost_ledger
+from tools.memory_profile import get_memory_profiler
+from tools.previews import preview_path
+from tools.upload_store import get_upload_store
+from pipeline import run_design_workflow, run_style_comparison
+
+# PROFILE_MEMORY=1 traces allocations from the first script run on (report in output/profiles/)
+if config.PROFILE_MEMORY:
+    get_memory_profiler()
 
 # Page config
 st.set_page_config(
@@ -76,66 +85,125 @@ if 'analysis_result' not in st.session_state:
     st.session_state.analysis_result = None
 if 'transformation_result' not in st.session_state:
     st.session_state.transformation_result = None
-if 'temp_image_path' not in st.session_state:
-    st.session_state.temp_image_path = None
+if 'upload_id' not in st.session_state:
+    st.session_state.upload_id = None
 if 'agent_responses' not in st.session_state:
     st.session_state.agent_responses = {}
+if 'style_comparison' not in st.session_state:
+    st.session_state.style_comparison = None
+if 'user_id' not in st.session_state:
+    # No sign-in - costs are attributed per browser session
+    st.session_state.user_id = f"session-{uuid.uuid4().hex[:8]}"
+
+DESIGN_STYLES = [
+    "Modern Minimalist",
+    "Cozy Bohemian",
+    "Industrial Loft",
+    "Scandinavian",
+    "Contemporary",
+    "Rustic Farmhouse",
+    "Mid-Century Modern",
+    "Coastal",
+    "Traditional"
+]
+
+# Display widths in pixels - views show the smallest stored preview at least this wide
+PREVIEW_WIDTH = 768  # one of the two main columns
+COMPARISON_WIDTH = 1200  # whole style-comparison row, split across its columns
+
+# Before/after views (label -> tools.compositor mode)
+COMPOSITE_MODES = {"Side by side": "side_by_side", "Wipe": "wipe", "Blend": "blend", "Difference": "diff"}
+
+@st.cache_resource
+def get_shared_agent_pool():
+    """Agent pool shared by every session; warm-up starts on the first script run"""
+    pool = get_agent_pool()
+    pool.warm_up(background=True)
+    return pool
+
+get_shared_agent_pool()
 
 def save_uploaded_file(uploaded_file):
-    """Save uploaded file to temp directory"""
+    """Store the upload by content hash - written once, however often the script reruns"""
     try:
-        # Create temp directory if it doesn't exist
-        temp_dir = os.path.join("temp", "uploads")
-        os.makedirs(temp_dir, exist_ok=True)
-
-        # Save file
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_path = os.path.join(temp_dir, f"upload_{timestamp}_{uploaded_file.name}")
-
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
-        return file_path
+        return get_upload_store().put(uploaded_file.getvalue(), uploaded_file.name)
     except Exception as e:
         st.error(f"Error saving file: {str(e)}")
         return None
 
-def analyze_room(image_path):
-    """Analyze the uploaded room image"""
-    with st.spinner("🔍 Analyzing your room..."):
+def show_before_after(upload_id, image_path):
+    """Before/after composite of the uploaded photo and its rendering"""
+    if not upload_id or not image_path or not os.path.exists(image_path):
+        return
+
+    try:
+        mode_label = st.radio("Compare", list(COMPOSITE_MODES), horizontal=True, key="composite_mode")
+        mode = COMPOSITE_MODES[mode_label]
+        position = 0.5
+        if mode in ("wipe", "blend"):
+            position = st.slider("Original ← → Design", 0.0, 1.0, 0.5, 0.05, key="composite_position")
+
+        composite = get_compositor().compose(get_upload_store().load(upload_id), image_path, mode, position)
+        st.image(composite["image_path"], use_container_width=True)
+    except FileNotFoundError:
+        st.info("The original photo is no longer stored - upload it again to compare")
+    except Exception as e:
+        st.warning(f"Could not build the comparison: {str(e)}")
+
+def design_room(upload_id, design_prompt, design_style, budget_range, user_id=None):
+    """Analyze the uploaded room and generate its transformation in one pipeline run"""
+    with st.spinner("🔍 Analyzing your room and 🎨 generating your transformed design..."):
         try:
-            assessor = VisualAssessor()
-            analysis = assessor.analyze(image_path)
+            # Rendering runs alongside the assessment crew; the budget crew follows the rendering
+            workflow = run_design_workflow(
+                image_path=get_upload_store().load(upload_id),
+                design_style=design_style,
+                budget_range=budget_range,
+                custom_prompt=design_prompt,
+                pool=get_shared_agent_pool(),
+                user_id=user_id
+            )
+
+            if workflow["analysis"] is None:
+                st.error(f"Analysis failed: {workflow['errors'].get('analyze', 'Unknown error')}")
+                return None, None
 
-            if "error" in analysis:
-                st.error(f"Analysis failed: {analysis['error']}")
-                return None
+            for stage, error in workflow["errors"].items():
+                st.warning(f"⚠️ {stage.title()} step failed: {error}")
 
-            return analysis
+            return workflow["analysis"], workflow["project_plan"]
         except Exception as e:
-            st.error(f"Error during analysis: {str(e)}")
-            return None
+            st.error(f"Error during transformation: {str(e)}")
+            import traceback
+            st.error(traceback.format_exc())
+            return None, None
 
-def transform_room(analysis, design_prompt, design_style, budget_range, image_path):
-    """Generate transformation with custom prompt"""
-    with st.spinner("🎨 Generating your transformed design..."):
+def compare_room_styles(upload_id, design_prompt, design_styles, budget_range, user_id=None):
+    """Analyze the uploaded room once and generate a transformation per style"""
+    with st.spinner(f"🔍 Analyzing your room and 🎨 designing it in {len(design_styles)} styles..."):
         try:
-            coordinator = ProjectCoordinator()
-
-            # Generate transformation
-            project_plan = coordinator.generate_project_plan(
-                room_analysis=analysis,
-                design_style=design_style,
+            comparison = run_style_comparison(
+                image_path=get_upload_store().load(upload_id),
+                styles=design_styles,
                 budget_range=budget_range,
-                reference_image=image_path
+                custom_prompt=design_prompt,
+                pool=get_shared_agent_pool(),
+                user_id=user_id
             )
 
-            return project_plan
+            if comparison["analysis"] is None:
+                st.error(f"Analysis failed: {comparison['errors'].get('analyze', 'Unknown error')}")
+                return None, None
+
+            for stage, error in comparison["errors"].items():
+                st.warning(f"⚠️ {stage.title()} step failed: {error}")
+
+            return comparison["analysis"], comparison["styles"]
         except Exception as e:
-            st.error(f"Error during transformation: {str(e)}")
+            st.error(f"Error during style comparison: {str(e)}")
             import traceback
             st.error(traceback.format_exc())
-            return None
+            return None, None
 
 # Main App
 def main():
@@ -150,20 +218,17 @@ def main():
         # Design style
         design_style = st.selectbox(
             "Design Style",
-            [
-                "Modern Minimalist",
-                "Cozy Bohemian",
-                "Industrial Loft",
-                "Scandinavian",
-                "Contemporary",
-                "Rustic Farmhouse",
-                "Mid-Century Modern",
-                "Coastal",
-                "Traditional"
-            ],
+            DESIGN_STYLES,
             help="This will be combined with your custom instructions"
         )
 
+        # Extra styles designed from the same room analysis
+        compare_styles = st.multiselect(
+            "Compare With Styles",
+            [style for style in DESIGN_STYLES if style != design_style],
+            help="Each selected style is rendered and planned in parallel from one analysis of your room"
+        )
+
         # Budget range
         budget_range = st.select_slider(
             "Budget Range",
@@ -188,9 +253,55 @@ def main():
 
         # Quick stats
         st.markdown("### 📊 Quick Stats")
-        st.metric("Model", "Nano Banana")
-        st.metric("Resolution", "1024x1024")
-        st.metric("Format", "PNG")
+        ledger = get_cost_ledger()
+        mine = ledger.today(st.session_state.user_id)
+        everyone = ledger.today()
+        last_run = mine["last_run"]
+        st.metric(
+            "Last Run Cost",
+            f"${last_run['cost_usd']:.4f}" if last_run else "—",
+            help=f"Ceiling ${last_run['ceiling_usd']:.2f} per run" if last_run else None
+        )
+        st.metric("Your Spend Today", f"${mine['cost_usd']:.4f}", help=f"{mine['runs']} runs, {mine['images']} images")
+        st.metric(
+            "Tokens Today (all users)",
+            f"{everyone['input_tokens'] + everyone['output_tokens']:,}",
+            help=f"${everyone['cost_usd']:.4f} across {everyone['runs']} runs"
+        )
+        if last_run and last_run["skipped_optional"]:
+            st.caption(f"💸 Last run skipped {', '.join(last_run['skipped_optional'])} to stay within budget")
+
+        with st.expander("🤖 Agent Pool"):
+            for kind, metrics in get_shared_agent_pool().stats().items():
+                st.caption(
+                    f"**{kind.title()}**: {metrics['in_use']} busy / {metrics['created']} ready "
+                    f"(max {metrics['max_size']}, {metrics['waits']} waits)"
+                )
+
+        if config.PROFILE_MEMORY:
+            with st.expander("🧠 Memory Profile"):
+                report = get_memory_profiler().report()
+                if not report["runs"]:
+                    st.caption("Snapshots are taken at each stage of the next run")
+                else:
+                    last = report["runs"][-1]
+                    st.caption(
+                        f"Run {last['run']}: retained {last['retained_kb']:,.0f} KB, "
+                        f"live {last['traced_mb']} MB, peak {last['peak_traced_mb']} MB"
+                    )
+                    if report["leaks"]:
+                        st.caption("⚠️ Growing on every run:")
+                        for leak in report["leaks"][:5]:
+                            st.caption(f"`{leak['site']}` {leak['growth_per_run_kb']:+,.0f} KB/run")
+                    else:
+                        for site in last["top_retained"][:5]:
+                            st.caption(f"`{site['site']}` {site['size_diff_kb']:+,.0f} KB retained")
+                    st.download_button(
+                        "Download report",
+                        json.dumps(report, indent=2),
+                        file_name="memory_profile.json",
+                        mime="application/json"
+                    )
 
     # Instructions Section - Make it prominent
     st.header("✍️ Describe Your Dream Space")
@@ -302,15 +413,17 @@ def main():
         )
 
         if uploaded_file is not None:
-            # Display uploaded image
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Your Original Room", use_container_width=True)
-
-            # Save to temp file
-            image_path = save_uploaded_file(uploaded_file)
-            st.session_state.temp_image_path = image_path
-
-            if image_path:
+            # Store by content hash; the session only keeps the ID
+            upload_id = save_uploaded_file(uploaded_file)
+            st.session_state.upload_id = upload_id
+
+            if upload_id:
+                # Display the column-sized preview rather than the full photo
+                st.image(
+                    preview_path(get_upload_store().path(upload_id), PREVIEW_WIDTH),
+                    caption="Your Original Room",
+                    use_container_width=True
+                )
                 st.success("✅ Image uploaded successfully!")
 
     with col2:
@@ -322,16 +435,19 @@ def main():
 
             if rendering.get("success") and rendering.get("image_path"):
                 try:
-                    transformed_image = Image.open(rendering["image_path"])
-                    st.image(transformed_image, caption="Your Transformed Space", use_container_width=True)
+                    st.image(
+                        preview_path(rendering["image_path"], PREVIEW_WIDTH),
+                        caption="Your Transformed Space",
+                        use_container_width=True
+                    )
 
                     # Download button
                     with open(rendering["image_path"], "rb") as f:
                         st.download_button(
                             label="📥 Download Transformed Image",
                             data=f,
-                            file_name=f"transformed_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-                            mime="image/png"
+                            file_name=f"transformed_{datetime.now().strftime('%Y%m%d_%H%M%S')}{os.path.splitext(rendering['image_path'])[1]}",
+                            mime=rendering.get("mime_type") or "image/png"
                         )
                 except Exception as e:
                     st.warning(f"Could not load transformed image: {str(e)}")
@@ -340,6 +456,42 @@ def main():
         else:
             st.info("Upload an image and click 'Transform My Space' to see your AI-generated design!")
 
+    # Before / after
+    result_rendering = (st.session_state.transformation_result or {}).get("rendering", {})
+    if uploaded_file is not None and result_rendering.get("image_path"):
+        st.divider()
+        st.header("🔍 Before / After")
+        show_before_after(st.session_state.upload_id, result_rendering["image_path"])
+
+    # Style comparison
+    if st.session_state.style_comparison:
+        st.divider()
+        st.header("🎨 Style Comparison")
+
+        comparison_cols = st.columns(len(st.session_state.style_comparison))
+        for column, (style, entry) in zip(comparison_cols, st.session_state.style_comparison.items()):
+            with column:
+                st.subheader(style.title())
+                plan = entry["project_plan"]
+                rendering = (plan or {}).get("rendering", {})
+
+                if rendering.get("image_path") and os.path.exists(rendering["image_path"]):
+                    st.image(
+                        preview_path(rendering["image_path"], COMPARISON_WIDTH // len(comparison_cols)),
+                        use_container_width=True
+                    )
+                elif plan is None:
+                    st.warning(f"Design failed: {next(iter(entry['errors'].values()), 'Unknown error')}")
+                else:
+                    st.info("Text description only")
+
+                if entry["render_seconds"] is not None:
+                    st.caption(f"Rendered in {entry['render_seconds']:.1f}s")
+
+                if plan and plan.get("project_plan"):
+                    with st.expander("📋 Project Plan"):
+                        st.markdown(plan["project_plan"])
+
     # Transform button
     if uploaded_file is not None:
         st.divider()
@@ -358,10 +510,28 @@ def main():
             if not has_instructions:
                 st.error("⚠️ Please provide transformation instructions in the tabs above!")
             else:
-                # Step 1: Analyze room
                 st.header("📊 Analysis & Transformation")
 
-                analysis = analyze_room(st.session_state.temp_image_path)
+                if compare_styles:
+                    # The selected style leads; the others come back alongside it
+                    analysis, comparison = compare_room_styles(
+                        st.session_state.upload_id,
+                        custom_prompt,
+                        [design_style.lower()] + [style.lower() for style in compare_styles],
+                        budget_range,
+                        user_id=st.session_state.user_id
+                    )
+                    transformation = comparison[design_style.lower()]["project_plan"] if comparison else None
+                    st.session_state.style_comparison = comparison
+                else:
+                    analysis, transformation = design_room(
+                        st.session_state.upload_id,
+                        custom_prompt,
+                        design_style.lower(),
+                        budget_range,
+                        user_id=st.session_state.user_id
+                    )
+                    st.session_state.style_comparison = None
 
                 if analysis:
                     st.session_state.analysis_result = analysis
@@ -411,15 +581,6 @@ def main():
                         st.session_state.agent_responses = {}
                     st.session_state.agent_responses['visual_assessor'] = analysis.get("professional_assessment", "")
 
-                    # Step 2: Generate transformation
-                    transformation = transform_room(
-                        analysis,
-                        custom_prompt,
-                        design_style.lower(),
-                        budget_range,
-                        st.session_state.temp_image_path
-                    )
-
                     if transformation:
                         st.session_state.transformation_result = transformation
 
@@ -436,8 +597,10 @@ def main():
                             if rendering.get("image_path"):
                                 st.subheader("🎨 Your Transformed Space")
                                 try:
-                                    transformed_image = Image.open(rendering["image_path"])
-                                    st.image(transformed_image, use_container_width=True)
+                                    st.image(
+                                        preview_path(rendering["image_path"], PREVIEW_WIDTH),
+                                        use_container_width=True
+                                    )
                                 except Exception as e:
                                     st.warning(f"Image saved but display failed: {str(e)}")
 
@@ -0,0 +1,111 @@
+"""
+Tests for reference photo file handles against the local stand-in file service
+"""
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+import config
+import tools.file_handles as file_handles
+from tools.file_handles import FileHandleCache, LocalFileService
+from tools.room_image import RoomImage
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FlakyFileService(LocalFileService):
+    """Local service whose first `failures` uploads raise"""
+
+    def __init__(self, directory: str, failures: int):
+        super().__init__(directory)
+        self.failures = failures
+        self.attempts = 0
+
+    def upload(self, data, mime_type, display_name):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("upload refused")
+        return super().upload(data, mime_type, display_name)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(file_handles.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def room():
+    buffered = io.BytesIO()
+    Image.new("RGB", (64, 48), (180, 140, 100)).save(buffered, format="JPEG")
+    return RoomImage(buffered.getvalue())
+
+
+@pytest.fixture(autouse=True)
+def memory_only(monkeypatch):
+    # Keep handles out of the shared on-disk cache
+    monkeypatch.setattr(config, "CACHE_ENABLED", False)
+
+
+def test_uploads_once_and_reuses_handle(tmp_path, clock, room):
+    service = LocalFileService(str(tmp_path), ttl_seconds=config.FILE_HANDLE_TTL_SECONDS)
+    handles = FileHandleCache(service)
+
+    async def three_calls():
+        # Two concurrent callers share one upload, the third reuses the stored handle
+        first = await asyncio.gather(handles.reference_part_async(room), handles.reference_part_async(room))
+        return list(first) + [await handles.reference_part_async(room)]
+
+    parts = asyncio.run(three_calls())
+
+    assert service.uploads == 1
+    assert handles.stats()["uploads"] == 1
+    assert handles.stats()["fallbacks"] == 0
+    uris = {part["file_data"]["file_uri"] for part in parts}
+    assert len(uris) == 1
+    assert LocalFileService.read({"uri": uris.pop()}) == room.normalized["data"]
+
+
+def test_reuploads_once_handle_nears_expiry(tmp_path, clock, room):
+    ttl = config.FILE_HANDLE_EXPIRY_MARGIN_SECONDS + 600
+    service = LocalFileService(str(tmp_path), ttl_seconds=ttl)
+    handles = FileHandleCache(service)
+
+    first = asyncio.run(handles.get_handle_async(room))
+    clock.now += 599  # still outside the expiry margin
+    assert asyncio.run(handles.get_handle_async(room)) == first
+    assert service.uploads == 1
+
+    clock.now += 2  # inside the margin - the handle is no longer handed out
+    second = asyncio.run(handles.get_handle_async(room))
+    assert service.uploads == 2
+    assert second["expires_at"] == clock.now + ttl
+
+
+def test_failed_upload_falls_back_to_inline_then_retries(tmp_path, clock, room):
+    service = FlakyFileService(str(tmp_path), failures=1)
+    handles = FileHandleCache(service)
+
+    part = asyncio.run(handles.reference_part_async(room))
+    assert part == {"mime_type": room.normalized["mime_type"], "data": room.normalized["data"]}
+
+    # Within the retry delay the photo goes inline without another attempt
+    clock.now += config.FILE_HANDLE_RETRY_SECONDS - 1
+    assert "data" in asyncio.run(handles.reference_part_async(room))
+    assert service.attempts == 1
+    assert handles.stats()["fallbacks"] == 2
+
+    clock.now += 2
+    part = asyncio.run(handles.reference_part_async(room))
+    assert part["file_data"]["file_uri"].startswith("file://")
+    assert service.attempts == 2
+    assert handles.stats()["uploads"] == 1
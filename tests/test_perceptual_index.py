@@ -0,0 +1,104 @@
+"""
+Tests for the perceptual index - Hamming-radius lookups and shared index files
+"""
+import threading
+
+from tools.perceptual_index import PerceptualIndex
+
+BASE = 0x0123456789ABCDEF
+
+
+def flip(value: int, *bits: int) -> int:
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_finds_within_max_distance_across_chunks(tmp_path):
+    index = PerceptualIndex(str(tmp_path / 'index.tsv'), max_distance=4)
+    index.add(BASE, {"room": "kitchen"})
+
+    # Four chunks of 13 bits and one of 12 - one flip per chunk still leaves one exact chunk
+    for bits in [(), (0,), (0, 13, 26, 39), (60, 61, 62, 63)]:
+        match = index.find(flip(BASE, *bits))
+        assert match is not None, bits
+        assert match["analysis"] == {"room": "kitchen"}
+        assert match["distance"] == len(bits)
+        assert match["hash"] == f"{BASE:016x}"
+
+
+def test_misses_just_past_max_distance(tmp_path):
+    index = PerceptualIndex(str(tmp_path / 'index.tsv'), max_distance=4)
+    index.add(BASE, {"room": "kitchen"})
+
+    # Five flips, one in every chunk, leave no chunk matching exactly
+    assert index.find(flip(BASE, 0, 13, 26, 39, 52)) is None
+    # Five flips in one chunk still share the other chunks, but are too far away
+    assert index.find(flip(BASE, 0, 1, 2, 3, 4)) is None
+    assert index.stats()["misses"] == 2
+
+
+def test_returns_closest_entry(tmp_path):
+    index = PerceptualIndex(str(tmp_path / 'index.tsv'), max_distance=4)
+    index.add(flip(BASE, 0, 1, 2), {"room": "far"})
+    index.add(flip(BASE, 0), {"room": "near"})
+
+    match = index.find(BASE)
+    assert match["analysis"] == {"room": "near"}
+    assert match["distance"] == 1
+
+
+def test_reloads_from_disk(tmp_path):
+    path = str(tmp_path / 'index.tsv')
+    PerceptualIndex(path).add(BASE, {"room": "kitchen"})
+
+    reloaded = PerceptualIndex(path)
+    assert len(reloaded) == 1
+    assert reloaded.find(BASE)["analysis"] == {"room": "kitchen"}
+
+
+def test_offset_taken_before_another_writers_append(tmp_path):
+    path = str(tmp_path / 'index.tsv')
+    ours, theirs = PerceptualIndex(path), PerceptualIndex(path)
+    other = flip(BASE, 20, 40, 50, 60, 63)  # outside our max distance
+    ours.add(flip(BASE, 1, 21, 41, 51, 61), {"room": "earlier"})
+
+    # Reproduce the race in add(): we take the end-of-file offset, then the
+    # other process appends its line before ours lands
+    offset = (tmp_path / 'index.tsv').stat().st_size
+    theirs.add(other, {"room": "theirs"})
+    with open(path, 'ab') as f:
+        f.write(f"{BASE:016x}\t{{\"room\": \"ours\"}}\n".encode('utf-8'))
+    ours._insert(BASE, offset)
+
+    match = ours.find(BASE)
+    assert match["analysis"] == {"room": "ours"}
+    assert match["distance"] == 0
+    assert ours.find(other) is None  # not indexed by this instance
+
+
+def test_concurrent_appends_from_separate_indexes(tmp_path):
+    path = str(tmp_path / 'index.tsv')
+    writers = [PerceptualIndex(path) for _ in range(4)]
+    per_writer = 50
+
+    def value(writer: int, i: int) -> int:
+        # Far apart: every value differs from the others in many bits
+        return (writer * per_writer + i + 1) * 0x9E3779B97F4A7C15 % (1 << 64)
+
+    def fill(writer: int) -> None:
+        for i in range(per_writer):
+            writers[writer].add(value(writer, i), {"writer": writer, "i": i})
+
+    threads = [threading.Thread(target=fill, args=(w,)) for w in range(len(writers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for w, index in enumerate(writers):
+        for i in range(per_writer):
+            assert index.find(value(w, i))["analysis"] == {"writer": w, "i": i}
+
+    reloaded = PerceptualIndex(path)
+    assert len(reloaded) == len(writers) * per_writer
@@ -0,0 +1,58 @@
+"""
+Async Utilities - Shared event loop for the Gemini tool wrappers
+The blocking tool methods are thin wrappers that hand their async
+counterparts to one long-lived background loop
+"""
+import asyncio
+import contextvars
+import threading
+from typing import Any, Awaitable, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the process-wide background event loop, starting it on first use
+
+    The Gemini SDKs cache their async transports and bind them to the loop that
+    first used them, so every async model call in the process should run here.
+    Async callers that share tool instances with sync code should schedule their
+    coroutines with run_sync() rather than on a loop of their own.
+    """
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="gemini-async-loop", daemon=True)
+            thread.start()
+            _loop, _loop_thread = loop, thread
+        return _loop
+
+
+async def _in_context(coro: Awaitable[Any], context: contextvars.Context) -> Any:
+    # Tasks start from the loop thread's context; carry over the caller's values
+    # (e.g. the current tracing span) so the coroutine sees what the caller saw
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+def run_sync(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the background loop and block until it finishes
+
+    Args:
+        coro: Coroutine to run
+        timeout: Optional seconds to wait for the result
+
+    Returns:
+        The coroutine's result
+    """
+    loop = get_event_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("Blocking tool method called from the event loop - await the *_async method instead")
+    return asyncio.run_coroutine_threadsafe(_in_context(coro, contextvars.copy_context()), loop).result(timeout)
@@ -0,0 +1,237 @@
+"""
+Disk Cache - Content-addressed, persistent result cache
+Stores JSON-serializable results on disk with size- and TTL-based eviction
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import config
+
+
+def hash_bytes(data: bytes) -> str:
+    """Return the SHA-256 hex digest of raw bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Build a cache key from an ordered list of parts
+
+    Args:
+        *parts: bytes, strings or JSON-serializable values
+
+    Returns:
+        SHA-256 hex digest identifying the combination of parts
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (bytes, bytearray, memoryview)):
+            chunk = bytes(part)
+        elif isinstance(part, str):
+            chunk = part.encode('utf-8')
+        else:
+            chunk = json.dumps(part, sort_keys=True, default=str).encode('utf-8')
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") differ
+        digest.update(len(chunk).to_bytes(8, 'big'))
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """Persistent key/value cache with LRU size limits and TTL expiry"""
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        cache_dir: Optional[str] = None
+    ):
+        """
+        Args:
+            namespace: Sub-directory of the cache root holding this cache's entries
+            max_entries: Maximum number of entries kept before evicting the least recently used
+            max_bytes: Optional cap on the total size of all entries on disk
+            ttl_seconds: Optional age after which an entry is treated as a miss and removed
+            cache_dir: Cache root (defaults to config.CACHE_DIR)
+        """
+        self.namespace = namespace
+        self.directory = os.path.join(cache_dir or config.CACHE_DIR, namespace)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss"""
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            except (json.JSONDecodeError, OSError):
+                # Corrupt entry - drop it and treat as a miss
+                self._remove(path)
+                self.misses += 1
+                return None
+
+            if self._is_expired(entry.get('created_at', 0)):
+                self._remove(path)
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            # Bump mtime so LRU eviction keeps recently used entries
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+
+            self.hits += 1
+            return entry.get('value')
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value under key and apply eviction"""
+        entry = {
+            "key": key,
+            "created_at": time.time(),
+            "value": value
+        }
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        """Remove a single entry if present"""
+        with self._lock:
+            self._remove(self._path(key))
+
+    def clear(self) -> None:
+        """Remove every entry in this cache"""
+        with self._lock:
+            for path, _, _ in self._entries():
+                self._remove(path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current disk usage for sizing the cache"""
+        with self._lock:
+            entries = self._entries()
+            lookups = self.hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(entries),
+                "bytes": sum(size for _, _, size in entries),
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+    def _entries(self):
+        """List (path, mtime, size) for every entry, oldest first"""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_mtime, st.st_size))
+
+        entries.sort(key=lambda e: e[1])
+        return entries
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones until within limits"""
+        entries = self._entries()
+
+        if self.ttl_seconds is not None:
+            cutoff = time.time() - self.ttl_seconds
+            fresh = []
+            for path, mtime, size in entries:
+                # mtime is refreshed on hits, so only entries untouched for a full
+                # TTL are dropped here; get() still checks the creation time
+                if mtime < cutoff:
+                    self._remove(path)
+                    self.evictions += 1
+                else:
+                    fresh.append((path, mtime, size))
+            entries = fresh
+
+        total_bytes = sum(size for _, _, size in entries)
+        while entries and (
+            len(entries) > self.max_entries
+            or (self.max_bytes is not None and total_bytes > self.max_bytes)
+        ):
+            path, _, size = entries.pop(0)
+            self._remove(path)
+            total_bytes -= size
+            self.evictions += 1
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+_caches: Dict[str, DiskCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str, **kwargs) -> DiskCache:
+    """
+    Return the process-wide cache for a namespace, creating it on first use
+
+    Sharing one instance per namespace keeps hit/miss counters aggregated across
+    every tool instance in the process (e.g. all Streamlit sessions).
+    """
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = DiskCache(namespace, **kwargs)
+            _caches[namespace] = cache
+        return cache
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every cache created in this process, keyed by namespace"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.namespace: cache.stats() for cache in caches}
@@ -0,0 +1,225 @@
+"""
+Compositor - Before/after views of a room photo and its rendering
+Both images are resized to one common grid once; side-by-side, blend, wipe and
+difference-heatmap views are then plain NumPy array operations, and every
+composite is cached on disk by (photo hash, render hash, mode, position)
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageOps
+
+import config
+from tools.cache import hash_bytes, make_key
+from tools.image_prep import reduce_decode
+from tools.room_image import RoomImage
+from tools.storage import atomic_write
+
+MODES = ("side_by_side", "blend", "wipe", "diff")
+
+
+def _heatmap_lut() -> np.ndarray:
+    """256-entry black → red → yellow → white color ramp"""
+    x = np.arange(256, dtype=np.float32) / 255.0
+    lut = np.stack([
+        np.clip(x * 3.0, 0, 1),
+        np.clip(x * 3.0 - 1.0, 0, 1),
+        np.clip(x * 3.0 - 2.0, 0, 1)
+    ], axis=1)
+    return (lut * 255).astype(np.uint8)
+
+
+_HEATMAP = _heatmap_lut()
+
+
+def _load(image: Union[str, RoomImage]) -> Tuple[str, bytes]:
+    if isinstance(image, RoomImage):
+        return image.content_hash, image.data
+    with open(image, 'rb') as f:
+        data = f.read()
+    return hash_bytes(data), data
+
+
+def _to_grid(data: bytes, size: Tuple[int, int]) -> np.ndarray:
+    """Decode and resize to exactly size (width, height) as an HxWx3 uint8 array"""
+    with Image.open(io.BytesIO(data)) as img:
+        # JPEG: decode at a reduced scale when the grid is much smaller than the photo
+        reduce_decode(img, size)
+        img = ImageOps.exif_transpose(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img = img.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return np.asarray(img)
+
+
+def _grid_size(render_data: bytes, max_edge: int) -> Tuple[int, int]:
+    # The render defines the aspect ratio; the photo is fitted onto the same grid
+    with Image.open(io.BytesIO(render_data)) as img:
+        width, height = img.size
+    scale = min(1.0, max_edge / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class Compositor:
+    """Builds and caches before/after composites"""
+
+    def __init__(self, max_edge: int = None, cache_dir: str = None, max_files: int = None):
+        """
+        Args:
+            max_edge: Longest side of each panel (defaults to config.COMPOSITE_MAX_EDGE)
+            cache_dir: Where composites are written (defaults to <cache>/composites)
+            max_files: Composites kept on disk before the oldest are removed
+        """
+        self.max_edge = max_edge or config.COMPOSITE_MAX_EDGE
+        self.cache_dir = cache_dir or os.path.join(config.CACHE_DIR, 'composites')
+        self.max_files = max_files or config.COMPOSITE_CACHE_MAX_FILES
+        self.hits = 0
+        self.misses = 0
+        # Resized pairs, so switching mode or moving the slider never decodes again
+        self._grids: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _pair(self, before_hash: str, before: bytes, after_hash: str, after: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        key = (before_hash, after_hash)
+        with self._lock:
+            if key in self._grids:
+                self._grids.move_to_end(key)
+                return self._grids[key]
+
+        size = _grid_size(after, self.max_edge)
+        pair = (_to_grid(before, size), _to_grid(after, size))
+
+        with self._lock:
+            self._grids[key] = pair
+            while len(self._grids) > config.COMPOSITE_GRID_CACHE_SIZE:
+                self._grids.popitem(last=False)
+        return pair
+
+    @staticmethod
+    def render(before: np.ndarray, after: np.ndarray, mode: str, position: float = 0.5) -> np.ndarray:
+        """
+        Compose two same-sized HxWx3 uint8 arrays
+
+        Args:
+            before: Original photo on the common grid
+            after: Rendering on the common grid
+            mode: side_by_side, blend, wipe or diff
+            position: Blend weight of the rendering, or wipe split as a fraction of the width
+
+        Returns:
+            Composite as an HxWx3 uint8 array
+        """
+        position = min(1.0, max(0.0, position))
+
+        if mode == "side_by_side":
+            gap = np.full((before.shape[0], 8, 3), 255, dtype=np.uint8)
+            return np.concatenate([before, gap, after], axis=1)
+
+        if mode == "blend":
+            weight = int(round(position * 256))
+            mixed = before.astype(np.uint16) * (256 - weight) + after.astype(np.uint16) * weight
+            return (mixed >> 8).astype(np.uint8)
+
+        if mode == "wipe":
+            split = int(round(position * before.shape[1]))
+            out = after.copy()
+            out[:, :split] = before[:, :split]
+            out[:, max(0, split - 1):split + 1] = 255
+            return out
+
+        if mode == "diff":
+            # Largest per-channel change (uint8 throughout - max - min never underflows)
+            channels = np.maximum(before, after) - np.minimum(before, after)
+            delta = np.maximum(np.maximum(channels[..., 0], channels[..., 1]), channels[..., 2])
+            # Stretch so the strongest change maps to white, folded into a single LUT lookup
+            peak = max(int(delta.max()), 1)
+            heat = _HEATMAP[np.minimum(np.arange(256) * 255 // peak, 255)][delta]
+            # Over a dimmed (1/3) grayscale of the rendering so the room stays recognizable
+            rgb = after.astype(np.uint16)
+            gray = ((rgb[..., 0] * 26 + rgb[..., 1] * 50 + rgb[..., 2] * 10) >> 8).astype(np.uint8)
+            return np.maximum(heat, gray[..., None])
+
+        raise ValueError(f"Unknown composite mode '{mode}' (expected one of {', '.join(MODES)})")
+
+    def compose(
+        self,
+        before: Union[str, RoomImage],
+        after: str,
+        mode: str = "side_by_side",
+        position: float = 0.5
+    ) -> Dict[str, Any]:
+        """
+        Before/after composite of a room photo and its rendering, cached on disk
+
+        Args:
+            before: Original photo (path or RoomImage)
+            after: Rendered image path
+            mode: side_by_side, blend, wipe or diff
+            position: Blend weight / wipe split, 0.0-1.0 (ignored by side_by_side and diff)
+
+        Returns:
+            Dictionary containing:
+            - image_path: Composite JPEG
+            - mode: Mode used
+            - cached: Whether the composite already existed
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown composite mode '{mode}' (expected one of {', '.join(MODES)})")
+        if mode in ("side_by_side", "diff"):
+            position = 0.5
+        position = round(position, 2)
+
+        before_hash, before_data = _load(before)
+        after_hash, after_data = _load(after)
+        key = make_key(before_hash, after_hash, mode, position, self.max_edge)
+        path = os.path.join(self.cache_dir, f"{key}.jpg")
+
+        if os.path.exists(path):
+            self.hits += 1
+            return {"image_path": path, "mode": mode, "cached": True}
+
+        self.misses += 1
+        before_grid, after_grid = self._pair(before_hash, before_data, after_hash, after_data)
+        composite = self.render(before_grid, after_grid, mode, position)
+
+        buffered = io.BytesIO()
+        Image.fromarray(composite).save(buffered, format="JPEG", quality=85)
+        atomic_write(path, buffered.getvalue())
+        self._prune()
+
+        return {"image_path": path, "mode": mode, "cached": False}
+
+    def _prune(self) -> None:
+        """Remove the oldest composites beyond max_files"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.jpg'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_compositor = None
+_compositor_lock = threading.Lock()
+
+
+def get_compositor() -> Compositor:
+    """Return the process-wide compositor"""
+    global _compositor
+    with _compositor_lock:
+        if _compositor is None:
+            _compositor = Compositor()
+        return _compositor
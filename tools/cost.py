@@ -0,0 +1,350 @@
+"""
+Cost Accounting - Token, image and dollar totals per run, user and day
+Every Gemini and CrewAI LLM call reports the token usage of its response;
+the current run's meter converts it to cost with config.MODEL_PRICES, and the
+ledger keeps one line per finished run for per-user and per-day totals
+"""
+import contextvars
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+from tools.tracing import set_attribute
+
+_current: contextvars.ContextVar[Optional["CostMeter"]] = contextvars.ContextVar("cost_meter", default=None)
+
+
+def _price(model: str) -> Dict[str, float]:
+    # CrewAI/LiteLLM names carry a provider prefix ("gemini/gemini-2.0-flash-exp")
+    name = model.rsplit('/', 1)[-1]
+    return config.MODEL_PRICES.get(name, config.MODEL_PRICES['default'])
+
+
+def call_cost(model: str, input_tokens: int = 0, output_tokens: int = 0, images: int = 0) -> float:
+    """
+    Dollar cost of one model call
+
+    Args:
+        model: Model name (provider prefixes are ignored)
+        input_tokens: Prompt tokens, images included
+        output_tokens: Response tokens
+        images: Generated images (image models are priced per image)
+
+    Returns:
+        Cost in USD
+    """
+    price = _price(model)
+    if images:
+        # The response tokens of an image call are the image itself, billed per image
+        output_tokens = 0
+    return (
+        input_tokens * price['input'] / 1_000_000
+        + output_tokens * price['output'] / 1_000_000
+        + images * price['image']
+    )
+
+
+def estimate_cost(calls: Iterable[str]) -> float:
+    """
+    Typical cost of calls not made yet
+
+    Args:
+        calls: Call names from config.COST_CALL_ESTIMATES (unknown names cost nothing)
+
+    Returns:
+        Estimated cost in USD
+    """
+    total = 0.0
+    for call in calls:
+        if call in config.COST_CALL_ESTIMATES:
+            total += call_cost(*config.COST_CALL_ESTIMATES[call])
+    return total
+
+
+class CostMeter:
+    """Running totals for one workflow run"""
+
+    def __init__(self, run_id: str, user_id: str, ceiling: float):
+        self.run_id = run_id
+        self.user_id = user_id
+        self.ceiling = ceiling
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.images = 0
+        self.calls = 0
+        self.cost = 0.0
+        self.by_model: Dict[str, Dict[str, Any]] = {}
+        self.skipped: List[str] = []
+        # Calls the run's unfinished stages are still expected to make (name -> count)
+        self.expected: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, input_tokens: int = 0, output_tokens: int = 0, images: int = 0) -> float:
+        """Add one call to the totals; returns its cost"""
+        cost = call_cost(model, input_tokens, output_tokens, images)
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.images += images
+            self.calls += 1
+            self.cost += cost
+            entry = self.by_model.setdefault(model, {
+                "calls": 0, "input_tokens": 0, "output_tokens": 0, "images": 0, "cost_usd": 0.0
+            })
+            entry["calls"] += 1
+            entry["input_tokens"] += input_tokens
+            entry["output_tokens"] += output_tokens
+            entry["images"] += images
+            entry["cost_usd"] += cost
+        return cost
+
+    def expect(self, calls: Iterable[str]) -> None:
+        """Announce calls a stage is going to make (see config.COST_CALL_ESTIMATES)"""
+        with self._lock:
+            for call in calls:
+                self.expected[call] = self.expected.get(call, 0) + 1
+
+    def settle(self, calls: Iterable[str]) -> None:
+        """Drop calls announced with expect() once their stage has finished"""
+        with self._lock:
+            for call in calls:
+                if self.expected.get(call, 0) > 1:
+                    self.expected[call] -= 1
+                else:
+                    self.expected.pop(call, None)
+
+    def projected_cost(self) -> float:
+        """Spend so far plus the typical cost of the calls still expected"""
+        with self._lock:
+            remaining = [call for call, count in self.expected.items() for _ in range(count)]
+            spent = self.cost
+        return spent + estimate_cost(remaining)
+
+    def near_ceiling(self) -> bool:
+        """Whether the projected cost has reached config.COST_SKIP_OPTIONAL_FRACTION of the ceiling"""
+        return self.projected_cost() >= self.ceiling * config.COST_SKIP_OPTIONAL_FRACTION
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "user_id": self.user_id,
+                "cost_usd": round(self.cost, 6),
+                "ceiling_usd": self.ceiling,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "images": self.images,
+                "calls": self.calls,
+                "by_model": {
+                    model: dict(entry, cost_usd=round(entry["cost_usd"], 6))
+                    for model, entry in self.by_model.items()
+                },
+                "skipped_optional": list(self.skipped)
+            }
+
+
+def current_meter() -> Optional[CostMeter]:
+    """Meter of the run in progress in this context, if any"""
+    return _current.get()
+
+
+@contextmanager
+def start_run(user_id: Optional[str] = None, ceiling: Optional[float] = None) -> Iterator[CostMeter]:
+    """
+    Meter every model call made inside the block as one run
+
+    The meter travels with the context (pipeline threads and the shared event
+    loop copy it), and the finished run is appended to the cost ledger.
+
+    Args:
+        user_id: Who the run is billed to (defaults to config.DEFAULT_USER_ID)
+        ceiling: Cost ceiling in USD (defaults to config.TARGET_COST_PER_RUN)
+    """
+    meter = CostMeter(
+        uuid.uuid4().hex[:12],
+        user_id or config.DEFAULT_USER_ID,
+        ceiling if ceiling is not None else config.TARGET_COST_PER_RUN
+    )
+    token = _current.set(meter)
+    try:
+        yield meter
+    finally:
+        _current.reset(token)
+        try:
+            get_cost_ledger().record(meter)
+        except OSError as e:
+            print(f"⚠️ Could not write cost ledger: {e}")
+
+
+def record_tokens(model: str, input_tokens: int = 0, output_tokens: int = 0, images: int = 0) -> float:
+    """
+    Charge a call to the current run (no-op outside a run)
+
+    Returns:
+        Cost of the call in USD
+    """
+    meter = _current.get()
+    if meter is None:
+        return 0.0
+    cost = meter.record(model, input_tokens, output_tokens, images)
+    set_attribute("input_tokens", input_tokens)
+    set_attribute("output_tokens", output_tokens)
+    set_attribute("cost_usd", round(cost, 6))
+    return cost
+
+
+def record_usage(model: str, response: Any, images: int = 0) -> float:
+    """
+    Charge a model response to the current run from its usage_metadata
+
+    Works for tools.model_backend.ModelResponse as well as raw google-generativeai
+    and google-genai responses.
+
+    Args:
+        model: Model that produced the response
+        response: Response object
+        images: Images the response contained
+
+    Returns:
+        Cost of the call in USD
+    """
+    usage = getattr(response, 'usage_metadata', None)
+    return record_tokens(
+        model,
+        input_tokens=getattr(usage, 'prompt_token_count', 0) or 0,
+        output_tokens=getattr(usage, 'candidates_token_count', 0) or 0,
+        images=images
+    )
+
+
+def skip_optional(stage: str) -> bool:
+    """
+    Decide whether an optional stage should be skipped to stay under the run's ceiling
+
+    Compares spend so far plus the estimated cost of the calls the run's
+    unfinished stages still expect (the optional one included) to the ceiling.
+
+    Args:
+        stage: Name recorded in the run's skipped_optional list
+
+    Returns:
+        True when the current run is near its ceiling (the skip is recorded)
+    """
+    meter = _current.get()
+    if meter is None or not config.COST_ENFORCE_BUDGET or not meter.near_ceiling():
+        return False
+    with meter._lock:
+        meter.skipped.append(stage)
+    print(
+        f"💸 Skipping optional '{stage}' - run has spent ${meter.cost:.4f} and is projected to reach "
+        f"${meter.projected_cost():.4f} of its ${meter.ceiling:.2f} ceiling"
+    )
+    return True
+
+
+class CostLedger:
+    """Append-only record of finished runs, totalled per user and per day"""
+
+    def __init__(self, path: str = None):
+        """
+        Args:
+            path: JSON Lines file, one run per line (defaults to config.COST_LEDGER_PATH)
+        """
+        self.path = path or config.COST_LEDGER_PATH
+        self._lock = threading.Lock()
+        # Running totals per (user_id, day); raw entries are not kept
+        self._totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._seen = 0
+        self._offset = 0
+
+    def record(self, meter: CostMeter) -> Dict[str, Any]:
+        """Append a finished run; returns its ledger entry"""
+        now = datetime.now()
+        entry = meter.to_dict()
+        entry.pop("by_model")
+        entry.update({"timestamp": now.isoformat(), "day": now.strftime("%Y-%m-%d")})
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._lock:
+            # One short line per write, so concurrent processes don't interleave
+            # Binary mode: no newline translation, so _refresh's byte offsets hold on Windows too
+            with open(self.path, 'ab') as f:
+                f.write((json.dumps(entry) + "\n").encode('utf-8'))
+        return entry
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        self._seen += 1
+        totals = self._totals.setdefault((entry.get("user_id"), entry.get("day")), {
+            "runs": 0, "cost_usd": 0.0, "input_tokens": 0, "output_tokens": 0, "images": 0,
+            "last_run": None, "_seq": 0
+        })
+        totals["runs"] += 1
+        totals["cost_usd"] += entry.get("cost_usd", 0.0)
+        totals["input_tokens"] += entry.get("input_tokens", 0)
+        totals["output_tokens"] += entry.get("output_tokens", 0)
+        totals["images"] += entry.get("images", 0)
+        totals["last_run"] = entry
+        totals["_seq"] = self._seen
+
+    def _refresh(self) -> List[Dict[str, Any]]:
+        # Only read what other writers appended since the last call
+        with self._lock:
+            if os.path.exists(self.path):
+                with open(self.path, 'rb') as f:
+                    f.seek(self._offset)
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        self._offset += len(line)
+                        try:
+                            self._add(json.loads(line.decode('utf-8')))
+                        except (UnicodeDecodeError, json.JSONDecodeError):
+                            continue
+            return [dict(totals, user_id=user, day=day) for (user, day), totals in self._totals.items()]
+
+    def totals(self, user_id: Optional[str] = None, day: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Aggregate recorded runs
+
+        Args:
+            user_id: Only this user's runs (default: everyone)
+            day: Only this day, YYYY-MM-DD (default: all days)
+
+        Returns:
+            Dictionary containing runs, cost_usd, input_tokens, output_tokens, images
+            and last_run (the most recent matching entry, or None)
+        """
+        groups = [
+            g for g in self._refresh()
+            if (user_id is None or g["user_id"] == user_id) and (day is None or g["day"] == day)
+        ]
+        latest = max(groups, key=lambda g: g["_seq"], default=None)
+        return {
+            "runs": sum(g["runs"] for g in groups),
+            "cost_usd": round(sum(g["cost_usd"] for g in groups), 6),
+            "input_tokens": sum(g["input_tokens"] for g in groups),
+            "output_tokens": sum(g["output_tokens"] for g in groups),
+            "images": sum(g["images"] for g in groups),
+            "last_run": latest["last_run"] if latest else None
+        }
+
+    def today(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """totals() for the current day"""
+        return self.totals(user_id=user_id, day=datetime.now().strftime("%Y-%m-%d"))
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_cost_ledger() -> CostLedger:
+    """Return the process-wide cost ledger"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = CostLedger()
+        return _ledger
@@ -0,0 +1,252 @@
+"""
+File Handles - Upload a reference photo once, reference it by handle afterwards
+Analysis, the rendering description and the Nano Banana transformation all send
+the same photo; with a file service the bytes travel once and every later call
+carries a short URI instead. Falls back to inline bytes when no handle exists.
+"""
+import abc
+import asyncio
+import io
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import config
+from tools.cache import get_cache, make_key
+from tools.image_prep import as_blob
+from tools.room_image import RoomImage
+from tools.tracing import record_bytes, span
+
+
+class FileService(abc.ABC):
+    """Interface for a remote file store that returns reusable handles"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def upload(self, data: bytes, mime_type: str, display_name: str) -> Dict[str, Any]:
+        """
+        Upload file bytes
+
+        Args:
+            data: File contents
+            mime_type: MIME type of data
+            display_name: Human-readable name shown by the service
+
+        Returns:
+            Handle dictionary containing:
+            - uri: Reference to pass to model calls
+            - name: Service-side file name
+            - mime_type: MIME type of the stored file
+            - expires_at: Unix time after which the handle is no longer valid
+        """
+
+
+class GeminiFileService(FileService):
+    """Gemini Files API (files are kept for 48 hours)"""
+
+    name = "gemini"
+
+    def __init__(self):
+        import google.generativeai as genai
+        genai.configure(api_key=config.GOOGLE_API_KEY)
+        self._genai = genai
+
+    def upload(self, data: bytes, mime_type: str, display_name: str) -> Dict[str, Any]:
+        file = self._genai.upload_file(io.BytesIO(data), mime_type=mime_type, display_name=display_name)
+        expiration = getattr(file, "expiration_time", None)
+        return {
+            "uri": file.uri,
+            "name": file.name,
+            "mime_type": file.mime_type or mime_type,
+            "expires_at": expiration.timestamp() if expiration else time.time() + config.FILE_HANDLE_TTL_SECONDS
+        }
+
+
+class LocalFileService(FileService):
+    """Stand-in file service backed by a local directory (for tests and offline runs)"""
+
+    name = "local"
+
+    def __init__(self, directory: Optional[str] = None, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            directory: Where uploaded files are written (defaults to temp/files)
+            ttl_seconds: Lifetime of returned handles (defaults to config.FILE_HANDLE_TTL_SECONDS)
+        """
+        self.directory = directory or os.path.join('temp', 'files')
+        self.ttl_seconds = config.FILE_HANDLE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.uploads = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def upload(self, data: bytes, mime_type: str, display_name: str) -> Dict[str, Any]:
+        path = os.path.abspath(os.path.join(self.directory, display_name))
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.uploads += 1
+        return {
+            "uri": f"file://{path}",
+            "name": display_name,
+            "mime_type": mime_type,
+            "expires_at": time.time() + self.ttl_seconds
+        }
+
+    @staticmethod
+    def read(handle: Dict[str, Any]) -> bytes:
+        """Contents behind a handle this service returned"""
+        with open(handle["uri"][len("file://"):], 'rb') as f:
+            return f.read()
+
+
+class FileHandleCache:
+    """Uploads each reference photo once per service and reuses the handle until it expires"""
+
+    def __init__(self, service: FileService):
+        """
+        Args:
+            service: File service to upload to
+        """
+        self.service = service
+        # Handles outlive the process (Gemini keeps files 48h), so persist them when caching is on
+        self.disk_cache = get_cache(
+            'file_handles',
+            max_entries=config.FILE_HANDLE_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.FILE_HANDLE_TTL_SECONDS
+        ) if config.CACHE_ENABLED else None
+        self.uploads = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self._handles: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # key -> time of the last failed upload; those photos go inline until the retry delay passes
+        self._failed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, room: RoomImage) -> str:
+        # The normalized payload is what gets uploaded, so its settings are part of the key
+        return make_key(
+            self.service.name, room.content_hash,
+            config.IMAGE_MAX_EDGE, config.IMAGE_UPLOAD_FORMAT, config.IMAGE_UPLOAD_QUALITY
+        )
+
+    @staticmethod
+    def _is_valid(handle: Optional[Dict[str, Any]]) -> bool:
+        # Leave a margin so a handle never expires between lookup and use
+        return bool(handle) and handle["expires_at"] - config.FILE_HANDLE_EXPIRY_MARGIN_SECONDS > time.time()
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            handle = self._handles.get(key)
+        if not self._is_valid(handle) and self.disk_cache:
+            handle = self.disk_cache.get(key)
+        return handle if self._is_valid(handle) else None
+
+    def _store(self, key: str, handle: Dict[str, Any]) -> None:
+        with self._lock:
+            self._handles[key] = handle
+        if self.disk_cache:
+            self.disk_cache.set(key, handle)
+
+    async def get_handle_async(self, room: RoomImage) -> Optional[Dict[str, Any]]:
+        """
+        Handle for the room photo, uploading it on first use
+
+        Concurrent callers for the same photo share one upload.
+
+        Returns:
+            Handle dictionary (see FileService.upload), or None if the upload failed
+        """
+        key = await asyncio.to_thread(self._key, room)
+        handle = await asyncio.to_thread(self._lookup, key)
+        if handle:
+            self.hits += 1
+            return handle
+
+        pending = self._inflight.get(key)
+        if pending:
+            return await asyncio.shield(pending)
+
+        with self._lock:
+            failed_at = self._failed.get(key)
+        if failed_at is not None and time.time() - failed_at < config.FILE_HANDLE_RETRY_SECONDS:
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        handle = None
+        try:
+            payload = await asyncio.to_thread(lambda: room.normalized)
+            with span("files.upload", service=self.service.name):
+                handle = await asyncio.to_thread(
+                    self.service.upload, payload["data"], payload["mime_type"], key[:32]
+                )
+                record_bytes(sent=len(payload["data"]))
+            await asyncio.to_thread(self._store, key, handle)
+            with self._lock:
+                self._failed.pop(key, None)
+            self.uploads += 1
+            print(f"📤 Reference photo uploaded once ({len(payload['data']) // 1024} KB) - later calls send its handle")
+        except Exception as e:
+            with self._lock:
+                self._failed[key] = time.time()
+            print(f"⚠️ Reference upload failed, sending the photo inline: {e}")
+        finally:
+            future.set_result(handle)
+            del self._inflight[key]
+        return handle
+
+    async def reference_part_async(self, room: RoomImage) -> Dict[str, Any]:
+        """google-generativeai content part for the photo: file_data when a handle exists, else inline bytes"""
+        handle = await self.get_handle_async(room)
+        if handle:
+            return {"file_data": {"file_uri": handle["uri"], "mime_type": handle["mime_type"]}}
+        self.fallbacks += 1
+        payload = await asyncio.to_thread(lambda: room.normalized)
+        return as_blob(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        """Upload, reuse and inline-fallback counts"""
+        return {
+            "service": self.service.name,
+            "uploads": self.uploads,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks
+        }
+
+
+_handles: Optional[FileHandleCache] = None
+_handles_failed = False
+_handles_lock = threading.Lock()
+
+
+def get_file_handles() -> Optional[FileHandleCache]:
+    """Return the process-wide handle cache for config.FILE_SERVICE, or None when uploads are disabled"""
+    global _handles, _handles_failed
+    # Gemini can only read its own uploads, and recordings are keyed on image content,
+    # which a Gemini URI is not; the local stand-in's file:// handles are resolved back
+    # to bytes by the offline (fake and replay) backends
+    if config.FILE_SERVICE == "gemini" and config.MODEL_BACKEND != "gemini":
+        return None
+    if config.FILE_SERVICE == "local" and config.MODEL_BACKEND not in ("fake", "replay"):
+        return None
+    if config.FILE_SERVICE not in ("gemini", "local"):
+        return None
+    with _handles_lock:
+        if _handles is None and not _handles_failed:
+            try:
+                service = LocalFileService() if config.FILE_SERVICE == "local" else GeminiFileService()
+                _handles = FileHandleCache(service)
+            except Exception as e:
+                print(f"⚠️ File service unavailable, reference photos will be sent inline: {e}")
+                _handles_failed = True
+        return _handles
+
+
+async def reference_part_async(room: RoomImage) -> Dict[str, Any]:
+    """Content part for a reference photo - a file handle when available, inline bytes otherwise"""
+    handles = get_file_handles()
+    if handles is None:
+        payload = await asyncio.to_thread(lambda: room.normalized)
+        return as_blob(payload)
+    return await handles.reference_part_async(room)
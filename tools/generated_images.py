@@ -0,0 +1,72 @@
+"""
+Generated Images - Persist model image output in the configured format
+Renders are encoded once (tools.image_encoding, config.RENDER_OUTPUT_FORMAT)
+and written to disk; base64 is only produced when a caller actually asks for it
+"""
+import base64
+import os
+from typing import Any, Dict, Optional
+
+from tools.image_encoding import encode_image, run_in_encode_pool
+from tools.previews import create_previews
+from tools.storage import save_bytes
+
+RENDERED_IMAGES_DIR = os.path.join("output", "rendered_images")
+
+
+def save_generated_image(
+    data: bytes,
+    mime_type: Optional[str] = None,
+    prefix: str = "generated",
+    output_dir: str = RENDERED_IMAGES_DIR,
+    fmt: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Encode image bytes from a model response and write them to disk
+
+    Args:
+        data: Encoded image (inline_data.data)
+        mime_type: MIME type reported by the model (informational; the header is authoritative)
+        prefix: File name prefix
+        output_dir: Directory to write into
+        fmt: Output format override (defaults to config.RENDER_OUTPUT_FORMAT)
+
+    Returns:
+        Dictionary containing:
+        - image_path: Saved file (output_dir/<shard>/<prefix>_<timestamp>_<id><ext>)
+        - size: (width, height)
+        - mime_type: MIME type of the saved file
+        - bytes: File size
+        - source_bytes: Size of the image the model returned
+        - previews: {width: path} of the downscaled WebP previews
+    """
+    encoded = encode_image(data, fmt=fmt)
+
+    # Unique ID in a sharded subdirectory, written atomically
+    image_path = save_bytes(encoded["data"], output_dir, prefix, encoded["extension"])
+
+    try:
+        previews = create_previews(image_path)
+    except Exception as e:
+        print(f"⚠️ Could not create previews: {e}")
+        previews = {}
+
+    return {
+        "image_path": image_path,
+        "size": encoded["size"],
+        "mime_type": encoded["mime_type"],
+        "bytes": len(encoded["data"]),
+        "source_bytes": len(data),
+        "previews": previews
+    }
+
+
+async def save_generated_image_async(data: bytes, mime_type: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+    """save_generated_image on the encode worker pool, keeping encoding off the caller's thread"""
+    return await run_in_encode_pool(save_generated_image, data, mime_type, **kwargs)
+
+
+def image_base64(image_path: str) -> str:
+    """Base64 of a saved image, for callers that embed it (JSON payloads, data URLs)"""
+    with open(image_path, 'rb') as f:
+        return base64.b64encode(f.read()).decode()
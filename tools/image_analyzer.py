@@ -2,25 +2,97 @@
 Image Analyzer Tool - Gemini Vision Wrapper
 Analyzes room photos to extract room type, features, style, and dimensions
 """
-import google.generativeai as genai
-from PIL import Image
+import asyncio
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Union
 import config
+from tools.async_utils import run_sync
+from tools.cache import get_cache, make_key
+from tools.cost import record_usage
+from tools.file_handles import reference_part_async
+from tools.model_backend import get_model_backend
+from tools.perceptual_index import dhash, get_perceptual_index
+from tools.room_image import RoomImage
+from tools.tracing import payload_bytes, record_bytes, set_attribute, traced
+
+# Detailed analysis prompt (part of the cache key, so edits invalidate old entries)
+ANALYSIS_PROMPT = """Analyze this room photo and provide a detailed assessment in JSON format.
+
+Please identify:
+1. room_type: (bedroom, living_room, kitchen, bathroom, dining_room, office, other)
+2. current_style: (modern, traditional, minimalist, industrial, farmhouse, eclectic, etc.)
+3. features: List all notable features you see (windows, doors, built-ins, fireplace, etc.)
+4. furniture: List current furniture pieces
+5. colors: Dominant colors in the space
+6. lighting: (natural, artificial, mixed, poor, good, excellent)
+7. dimensions_estimate: (small <100sqft, medium 100-200sqft, large 200-400sqft, very_large >400sqft)
+8. condition: (excellent, good, needs_refresh, needs_renovation)
+9. challenges: List any design challenges (awkward layout, limited light, etc.)
+10. opportunities: Design opportunities you see
+
+Return ONLY valid JSON, no other text."""
 
 class ImageAnalyzer:
     """Analyzes room images using Gemini Vision"""
 
     def __init__(self):
-        genai.configure(api_key=config.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel(config.GEMINI_VISION_MODEL)
+        self.backend = get_model_backend()
+        self.cache = get_cache(
+            'analysis',
+            max_entries=config.ANALYSIS_CACHE_MAX_ENTRIES,
+            max_bytes=config.ANALYSIS_CACHE_MAX_BYTES,
+            ttl_seconds=config.ANALYSIS_CACHE_TTL_SECONDS
+        ) if config.CACHE_ENABLED else None
+        self.phash_index = get_perceptual_index() if config.PHASH_INDEX_ENABLED else None
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the analysis cache and near-duplicate index"""
+        return {
+            "analysis": self.cache.stats() if self.cache else {"enabled": False},
+            "near_duplicates": self.phash_index.stats() if self.phash_index else {"enabled": False}
+        }
 
-    def analyze_room(self, image_path: str) -> Dict[str, Any]:
+    def _lookup(self, room: RoomImage):
+        """
+        Check the exact cache and near-duplicate index for a photo
+
+        Returns:
+            (cache_key, photo_hash, analysis or None)
+        """
+        cache_key = make_key(room.content_hash, ANALYSIS_PROMPT, config.GEMINI_VISION_MODEL)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print("⚡ Analysis cache hit - skipping Gemini Vision call")
+                return cache_key, None, cached
+
+        # Re-compressed re-uploads miss the byte cache - try a near-duplicate lookup
+        photo_hash = None
+        if self.phash_index:
+            photo_hash = dhash(room.data)
+            match = self.phash_index.find(photo_hash)
+            if match:
+                print(f"⚡ Near-duplicate photo (distance {match['distance']}) - reusing stored analysis")
+                analysis = match['analysis']
+                if self.cache:
+                    self.cache.set(cache_key, analysis)
+                return cache_key, photo_hash, analysis
+
+        return cache_key, photo_hash, None
+
+    def _store(self, cache_key: str, photo_hash: Optional[int], analysis: Dict[str, Any]) -> None:
+        """Record a fresh analysis in the exact cache and near-duplicate index"""
+        if self.cache:
+            self.cache.set(cache_key, analysis)
+        if self.phash_index:
+            self.phash_index.add(photo_hash, analysis)
+
+    def analyze_room(self, image_path: Union[str, RoomImage]) -> Dict[str, Any]:
         """
         Analyze a room photo and extract structured information
 
         Args:
-            image_path: Path to the room photo
+            image_path: Path to the room photo, or an already loaded RoomImage
 
         Returns:
             Dictionary containing room analysis:
@@ -31,29 +103,28 @@ class ImageAnalyzer:
             - lighting: lighting conditions
             - challenges: potential design challenges
         """
-        try:
-            # Load image
-            img = Image.open(image_path)
+        return run_sync(self.analyze_room_async(image_path))
 
-            # Create detailed analysis prompt
-            prompt = """Analyze this room photo and provide a detailed assessment in JSON format.
-
-Please identify:
-1. room_type: (bedroom, living_room, kitchen, bathroom, dining_room, office, other)
-2. current_style: (modern, traditional, minimalist, industrial, farmhouse, eclectic, etc.)
-3. features: List all notable features you see (windows, doors, built-ins, fireplace, etc.)
-4. furniture: List current furniture pieces
-5. colors: Dominant colors in the space
-6. lighting: (natural, artificial, mixed, poor, good, excellent)
-7. dimensions_estimate: (small <100sqft, medium 100-200sqft, large 200-400sqft, very_large >400sqft)
-8. condition: (excellent, good, needs_refresh, needs_renovation)
-9. challenges: List any design challenges (awkward layout, limited light, etc.)
-10. opportunities: Design opportunities you see
+    @traced("gemini.analyze_room")
+    async def analyze_room_async(self, image_path: Union[str, RoomImage]) -> Dict[str, Any]:
+        """Async version of analyze_room - no thread is held while the vision call is in flight"""
+        try:
+            # Disk reads and hashing run off the event loop
+            room = await asyncio.to_thread(RoomImage.coerce, image_path)
+            image_path = room.path
+            cache_key, photo_hash, analysis = await asyncio.to_thread(self._lookup, room)
+            if analysis is not None:
+                set_attribute("cache_hit", True)
+                analysis['image_path'] = image_path
+                return analysis
 
-Return ONLY valid JSON, no other text."""
+            # Downscaled, oriented copy - uploaded once and referenced by handle where possible
+            image_part = await reference_part_async(room)
 
             # Call Gemini Vision API
-            response = self.model.generate_content([prompt, img])
+            response = await self.backend.generate(config.GEMINI_VISION_MODEL, [ANALYSIS_PROMPT, image_part], kind="json")
+            record_bytes(sent=payload_bytes(ANALYSIS_PROMPT, image_part), received=len(response.text))
+            record_usage(config.GEMINI_VISION_MODEL, response)
 
             # Parse JSON response
             result_text = response.text.strip()
@@ -69,9 +140,13 @@ Return ONLY valid JSON, no other text."""
             analysis = json.loads(result_text.strip())
 
             # Add metadata
-            analysis['image_path'] = image_path
             analysis['model_used'] = config.GEMINI_VISION_MODEL
 
+            # Cache before attaching the path - the same photo may be uploaded under many names
+            await asyncio.to_thread(self._store, cache_key, photo_hash, analysis)
+
+            analysis['image_path'] = image_path
+
             return analysis
 
         except json.JSONDecodeError as e:
@@ -0,0 +1,144 @@
+"""
+Image Encoding - Configurable output format for rendered images
+Model renders arrive as lossless PNG; this re-encodes them to the format set in
+config.py (WebP, AVIF, progressive JPEG, ...) on a small dedicated worker pool
+"""
+import asyncio
+import concurrent.futures
+import io
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from PIL import Image, features
+
+import config
+from tools.image_prep import reduce_decode
+
+# format -> (mime type, file extension, encode function(image, quality) -> bytes)
+_ENCODERS: Dict[str, Any] = {}
+
+_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_warned = set()
+
+
+def register_encoder(fmt: str, mime_type: str, extension: str, encode: Callable[[Image.Image, int], bytes]) -> None:
+    """
+    Add or replace an output format
+
+    Args:
+        fmt: Format name used in config.RENDER_OUTPUT_FORMAT (case-insensitive)
+        mime_type: MIME type of the encoded output
+        extension: File extension including the dot
+        encode: Function taking a decoded image and quality (1-100), returning encoded bytes
+    """
+    _ENCODERS[fmt.upper()] = (mime_type, extension, encode)
+
+
+def _save(img: Image.Image, fmt: str, **params) -> bytes:
+    buffered = io.BytesIO()
+    img.save(buffered, format=fmt, **params)
+    return buffered.getvalue()
+
+
+def _encode_png(img: Image.Image, quality: int) -> bytes:
+    return _save(img, "PNG", compress_level=6)
+
+
+def _encode_webp(img: Image.Image, quality: int) -> bytes:
+    return _save(img, "WEBP", quality=quality, method=4)
+
+
+def _encode_avif(img: Image.Image, quality: int) -> bytes:
+    return _save(img, "AVIF", quality=quality, speed=8)
+
+
+def _encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return _save(img, "JPEG", quality=quality, optimize=True, progressive=True)
+
+
+register_encoder("PNG", "image/png", ".png", _encode_png)
+register_encoder("WEBP", "image/webp", ".webp", _encode_webp)
+register_encoder("AVIF", "image/avif", ".avif", _encode_avif)
+register_encoder("JPEG", "image/jpeg", ".jpg", _encode_jpeg)
+
+
+def output_extensions() -> tuple:
+    """File extensions encode_image can produce, one per registered format"""
+    return tuple(sorted({extension for _, extension, _ in _ENCODERS.values()}))
+
+
+def _available(fmt: str) -> bool:
+    if fmt == "AVIF":
+        return features.check("avif")
+    return fmt in _ENCODERS
+
+
+def encode_image(
+    data: bytes,
+    fmt: Optional[str] = None,
+    quality: Optional[int] = None,
+    strip_metadata: Optional[bool] = None
+) -> Dict[str, Any]:
+    """
+    Re-encode image bytes into the configured output format
+
+    Args:
+        data: Encoded image (e.g. the PNG a model returned)
+        fmt: Output format name, or "ORIGINAL" to keep data as-is (defaults to config.RENDER_OUTPUT_FORMAT)
+        quality: Encoder quality 1-100 (defaults to config.RENDER_OUTPUT_QUALITY)
+        strip_metadata: Drop EXIF/ICC/text chunks (defaults to config.RENDER_STRIP_METADATA)
+
+    Returns:
+        Dictionary containing:
+        - data: Encoded bytes
+        - mime_type / extension / format: Describe data
+        - size: (width, height)
+    """
+    fmt = (fmt or config.RENDER_OUTPUT_FORMAT).upper()
+    quality = quality or config.RENDER_OUTPUT_QUALITY
+    strip_metadata = config.RENDER_STRIP_METADATA if strip_metadata is None else strip_metadata
+
+    if fmt != "ORIGINAL" and not _available(fmt):
+        if fmt not in _warned:
+            print(f"⚠️ {fmt} encoding not available in this Pillow build - saving WEBP instead")
+            _warned.add(fmt)
+        fmt = "WEBP"
+
+    with Image.open(io.BytesIO(data)) as img:
+        source_format = img.format
+        size = img.size
+
+        # Nothing to convert - keep the model's bytes untouched
+        if fmt == "ORIGINAL" or (fmt == source_format and not strip_metadata):
+            fmt = source_format if source_format in _ENCODERS else "PNG"
+            mime_type, extension, _ = _ENCODERS[fmt]
+            return {"data": data, "mime_type": mime_type, "extension": extension, "format": fmt, "size": size}
+
+        reduce_decode(img)
+        img.load()
+        if strip_metadata:
+            img.info = {}
+        mime_type, extension, encode = _ENCODERS[fmt]
+        encoded = encode(img, quality)
+
+    return {"data": encoded, "mime_type": mime_type, "extension": extension, "format": fmt, "size": size}
+
+
+def get_encode_pool() -> concurrent.futures.ThreadPoolExecutor:
+    """Process-wide worker pool for encoding (Pillow releases the GIL while encoding)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=config.ENCODE_WORKERS,
+                thread_name_prefix="image-encode"
+            )
+        return _pool
+
+
+async def run_in_encode_pool(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Await fn(*args, **kwargs) on the encode pool without blocking the event loop"""
+    return await asyncio.wrap_future(get_encode_pool().submit(fn, *args, **kwargs))
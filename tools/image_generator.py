@@ -2,21 +2,36 @@
 Image Generator Tool - Nano Banana (Gemini Image) Wrapper
 Generates photorealistic room renderings based on analysis and design brief
 """
-import google.generativeai as genai
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 import config
+import asyncio
 import base64
 import io
-from PIL import Image
+import time
+from tools.async_utils import run_sync
+from tools.cache import get_cache, make_key
+from tools.cost import record_usage, skip_optional
+from tools.file_handles import reference_part_async
+from tools.generated_images import save_generated_image
+from tools.model_backend import get_model_backend
+from tools.room_image import RoomImage
+from tools.tracing import payload_bytes, record_bytes, set_attribute, traced
 
 class ImageGenerator:
     """Generates photorealistic room renderings using Google's Image Generation"""
 
     def __init__(self):
-        genai.configure(api_key=config.GOOGLE_API_KEY)
+        self.backend = get_model_backend()
         # Use text model for generating descriptions, vision model for analyzing images
-        self.text_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        self.vision_model = genai.GenerativeModel(config.GEMINI_VISION_MODEL)
+        self.text_model_name = 'gemini-2.0-flash-exp'
+
+        # Text descriptions feed the budget crew task, so caching them keeps that task
+        # (and its crew cache key) stable across repeat runs
+        self.description_cache = get_cache(
+            'descriptions',
+            max_entries=config.CREW_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.CREW_CACHE_TTL_SECONDS
+        ) if config.CREW_CACHE_ENABLED else None
 
         # Initialize Nano Banana for actual image generation
         try:
@@ -42,40 +57,24 @@ class ImageGenerator:
     def _generate_image_with_imagen(self, prompt: str, reference_image_path: Optional[str] = None):
         """Generate actual image using Google's Imagen"""
         try:
-            from google.generativeai import ImageGenerationModel
-            import requests
-            from datetime import datetime
-
-            # Initialize Imagen model
-            imagen_model = ImageGenerationModel.from_pretrained("imagen-3.0-generate-001")
-
-            # Generate image
+            model = "imagen-3.0-generate-001"
+            parts = [prompt]
             if reference_image_path:
-                # Use reference image if provided
-                with open(reference_image_path, 'rb') as f:
-                    reference_img = Image.open(f)
-                    images = imagen_model.edit_image(
-                        prompt=prompt,
-                        base_image=reference_img,
-                        number_of_images=1
-                    )
-            else:
-                # Generate from scratch
-                images = imagen_model.generate_images(
-                    prompt=prompt,
-                    number_of_images=1
-                )
+                # Edit the reference photo instead of generating from scratch
+                parts.append(run_sync(reference_part_async(RoomImage.coerce(reference_image_path))))
 
-            # Save generated image
-            os.makedirs("output/rendered_images", exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            image_path = f"output/rendered_images/transformation_{timestamp}.png"
+            response = run_sync(self.backend.generate(model, parts, kind="image"))
+            record_usage(model, response, images=1 if response.image is not None else 0)
+            if response.image is None:
+                raise ValueError("No image data in response")
 
-            images[0].save(image_path)
+            # Save generated image in the configured output format
+            saved = save_generated_image(response.image, response.mime_type, prefix="transformation")
 
             return {
                 "success": True,
-                "image_path": image_path,
+                "image_path": saved["image_path"],
+                "previews": saved["previews"],
                 "method": "imagen"
             }
 
@@ -86,13 +85,103 @@ class ImageGenerator:
                 "method": "imagen"
             }
 
+    @staticmethod
+    async def _timed(coro, timeout: float):
+        """Await coro with a timeout and return (result, elapsed seconds)"""
+        start = time.perf_counter()
+        result = await asyncio.wait_for(coro, timeout)
+        return result, time.perf_counter() - start
+
+    @traced("gemini.describe")
+    async def _describe_rendering(
+        self,
+        prompt: str,
+        enhanced_prompt: Optional[str],
+        reference: Optional[RoomImage]
+    ) -> str:
+        """Write the text description of the transformed room (vision model when a reference photo is given)"""
+        if reference:
+            description_key = None
+            rendering_text = None
+            if self.description_cache:
+                image_hash = await asyncio.to_thread(lambda: reference.content_hash)
+                description_key = make_key(image_hash, enhanced_prompt, config.GEMINI_VISION_MODEL)
+                rendering_text = await asyncio.to_thread(self.description_cache.get, description_key)
+
+            if rendering_text:
+                print("⚡ Description cache hit - skipping vision model call")
+                set_attribute("cache_hit", True)
+            else:
+                # Text kind returns text only (any inline image parts are dropped)
+                image_part = await reference_part_async(reference)
+                response = await self.backend.generate(
+                    config.GEMINI_VISION_MODEL,
+                    [enhanced_prompt, image_part],
+                    kind="text",
+                    timeout=config.DESCRIPTION_TIMEOUT_SECONDS
+                )
+                record_bytes(sent=payload_bytes(enhanced_prompt, image_part))
+                record_usage(config.GEMINI_VISION_MODEL, response)
+
+                rendering_text = response.text
+
+                if not rendering_text:
+                    raise ValueError("No text content received from vision model")
+                record_bytes(received=payload_bytes(rendering_text))
+
+                if description_key:
+                    await asyncio.to_thread(self.description_cache.set, description_key, rendering_text)
+        else:
+            # Use text model for pure text generation without reference
+            description_key = make_key(prompt, self.text_model_name)
+            rendering_text = None
+            if self.description_cache:
+                rendering_text = await asyncio.to_thread(self.description_cache.get, description_key)
+
+            if rendering_text:
+                print("⚡ Description cache hit - skipping text model call")
+                set_attribute("cache_hit", True)
+            else:
+                response = await self.backend.generate(
+                    self.text_model_name,
+                    [prompt],
+                    kind="text",
+                    timeout=config.DESCRIPTION_TIMEOUT_SECONDS
+                )
+                rendering_text = response.text
+                record_bytes(sent=payload_bytes(prompt), received=payload_bytes(rendering_text))
+                record_usage(self.text_model_name, response)
+
+                if self.description_cache:
+                    await asyncio.to_thread(self.description_cache.set, description_key, rendering_text)
+
+        return rendering_text
+
+    async def _render_image(
+        self,
+        room_analysis: Dict[str, Any],
+        style: str,
+        custom_prompt: Optional[str],
+        reference: Optional[RoomImage],
+        regenerate: bool
+    ) -> Dict[str, Any]:
+        """Generate the transformed room image with Nano Banana"""
+        return await self.nano_banana.generate_room_transformation_async(
+            room_analysis=room_analysis,
+            style=style,
+            custom_prompt=custom_prompt,
+            reference_image_path=reference,
+            regenerate=regenerate
+        )
+
     def generate_rendering(
         self,
         room_analysis: Dict[str, Any],
         design_brief: str,
         style: str = "modern minimalist",
-        reference_image_path: Optional[str] = None,
-        custom_prompt: Optional[str] = None
+        reference_image_path: Optional[Union[str, RoomImage]] = None,
+        custom_prompt: Optional[str] = None,
+        regenerate: bool = False
     ) -> Dict[str, Any]:
         """
         Generate a photorealistic rendering of the renovated room
@@ -101,18 +190,42 @@ class ImageGenerator:
             room_analysis: Analysis from ImageAnalyzer
             design_brief: Description of desired changes
             style: Target design style
-            reference_image_path: Optional reference photo to maintain room structure
+            reference_image_path: Optional reference photo (path or RoomImage) to maintain room structure
             custom_prompt: Optional custom user prompt for specific design vision
+            regenerate: Request a different image variant than last time
 
         Returns:
             Dictionary containing:
             - success: bool
             - rendering_description: Text description of the rendering
             - prompt_used: The prompt sent to the model
-            - image_data: Base64 encoded image (when Imagen API available)
+            - image_path: Generated image on disk (tools.generated_images.image_base64 encodes it on demand)
+            - previews: {width: path} of downscaled WebP previews (tools.previews.preview_path picks one)
+            - mime_type: MIME type of image_path (config.RENDER_OUTPUT_FORMAT)
             - image_url: URL to generated image (when Imagen API available)
+            - latency: Per-call seconds for the description and the image, plus the stage total
         """
+        return run_sync(self.generate_rendering_async(
+            room_analysis, design_brief, style, reference_image_path, custom_prompt, regenerate
+        ))
+
+    @traced("tool.generate_rendering")
+    async def generate_rendering_async(
+        self,
+        room_analysis: Dict[str, Any],
+        design_brief: str,
+        style: str = "modern minimalist",
+        reference_image_path: Optional[Union[str, RoomImage]] = None,
+        custom_prompt: Optional[str] = None,
+        regenerate: bool = False
+    ) -> Dict[str, Any]:
+        """Async version of generate_rendering - both model calls are awaited on one event loop"""
         try:
+            # Load the reference photo once; the description and image calls share it
+            reference = None
+            if reference_image_path:
+                reference = await asyncio.to_thread(RoomImage.coerce, reference_image_path)
+
             # Build comprehensive prompt for photorealistic rendering
             room_type = room_analysis.get('room_type', 'room')
             features = room_analysis.get('features', [])
@@ -143,10 +256,8 @@ Create a stunning, magazine-quality rendering that the homeowner can use to make
             # Note: Current implementation generates detailed text descriptions
             # When Imagen-3 API is available, this will generate actual images
 
-            if reference_image_path:
-                # Use vision model to analyze reference image and create enhanced design
-                img = Image.open(reference_image_path)
-
+            enhanced_prompt = None
+            if reference:
                 # Incorporate custom prompt if provided
                 user_vision = f"\n\nUSER'S SPECIFIC VISION:\n{custom_prompt}\n" if custom_prompt else ""
 
@@ -179,65 +290,86 @@ Make this description so detailed and vivid that someone could visualize the tra
 
 Write at least 500 words."""
 
-                # Configure to return text only
-                response = self.vision_model.generate_content(
-                    [enhanced_prompt, img],
-                    generation_config=genai.types.GenerationConfig(
-                        response_mime_type="text/plain"
-                    )
-                )
-
-                # Extract text from response, handling potential inline_data
-                rendering_text = ""
-                for part in response.candidates[0].content.parts:
-                    if hasattr(part, 'text') and part.text:
-                        rendering_text += part.text
-
-                if not rendering_text:
-                    raise ValueError("No text content received from vision model")
+            image_gen_ready = self.image_gen_available and self.nano_banana
+            if image_gen_ready:
+                print("\n🎨 Generating description and transformed image with Nano Banana concurrently...")
             else:
-                # Use text model for pure text generation without reference
-                response = self.text_model.generate_content(prompt)
-                rendering_text = response.text
+                print("\n⚠️ Nano Banana not available - generating text description only")
+
+            # The description and the image are independent model calls, so the stage
+            # takes max() of the two instead of their sum
+            start = time.perf_counter()
+            image_task = asyncio.ensure_future(self._timed(
+                self._render_image(room_analysis, style, custom_prompt, reference, regenerate),
+                config.IMAGE_TIMEOUT_SECONDS
+            )) if image_gen_ready else None
+
+            try:
+                if image_task and skip_optional("description"):
+                    # Near the run's cost ceiling the image carries the design; the long write-up is dropped
+                    rendering_text = (
+                        f"{style.title()} transformation of this {room_type} - see the generated image. "
+                        "(Detailed description skipped to stay within the run's cost ceiling.)"
+                    )
+                    description_seconds = 0.0
+                else:
+                    rendering_text, description_seconds = await self._timed(
+                        self._describe_rendering(prompt, enhanced_prompt, reference),
+                        config.DESCRIPTION_TIMEOUT_SECONDS
+                    )
+            except BaseException as e:
+                # Without a description the rendering fails - don't leave the image call running
+                if image_task:
+                    image_task.cancel()
+                if isinstance(e, asyncio.TimeoutError):
+                    raise TimeoutError(f"Text description timed out after {config.DESCRIPTION_TIMEOUT_SECONDS}s")
+                raise
 
             # Try to generate actual image using Nano Banana
             generated_image_path = None
-            image_generation_note = "Text description only"
+            generated_previews = {}
+            generated_mime_type = None
+            image_seconds = None
 
-            if self.image_gen_available and self.nano_banana:
-                print("\n🎨 Generating actual transformed image with Nano Banana...")
-
-                # Use the room analysis and reference image to generate transformation
-                nano_result = self.nano_banana.generate_room_transformation(
-                    room_analysis=room_analysis,
-                    style=style,
-                    custom_prompt=custom_prompt,
-                    reference_image_path=reference_image_path
-                )
+            if image_task:
+                try:
+                    nano_result, image_seconds = await image_task
+                except asyncio.TimeoutError:
+                    nano_result = {"success": False, "error": f"timed out after {config.IMAGE_TIMEOUT_SECONDS}s"}
 
                 if nano_result.get("success"):
                     generated_image_path = nano_result.get("image_path")
+                    generated_previews = nano_result.get("previews", {})
+                    generated_mime_type = nano_result.get("mime_type")
                     image_generation_note = f"✅ Image generated with Nano Banana (Gemini 2.5 Flash Image)"
                     print(f"✅ Transformed image saved to: {generated_image_path}")
                 else:
                     image_generation_note = f"⚠️ Image generation failed: {nano_result.get('error')}"
                     print(image_generation_note)
             else:
-                print("\n⚠️ Nano Banana not available - generating text description only")
                 image_generation_note = "Text description only - Nano Banana initialization failed"
 
+            latency = {
+                "description_seconds": round(description_seconds, 3),
+                "image_seconds": round(image_seconds, 3) if image_seconds is not None else None,
+                "total_seconds": round(time.perf_counter() - start, 3)
+            }
+
             return {
                 "success": True,
                 "rendering_description": rendering_text,
-                "prompt_used": prompt if not reference_image_path else enhanced_prompt,
+                "prompt_used": prompt if not reference else enhanced_prompt,
                 "style": style,
                 "custom_prompt": custom_prompt,
-                "used_reference_image": reference_image_path is not None,
+                "used_reference_image": reference is not None,
                 "note": image_generation_note,
                 "room_type": room_type,
                 "image_path": generated_image_path,
+                "previews": generated_previews,
+                "mime_type": generated_mime_type,
                 "image_url": None,  # Local file path used instead
-                "image_gen_available": self.image_gen_available
+                "image_gen_available": self.image_gen_available,
+                "latency": latency
             }
 
         except Exception as e:
@@ -265,6 +397,15 @@ Write at least 500 words."""
         Returns:
             Refined rendering
         """
+        return run_sync(self.refine_rendering_async(previous_rendering, refinement_request))
+
+    @traced("gemini.refine_rendering")
+    async def refine_rendering_async(
+        self,
+        previous_rendering: Dict[str, Any],
+        refinement_request: str
+    ) -> Dict[str, Any]:
+        """Async version of refine_rendering"""
         try:
             prompt = f"""You previously generated this interior design rendering:
 
@@ -275,7 +416,9 @@ The user requests the following changes:
 
 Generate an updated photorealistic rendering incorporating these changes while maintaining the overall design vision."""
 
-            response = self.text_model.generate_content(prompt)
+            response = await self.backend.generate(self.text_model_name, [prompt], kind="text")
+            record_bytes(sent=payload_bytes(prompt), received=payload_bytes(response.text))
+            record_usage(self.text_model_name, response)
 
             return {
                 "success": True,
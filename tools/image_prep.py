@@ -0,0 +1,143 @@
+"""
+Image Prep - Normalize room photos before they are sent to a model
+Applies EXIF orientation, caps the long edge and re-encodes at a tuned quality,
+so every Gemini call uploads a few hundred KB instead of a multi-MB phone photo
+"""
+import io
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+import config
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+class DecodeLimitError(ValueError):
+    """Image is larger than the configured pixel limits"""
+
+
+def check_source_size(size: Tuple[int, int]) -> None:
+    """Raise DecodeLimitError if an image of this (width, height) exceeds config.MAX_SOURCE_PIXELS"""
+    width, height = size
+    if width * height > config.MAX_SOURCE_PIXELS:
+        raise DecodeLimitError(
+            f"Image is {width}x{height} ({width * height / 1e6:.0f} MP); "
+            f"the limit is {config.MAX_SOURCE_PIXELS / 1e6:.0f} MP"
+        )
+
+
+def reduce_decode(
+    img: Image.Image,
+    target_size: Optional[Tuple[int, int]] = None,
+    mode: str = 'RGB',
+    max_pixels: Optional[int] = None
+) -> None:
+    """
+    Prepare an opened (not yet loaded) image for a bounded decode
+
+    JPEGs are switched to DCT scaling - the decoder produces the smallest 1/2,
+    1/4 or 1/8 size still covering target_size, and never allocates the full
+    frame. Other formats decode at full size, so the pixel caps decide whether
+    they may be decoded at all.
+
+    Args:
+        img: Image from Image.open, before any pixel access
+        target_size: (width, height) the caller needs; None decodes at full size
+        mode: Mode hint for the JPEG decoder
+        max_pixels: Cap on decoded pixels (defaults to config.MAX_DECODE_PIXELS)
+
+    Raises:
+        DecodeLimitError: Source exceeds config.MAX_SOURCE_PIXELS, or the decode would exceed max_pixels
+    """
+    check_source_size(img.size)
+
+    if target_size:
+        img.draft(mode, target_size)
+
+    # After draft() the size is what the decoder will actually produce
+    width, height = img.size
+    max_pixels = max_pixels or config.MAX_DECODE_PIXELS
+    if width * height > max_pixels:
+        raise DecodeLimitError(
+            f"Decoding {img.format} at {width}x{height} needs {width * height / 1e6:.0f} MP; "
+            f"the per-request limit is {max_pixels / 1e6:.0f} MP"
+        )
+
+
+def normalize_image(
+    image_bytes: bytes,
+    max_edge: Optional[int] = None,
+    fmt: Optional[str] = None,
+    quality: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Downscale, orient and re-encode an encoded image for upload
+
+    Args:
+        image_bytes: Encoded photo (JPEG, PNG, WebP, ...)
+        max_edge: Longest allowed side in pixels (defaults to config.IMAGE_MAX_EDGE)
+        fmt: Output format, "JPEG" or "WEBP" (defaults to config.IMAGE_UPLOAD_FORMAT)
+        quality: Encoder quality 1-100 (defaults to config.IMAGE_UPLOAD_QUALITY)
+
+    Returns:
+        Dictionary containing:
+        - data: Encoded bytes to send to the model
+        - mime_type: MIME type of data
+        - size: (width, height) of the normalized image
+        - original_size / original_bytes: Dimensions and byte size of the input
+    """
+    max_edge = max_edge or config.IMAGE_MAX_EDGE
+    fmt = (fmt or config.IMAGE_UPLOAD_FORMAT).upper()
+    quality = quality or config.IMAGE_UPLOAD_QUALITY
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        original_size = img.size
+        source_format = img.format
+        orientation = img.getexif().get(0x0112, 1)
+
+        # Already small, upright and in the target format - re-encoding would only lose quality
+        if source_format == fmt and orientation == 1 and max(original_size) <= max_edge:
+            return {
+                "data": image_bytes,
+                "mime_type": _MIME_TYPES[fmt],
+                "size": original_size,
+                "original_size": original_size,
+                "original_bytes": len(image_bytes)
+            }
+
+        scale = min(1.0, max_edge / max(original_size))
+        # JPEG DCT scaling: decode at the smallest 1/2, 1/4 or 1/8 size still
+        # covering the target, which skips most of the full-resolution decode
+        reduce_decode(img, (int(original_size[0] * scale), int(original_size[1] * scale)) if scale < 1.0 else None)
+
+        img = ImageOps.exif_transpose(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if max(img.size) > max_edge:
+            img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        buffered = io.BytesIO()
+        if fmt == "WEBP":
+            img.save(buffered, format="WEBP", quality=quality, method=4)
+        else:
+            img.save(buffered, format="JPEG", quality=quality, optimize=True)
+        size = img.size
+
+    data = buffered.getvalue()
+    print(
+        f"🗜️ Normalized upload: {original_size[0]}x{original_size[1]} ({len(image_bytes) // 1024} KB) "
+        f"→ {size[0]}x{size[1]} {fmt} ({len(data) // 1024} KB)"
+    )
+    return {
+        "data": data,
+        "mime_type": _MIME_TYPES[fmt],
+        "size": size,
+        "original_size": original_size,
+        "original_bytes": len(image_bytes)
+    }
+
+
+def as_blob(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Inline-data part for google-generativeai generate_content calls"""
+    return {"mime_type": payload["mime_type"], "data": payload["data"]}
@@ -3,14 +3,11 @@ Imagen Integration for Actual Image Generation
 Uses Google's Imagen 4.0 to generate transformed room images
 """
 import sys
-import google.generativeai as genai
-import config
-from PIL import Image
-import os
-from datetime import datetime
 from typing import Dict, Any, Optional
-import base64
-import io
+from tools.async_utils import run_sync
+from tools.cost import record_usage
+from tools.generated_images import save_generated_image
+from tools.model_backend import get_model_backend
 
 # Fix UTF-8 encoding for Windows console
 if sys.platform == 'win32':
@@ -24,7 +21,7 @@ class ImagenGenerator:
     """Generate actual transformed room images using Imagen 4.0"""
 
     def __init__(self):
-        genai.configure(api_key=config.GOOGLE_API_KEY)
+        self.backend = get_model_backend()
         # Use Nano Banana (gemini-2.5-flash-image) as shown in the reference
         self.imagen_model_name = "gemini-2.5-flash-image"
         print(f"✅ Nano Banana (Gemini Image) initialized: {self.imagen_model_name}")
@@ -48,83 +45,42 @@ class ImagenGenerator:
         Returns:
             Dictionary with:
             - success: bool
-            - image_path: Path to saved image
-            - image_data: Base64 encoded image data
+            - image_path: Path to saved image (use tools.generated_images.image_base64 for base64)
+            - size: (width, height)
         """
         try:
             print(f"\n🎨 Generating image with Nano Banana (Gemini 2.5 Flash Image)...")
             print(f"📝 Prompt: {prompt[:100]}...")
 
-            # Use the Gemini image model with response_modalities for IMAGE output
-            model = genai.GenerativeModel(self.imagen_model_name)
-
-            # CRITICAL: Use response_modalities to get IMAGE output
-            # This is the key from the reference article!
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    response_modalities=["IMAGE"],  # Request IMAGE output!
-                    temperature=0.4,
-                )
-            )
-
-            # Extract image from response
-            if response.candidates and len(response.candidates) > 0:
-                candidate = response.candidates[0]
-
-                # Check if response contains image data
-                if candidate.content and candidate.content.parts:
-                    for part in candidate.content.parts:
-                        # Check for inline_data (image)
-                        if hasattr(part, 'inline_data') and part.inline_data:
-                            # Get image data
-                            image_data = part.inline_data.data
-
-                            # Convert to PIL Image
-                            image = Image.open(io.BytesIO(image_data))
-
-                            # Save image
-                            os.makedirs("output/rendered_images", exist_ok=True)
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            image_path = f"output/rendered_images/transformation_{timestamp}.png"
-
-                            image.save(image_path)
-
-                            print(f"✅ Image generated successfully!")
-                            print(f"📁 Saved to: {image_path}")
-
-                            # Encode to base64 for JSON storage
-                            buffered = io.BytesIO()
-                            image.save(buffered, format="PNG")
-                            img_base64 = base64.b64encode(buffered.getvalue()).decode()
-
-                            return {
-                                "success": True,
-                                "image_path": image_path,
-                                "image_data": img_base64,
-                                "model": self.imagen_model_name
-                            }
-
-            # If we get here, no image was generated - debug the response
-            print(f"\n🔍 Debug: Response structure:")
-            print(f"   Candidates: {len(response.candidates) if response.candidates else 0}")
-            if response.candidates:
-                print(f"   First candidate: {response.candidates[0]}")
-                if hasattr(response.candidates[0], 'content'):
-                    print(f"   Content: {response.candidates[0].content}")
-                    if hasattr(response.candidates[0].content, 'parts'):
-                        print(f"   Parts: {len(response.candidates[0].content.parts)}")
-                        for i, part in enumerate(response.candidates[0].content.parts):
-                            print(f"   Part {i}: {dir(part)}")
+            # Request IMAGE output from the Gemini image model (through the configured backend)
+            response = run_sync(self.backend.generate(
+                self.imagen_model_name, [prompt], kind="image", temperature=0.4
+            ))
+            record_usage(self.imagen_model_name, response, images=1 if response.image is not None else 0)
+
+            if response.image is not None:
+                # Encoded in config.RENDER_OUTPUT_FORMAT
+                saved = save_generated_image(response.image, response.mime_type, prefix="transformation")
+
+                print(f"✅ Image generated successfully!")
+                print(f"📁 Saved to: {saved['image_path']}")
+
+                return {
+                    "success": True,
+                    "image_path": saved["image_path"],
+                    "previews": saved["previews"],
+                    "mime_type": saved["mime_type"],
+                    "size": saved["size"],
+                    "model": self.imagen_model_name
+                }
+
+            # If we get here, no image was generated
+            print(f"\n🔍 Debug: no image in response (text: {response.text[:200]!r})")
 
             return {
                 "success": False,
                 "error": "No image data in response",
-                "response": str(response),
-                "debug_info": {
-                    "has_candidates": response.candidates is not None,
-                    "num_candidates": len(response.candidates) if response.candidates else 0
-                }
+                "response": response.text
             }
 
         except Exception as e:
@@ -0,0 +1,336 @@
+"""
+Memory Profiling - tracemalloc snapshots at workflow stage and run boundaries
+Reports the top allocation sites of each stage, what each run leaves allocated
+once it returns, and the sites that keep growing across repeated runs (images,
+base64 payloads, crew outputs and results held past their run).
+Allocations are attributed to the innermost line of this project on their
+stack, so memory allocated inside PIL or the model clients points at the call
+that asked for it.
+"""
+import contextvars
+import gc
+import json
+import os
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+import config
+from tools.storage import atomic_write
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>")
+)
+
+_current_run: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("memory_run", default=None)
+
+
+def _relative(filename: str) -> str:
+    if filename.startswith(_PROJECT_ROOT + os.sep):
+        return os.path.relpath(filename, _PROJECT_ROOT)
+    # Library code: keep the path from the package directory on
+    marker = f"site-packages{os.sep}"
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    if filename.startswith(_STDLIB + os.sep):
+        return os.path.relpath(filename, _STDLIB)
+    return filename
+
+
+def _is_project(filename: str) -> bool:
+    return filename.startswith(_PROJECT_ROOT + os.sep) and "site-packages" not in filename
+
+
+def _site(traceback: tracemalloc.Traceback) -> Dict[str, str]:
+    """Project line responsible for an allocation, and the line that made it"""
+    frames = list(reversed(traceback))  # most recent first
+    innermost = f"{_relative(frames[0].filename)}:{frames[0].lineno}"
+    for frame in frames:
+        if _is_project(frame.filename):
+            return {"site": f"{_relative(frame.filename)}:{frame.lineno}", "allocated_in": innermost}
+    return {"site": innermost, "allocated_in": innermost}
+
+
+def _group(stats) -> Dict[str, Dict[str, Any]]:
+    """Sum Statistic / StatisticDiff entries per project site"""
+    sites: Dict[str, Dict[str, Any]] = {}
+    for stat in stats:
+        where = _site(stat.traceback)
+        entry = sites.setdefault(where["site"], {
+            "site": where["site"], "allocated_in": where["allocated_in"],
+            "size": 0, "count": 0, "size_diff": 0, "count_diff": 0, "_largest": 0
+        })
+        entry["size"] += stat.size
+        entry["count"] += stat.count
+        entry["size_diff"] += getattr(stat, "size_diff", 0)
+        entry["count_diff"] += getattr(stat, "count_diff", 0)
+        # Name the library line that contributed most, not just the first seen
+        if stat.size > entry["_largest"]:
+            entry["_largest"] = stat.size
+            entry["allocated_in"] = where["allocated_in"]
+    return sites
+
+
+def _top(sites: Dict[str, Dict[str, Any]], key: str, top_n: int) -> List[Dict[str, Any]]:
+    ranked = sorted(sites.values(), key=lambda s: s[key], reverse=True)[:top_n]
+    return [
+        {
+            "site": s["site"],
+            "allocated_in": s["allocated_in"],
+            "size_kb": round(s["size"] / 1024, 1),
+            "size_diff_kb": round(s["size_diff"] / 1024, 1),
+            "count": s["count"],
+            "count_diff": s["count_diff"]
+        }
+        for s in ranked if s[key] > 0
+    ]
+
+
+class MemoryProfiler:
+    """tracemalloc session with stage deltas, per-run retained memory and leak candidates"""
+
+    def __init__(self, frames: int = None, top_n: int = None, report_path: Optional[str] = None):
+        """
+        Args:
+            frames: Stack depth recorded per allocation (defaults to config.PROFILE_MEMORY_FRAMES)
+            top_n: Allocation sites listed per stage and run (defaults to config.PROFILE_MEMORY_TOP_N)
+            report_path: Rewrite the JSON report here after every run (optional)
+        """
+        self.frames = frames or config.PROFILE_MEMORY_FRAMES
+        self.top_n = top_n or config.PROFILE_MEMORY_TOP_N
+        self.report_path = report_path
+        self.stages: Deque[Dict[str, Any]] = deque(maxlen=self.top_n * config.PROFILE_MEMORY_HISTORY)
+        self.runs: Deque[Dict[str, Any]] = deque(maxlen=config.PROFILE_MEMORY_HISTORY)
+        # Size per site at the end of each kept run, for leak detection
+        self._history: Deque[Dict[str, int]] = deque(maxlen=config.PROFILE_MEMORY_HISTORY)
+        self._last_sites: Dict[str, Dict[str, Any]] = {}
+        self._runs_started = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        """Start tracing allocations (no-op if already tracing)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            print(f"🧠 Memory profiling on ({self.frames} frames per allocation) - expect slower runs")
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+
+    def _snapshot(self, collect: bool = False) -> tracemalloc.Snapshot:
+        if collect:
+            # Only count what is still referenced, not garbage awaiting a cycle collection
+            gc.collect()
+        return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Record what a block allocated (and still holds) between its boundaries
+
+        Stages of one run overlap, so a stage's delta also includes whatever
+        the stages running beside it allocated in the meantime.
+
+        Args:
+            name: Stage name (e.g. "render")
+        """
+        before = self._snapshot()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            after = self._snapshot()
+            diff = after.compare_to(before, "traceback")
+            sites = _group(diff)
+            with self._lock:
+                self.stages.append({
+                    "run": _current_run.get(),
+                    "stage": name,
+                    "seconds": round(time.perf_counter() - start, 3),
+                    "delta_kb": round(sum(s["size_diff"] for s in sites.values()) / 1024, 1),
+                    "traced_mb": round(tracemalloc.get_traced_memory()[0] / (1024 * 1024), 1),
+                    "top_allocations": _top(sites, "size_diff", self.top_n)
+                })
+
+    @contextmanager
+    def run(self, label: str) -> Iterator[int]:
+        """
+        Record what one workflow run leaves allocated, and update leak candidates
+
+        Args:
+            label: Kind of run (e.g. "design_workflow")
+
+        Yields:
+            Run number, which stages recorded inside the block refer to
+        """
+        with self._lock:
+            self._runs_started += 1
+            number = self._runs_started
+        before = self._snapshot(collect=True)
+        tracemalloc.reset_peak()
+        token = _current_run.set(number)
+        try:
+            yield number
+        finally:
+            _current_run.reset(token)
+            peak = tracemalloc.get_traced_memory()[1]
+            after = self._snapshot(collect=True)
+            retained = _group(after.compare_to(before, "traceback"))
+            current = _group(after.statistics("traceback"))
+            with self._lock:
+                self.runs.append({
+                    "run": number,
+                    "label": label,
+                    "retained_kb": round(sum(s["size_diff"] for s in retained.values()) / 1024, 1),
+                    "traced_mb": round(sum(s["size"] for s in current.values()) / (1024 * 1024), 1),
+                    "peak_traced_mb": round(peak / (1024 * 1024), 1),
+                    "top_retained": _top(retained, "size_diff", self.top_n)
+                })
+                self._history.append({site: entry["size"] for site, entry in current.items()})
+                self._last_sites = current
+            if self.report_path:
+                try:
+                    atomic_write(self.report_path, json.dumps(self.report(), indent=2))
+                except OSError as e:
+                    print(f"⚠️ Could not write memory profile: {e}")
+
+    def leaks(self) -> List[Dict[str, Any]]:
+        """
+        Sites whose live size grew at the end of every kept run
+
+        Returns:
+            Largest growth first; empty until at least three runs have finished
+        """
+        with self._lock:
+            history = list(self._history)
+            last = dict(self._last_sites)
+        if len(history) < 3:
+            return []
+
+        candidates = []
+        for site, entry in last.items():
+            sizes = [run.get(site, 0) for run in history]
+            growth = sizes[-1] - sizes[0]
+            if growth < config.PROFILE_MEMORY_LEAK_MIN_KB * 1024:
+                continue
+            if all(later > earlier for earlier, later in zip(sizes, sizes[1:])):
+                candidates.append({
+                    "site": site,
+                    "allocated_in": entry["allocated_in"],
+                    "growth_kb": round(growth / 1024, 1),
+                    "growth_per_run_kb": round(growth / (len(sizes) - 1) / 1024, 1),
+                    "size_kb": [round(size / 1024, 1) for size in sizes]
+                })
+        return sorted(candidates, key=lambda c: c["growth_kb"], reverse=True)[:self.top_n]
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Profile so far as plain JSON-serializable data
+
+        Returns:
+            Dictionary containing:
+            - runs: Retained KB, live and peak traced MB and the top retaining sites per run
+            - stages: Allocation delta and top allocating sites per stage boundary
+            - largest: Biggest live sites at the end of the last run
+            - leaks: Sites that grew across every kept run (see leaks())
+        """
+        with self._lock:
+            runs = list(self.runs)
+            stages = list(self.stages)
+            largest = _top(self._last_sites, "size", self.top_n)
+        return {
+            "frames": self.frames,
+            "runs": runs,
+            "stages": stages,
+            "largest": largest,
+            "leaks": self.leaks()
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Console summary of MemoryProfiler.report()"""
+    lines = ["", "🧠 MEMORY PROFILE", "=" * 70]
+    for run in report["runs"]:
+        lines.append(
+            f"Run {run['run']} ({run['label']}): retained {run['retained_kb']:,.0f} KB, "
+            f"live {run['traced_mb']} MB, peak {run['peak_traced_mb']} MB"
+        )
+        stages = [s for s in report["stages"] if s["run"] == run["run"]]
+        for stage in stages:
+            lines.append(f"   stage {stage['stage']:<24}{stage['delta_kb']:>+12,.0f} KB")
+    lines.append("-" * 70)
+
+    def _sites(title: str, sites: List[Dict[str, Any]], key: str, sign: str) -> None:
+        if not sites:
+            return
+        lines.append(title)
+        for site in sites:
+            via = f"  (in {site['allocated_in']})" if site["allocated_in"] != site["site"] else ""
+            lines.append(f"   {site[key]:>{sign}10,.0f} KB  {site['site']}{via}")
+
+    if report["runs"]:
+        _sites("Top retainers of the last run:", report["runs"][-1]["top_retained"], "size_diff_kb", "+")
+    _sites("Largest live allocations:", report["largest"], "size_kb", "")
+    if report["leaks"]:
+        lines.append("⚠️ Growing across every run (leak candidates):")
+        for leak in report["leaks"]:
+            lines.append(
+                f"   {leak['growth_per_run_kb']:>+10,.0f} KB/run  {leak['site']}  (in {leak['allocated_in']})"
+            )
+    elif len(report["runs"]) >= 3:
+        lines.append("✓ No site grew across every run")
+    else:
+        lines.append("ℹ️ Leak detection needs at least 3 runs (main.py --profile-memory --repeat 3)")
+    lines.append("=" * 70)
+    return "\n".join(lines)
+
+
+_profiler: Optional[MemoryProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_memory_profiler() -> MemoryProfiler:
+    """
+    Return the process-wide profiler
+
+    With config.PROFILE_MEMORY set (PROFILE_MEMORY=1) it starts tracing on first
+    use and rewrites output/profiles/memory_<pid>.json after every run.
+    """
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            report_path = None
+            if config.PROFILE_MEMORY:
+                report_path = os.path.join(config.PROFILE_MEMORY_DIR, f"memory_{os.getpid()}.json")
+            _profiler = MemoryProfiler(report_path=report_path)
+            if config.PROFILE_MEMORY:
+                _profiler.start()
+        return _profiler
+
+
+def _enabled() -> bool:
+    return config.PROFILE_MEMORY or (_profiler is not None and _profiler.active)
+
+
+def profile_stage(name: str):
+    """profiler.stage(name) while profiling, otherwise a no-op context"""
+    return get_memory_profiler().stage(name) if _enabled() else nullcontext()
+
+
+def profile_run(label: str):
+    """profiler.run(label) while profiling, otherwise a no-op context"""
+    return get_memory_profiler().run(label) if _enabled() else nullcontext()
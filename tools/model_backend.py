@@ -0,0 +1,481 @@
+"""
+Model Backend - One interface for every model call
+The tools and agents send their requests through get_model_backend(), so the
+Gemini client can be swapped for a recorder that captures request/response
+pairs to disk, or for a replayer/fake that answers offline with recorded or
+synthetic JSON, text and PNGs after a configurable latency
+"""
+import abc
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import threading
+import time
+import types
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from tools.cache import hash_bytes, make_key
+from tools.storage import atomic_write
+
+# What a call is expected to return - the fake answers in kind
+KINDS = ("json", "text", "image")
+
+_EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}
+
+
+class ModelResponse:
+    """Normalized model reply: text, an optional image and token usage"""
+
+    def __init__(
+        self,
+        text: str = "",
+        image: Optional[bytes] = None,
+        mime_type: Optional[str] = None,
+        input_tokens: int = 0,
+        output_tokens: int = 0
+    ):
+        self.text = text
+        self.image = image
+        self.mime_type = mime_type
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+    @property
+    def usage_metadata(self):
+        """Token counts under the Gemini SDK attribute names (read by tools.cost.record_usage)"""
+        return types.SimpleNamespace(
+            prompt_token_count=self.input_tokens,
+            candidates_token_count=self.output_tokens
+        )
+
+
+class ModelBackend(abc.ABC):
+    """Interface for whatever answers model calls"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def generate(
+        self,
+        model: str,
+        parts: List[Any],
+        kind: str = "text",
+        temperature: Optional[float] = None,
+        timeout: Optional[float] = None
+    ) -> ModelResponse:
+        """
+        One generate-content call
+
+        Args:
+            model: Model name (e.g. config.GEMINI_VISION_MODEL)
+            parts: Prompt strings and content parts - inline blobs {"mime_type", "data"}
+                or file references {"file_data": {"file_uri", "mime_type"}}
+            kind: json, text or image
+            temperature: Sampling temperature (model default when None)
+            timeout: Request timeout in seconds
+
+        Returns:
+            ModelResponse
+        """
+
+    @abc.abstractmethod
+    def kickoff(self, agent, task) -> ModelResponse:
+        """
+        Run a single-agent CrewAI crew for a task
+
+        Args:
+            agent: Agent that executes the task
+            task: Fully rendered task
+
+        Returns:
+            ModelResponse with the crew output as text
+        """
+
+
+def _part_fingerprint(part: Any) -> Any:
+    if isinstance(part, str):
+        return part
+    if isinstance(part, dict) and "data" in part:
+        return {"mime_type": part.get("mime_type"), "sha256": hash_bytes(part["data"])}
+    if isinstance(part, dict) and "file_data" in part:
+        return {"file_uri": part["file_data"].get("file_uri")}
+    return repr(part)
+
+
+def resolve_local_files(parts: List[Any]) -> List[Any]:
+    """
+    Replace LocalFileService handles (file:// URIs) with the inline bytes behind them
+
+    The offline backends answer from request content, so a photo sent by local
+    handle is keyed exactly like the same photo sent inline.
+    """
+    from tools.file_handles import LocalFileService
+
+    resolved = []
+    for part in parts:
+        file_data = part.get("file_data") if isinstance(part, dict) else None
+        if file_data and file_data.get("file_uri", "").startswith("file://"):
+            part = {"mime_type": file_data["mime_type"], "data": LocalFileService.read({"uri": file_data["file_uri"]})}
+        resolved.append(part)
+    return resolved
+
+
+def request_key(model: str, parts: List[Any], kind: str, temperature: Optional[float]) -> str:
+    """Stable key of a generate call - inline images are keyed on their content"""
+    return make_key(model, kind, temperature, [_part_fingerprint(p) for p in parts])
+
+
+def crew_request(agent, task) -> Tuple[str, str]:
+    """(model, prompt) a crew kickoff amounts to"""
+    model = getattr(agent.llm, 'model', None) or str(agent.llm)
+    return model, f"{agent.role}\n{task.description}\n{task.expected_output}"
+
+
+def estimate_tokens(parts: List[Any]) -> int:
+    """Rough prompt token count (~4 characters per token, 258 tokens per image)"""
+    total = 0
+    for part in parts:
+        total += len(part) // 4 if isinstance(part, str) else 258
+    return total
+
+
+class GeminiBackend(ModelBackend):
+    """The real Gemini API, through the google-genai async client"""
+
+    name = "gemini"
+
+    def __init__(self):
+        from google import genai as google_genai
+        from google.genai import types as genai_types
+        self._client = google_genai.Client(api_key=config.GOOGLE_API_KEY)
+        self._types = genai_types
+
+    def _part(self, part: Any):
+        if isinstance(part, str):
+            return self._types.Part.from_text(text=part)
+        if "file_data" in part:
+            return self._types.Part.from_uri(
+                file_uri=part["file_data"]["file_uri"],
+                mime_type=part["file_data"]["mime_type"]
+            )
+        return self._types.Part.from_bytes(data=part["data"], mime_type=part["mime_type"])
+
+    @staticmethod
+    def _parse(response) -> ModelResponse:
+        text = ""
+        image = None
+        mime_type = None
+        candidates = getattr(response, 'candidates', None) or []
+        if candidates and getattr(candidates[0], 'content', None):
+            for part in candidates[0].content.parts or []:
+                if getattr(part, 'text', None):
+                    text += part.text
+                inline = getattr(part, 'inline_data', None)
+                if inline and image is None:
+                    image = getattr(inline, 'data', inline)
+                    mime_type = getattr(inline, 'mime_type', None)
+
+        usage = getattr(response, 'usage_metadata', None)
+        return ModelResponse(
+            text=text,
+            image=image,
+            mime_type=mime_type,
+            input_tokens=getattr(usage, 'prompt_token_count', 0) or 0,
+            output_tokens=getattr(usage, 'candidates_token_count', 0) or 0
+        )
+
+    async def generate(self, model, parts, kind="text", temperature=None, timeout=None) -> ModelResponse:
+        generation_config = self._types.GenerateContentConfig(
+            temperature=temperature,
+            response_modalities=["IMAGE"] if kind == "image" else None,
+            response_mime_type="text/plain" if kind == "text" else None
+        )
+        response = await asyncio.wait_for(
+            self._client.aio.models.generate_content(
+                model=model,
+                contents=[self._types.Content(role="user", parts=[self._part(p) for p in parts])],
+                config=generation_config
+            ),
+            timeout
+        )
+        return self._parse(response)
+
+    def kickoff(self, agent, task) -> ModelResponse:
+        from crewai import Crew
+        output = Crew(agents=[agent], tasks=[task], verbose=True).kickoff()
+        usage = getattr(output, 'token_usage', None)
+        return ModelResponse(
+            text=str(output),
+            input_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+            output_tokens=getattr(usage, 'completion_tokens', 0) or 0
+        )
+
+
+class RecordingStore:
+    """Request/response pairs on disk - {key}.json plus {key}.png (or .jpg/.webp) for images"""
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory: Where recordings live (defaults to config.MODEL_RECORDINGS_DIR)
+        """
+        self.directory = directory or config.MODEL_RECORDINGS_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def save(self, key: str, request: Dict[str, Any], response: ModelResponse, latency: float) -> None:
+        record = {
+            "request": request,
+            "text": response.text,
+            "mime_type": response.mime_type,
+            "input_tokens": response.input_tokens,
+            "output_tokens": response.output_tokens,
+            "latency_seconds": round(latency, 3),
+            "image_file": None
+        }
+        if response.image is not None:
+            record["image_file"] = key + _EXTENSIONS.get(response.mime_type, ".png")
+            atomic_write(os.path.join(self.directory, record["image_file"]), response.image)
+        atomic_write(os.path.join(self.directory, f"{key}.json"), json.dumps(record, indent=2))
+
+    def load(self, key: str) -> Optional[Tuple[ModelResponse, float]]:
+        """(response, recorded latency) for a key, or None"""
+        try:
+            with open(os.path.join(self.directory, f"{key}.json"), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            image = None
+            if record.get("image_file"):
+                with open(os.path.join(self.directory, record["image_file"]), 'rb') as f:
+                    image = f.read()
+        except (OSError, ValueError):
+            return None
+        return ModelResponse(
+            text=record.get("text", ""),
+            image=image,
+            mime_type=record.get("mime_type"),
+            input_tokens=record.get("input_tokens", 0),
+            output_tokens=record.get("output_tokens", 0)
+        ), record.get("latency_seconds", 0.0)
+
+
+def _describe_request(model: str, parts: List[Any], kind: str, temperature: Optional[float]) -> Dict[str, Any]:
+    # Human-readable side of a recording (images summarized by hash)
+    return {"model": model, "kind": kind, "temperature": temperature, "parts": [_part_fingerprint(p) for p in parts]}
+
+
+class RecordingBackend(ModelBackend):
+    """Passes calls to another backend and records every request/response pair"""
+
+    name = "record"
+
+    def __init__(self, inner: ModelBackend, store: Optional[RecordingStore] = None):
+        """
+        Args:
+            inner: Backend that answers the calls (normally GeminiBackend)
+            store: Where pairs are written (defaults to config.MODEL_RECORDINGS_DIR)
+        """
+        self.inner = inner
+        self.store = store or RecordingStore()
+        self.recorded = 0
+
+    async def generate(self, model, parts, kind="text", temperature=None, timeout=None) -> ModelResponse:
+        start = time.perf_counter()
+        response = await self.inner.generate(model, parts, kind, temperature, timeout)
+        latency = time.perf_counter() - start
+        key = request_key(model, parts, kind, temperature)
+        await asyncio.to_thread(
+            self.store.save, key, _describe_request(model, parts, kind, temperature), response, latency
+        )
+        self.recorded += 1
+        return response
+
+    def kickoff(self, agent, task) -> ModelResponse:
+        start = time.perf_counter()
+        response = self.inner.kickoff(agent, task)
+        model, prompt = crew_request(agent, task)
+        self.store.save(
+            request_key(model, [prompt], "crew", None),
+            {"model": model, "kind": "crew", "agent": agent.role, "parts": [prompt]},
+            response,
+            time.perf_counter() - start
+        )
+        self.recorded += 1
+        return response
+
+
+_ROOM_TYPES = ("living_room", "bedroom", "kitchen", "dining_room", "office")
+
+
+class FakeBackend(ModelBackend):
+    """
+    Offline stand-in returning synthetic JSON, text and PNGs
+
+    Everything - content and latency - is derived from the request key, so the
+    same request always gets the same answer after the same delay.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: Optional[Dict[str, Tuple[float, float]]] = None, scale: Optional[float] = None):
+        """
+        Args:
+            latency: {kind: (median_seconds, sigma)} log-normal latency per call kind
+                (json, text, image, crew); defaults to config.FAKE_LATENCY_SECONDS
+            scale: Multiplier on every latency, 0 answers instantly (defaults to config.FAKE_LATENCY_SCALE)
+        """
+        self.latency = latency or config.FAKE_LATENCY_SECONDS
+        self.scale = config.FAKE_LATENCY_SCALE if scale is None else scale
+        self.calls = 0
+
+    def delay(self, kind: str, rng: random.Random) -> float:
+        """Seconds this call takes - log-normal around the kind's median (sigma 0 = fixed)"""
+        median, sigma = self.latency.get(kind, (1.0, 0.0))
+        return median * math.exp(rng.gauss(0.0, sigma)) * self.scale if sigma else median * self.scale
+
+    @staticmethod
+    def _analysis(rng: random.Random) -> str:
+        return json.dumps({
+            "room_type": rng.choice(_ROOM_TYPES),
+            "current_style": rng.choice(("traditional", "modern", "eclectic", "farmhouse")),
+            "features": rng.sample(["large window", "hardwood floor", "fireplace", "built-in shelves",
+                                    "french doors", "high ceiling", "crown molding"], 3),
+            "furniture": rng.sample(["sofa", "armchair", "coffee table", "rug", "floor lamp", "bookcase"], 3),
+            "colors": rng.sample(["beige", "white", "gray", "walnut brown", "sage green", "navy"], 3),
+            "lighting": rng.choice(("natural", "mixed", "good")),
+            "dimensions_estimate": rng.choice(("small", "medium", "large")),
+            "condition": rng.choice(("good", "needs_refresh")),
+            "challenges": rng.sample(["limited light", "awkward layout", "dated finishes", "low storage"], 2),
+            "opportunities": rng.sample(["open up the layout", "add layered lighting", "accent wall",
+                                         "built-in storage"], 2)
+        })
+
+    @staticmethod
+    def _text(rng: random.Random, words: int) -> str:
+        vocabulary = ("warm", "oak", "linen", "brass", "soft", "layered", "light", "texture", "neutral",
+                      "accent", "plaster", "wool", "matte", "walnut", "ceramic", "airy", "calm", "storage")
+        sections = []
+        for heading in ("VISUAL TRANSFORMATION", "COLOR PALETTE", "FURNITURE PLACEMENT", "LIGHTING DESIGN"):
+            body = " ".join(rng.choice(vocabulary) for _ in range(words // 4))
+            sections.append(f"{heading}: {body.capitalize()}.")
+        return "\n\n".join(sections)
+
+    @staticmethod
+    def _png(rng: random.Random, size: int = 1024) -> bytes:
+        from PIL import Image, ImageDraw
+        base = tuple(rng.randrange(60, 220) for _ in range(3))
+        img = Image.new("RGB", (size, size), base)
+        draw = ImageDraw.Draw(img)
+        # Floor, a window and a few furniture blocks so diffs and previews have structure
+        draw.rectangle([0, size * 2 // 3, size, size], fill=tuple(c // 2 for c in base))
+        draw.rectangle([size // 8, size // 8, size // 3, size // 2], fill=(235, 240, 250))
+        for _ in range(4):
+            x, y = rng.randrange(0, size - 200), rng.randrange(size // 2, size - 120)
+            draw.rectangle([x, y, x + rng.randrange(80, 200), y + rng.randrange(40, 120)],
+                           fill=tuple(rng.randrange(30, 230) for _ in range(3)))
+        buffered = io.BytesIO()
+        img.save(buffered, format="PNG", compress_level=1)
+        return buffered.getvalue()
+
+    def respond(self, kind: str, rng: random.Random, input_tokens: int) -> ModelResponse:
+        """Synthetic response of a kind"""
+        if kind == "image":
+            return ModelResponse(image=self._png(rng), mime_type="image/png",
+                                 input_tokens=input_tokens, output_tokens=1290)
+        text = self._analysis(rng) if kind == "json" else self._text(rng, 500 if kind == "text" else 300)
+        return ModelResponse(text=text, input_tokens=input_tokens, output_tokens=len(text) // 4)
+
+    async def generate(self, model, parts, kind="text", temperature=None, timeout=None) -> ModelResponse:
+        parts = await asyncio.to_thread(resolve_local_files, parts)
+        rng = random.Random(request_key(model, parts, kind, temperature))
+        await asyncio.sleep(self.delay(kind, rng))
+        self.calls += 1
+        return self.respond(kind, rng, estimate_tokens(parts))
+
+    def kickoff(self, agent, task) -> ModelResponse:
+        model, prompt = crew_request(agent, task)
+        rng = random.Random(request_key(model, [prompt], "crew", None))
+        time.sleep(self.delay("crew", rng))
+        self.calls += 1
+        return self.respond("crew", rng, estimate_tokens([prompt]))
+
+
+class ReplayBackend(ModelBackend):
+    """Answers from recordings, falling back to the fake for requests never recorded"""
+
+    name = "replay"
+
+    def __init__(self, store: Optional[RecordingStore] = None, fallback: Optional[FakeBackend] = None):
+        """
+        Args:
+            store: Recordings to replay (defaults to config.MODEL_RECORDINGS_DIR)
+            fallback: Answers unrecorded requests (None raises LookupError instead)
+        """
+        self.store = store or RecordingStore()
+        self.fallback = fallback
+        self.scale = config.FAKE_LATENCY_SCALE
+        self.hits = 0
+        self.misses = 0
+
+    def _miss(self, description: str):
+        self.misses += 1
+        if self.fallback is None:
+            raise LookupError(f"No recording for {description} in {self.store.directory}")
+
+    async def generate(self, model, parts, kind="text", temperature=None, timeout=None) -> ModelResponse:
+        parts = await asyncio.to_thread(resolve_local_files, parts)
+        recorded = await asyncio.to_thread(self.store.load, request_key(model, parts, kind, temperature))
+        if recorded is None:
+            self._miss(f"{kind} call to {model}")
+            return await self.fallback.generate(model, parts, kind, temperature, timeout)
+        self.hits += 1
+        response, latency = recorded
+        # Replay at the recorded pace (scaled like the fake)
+        await asyncio.sleep(latency * self.scale)
+        return response
+
+    def kickoff(self, agent, task) -> ModelResponse:
+        model, prompt = crew_request(agent, task)
+        recorded = self.store.load(request_key(model, [prompt], "crew", None))
+        if recorded is None:
+            self._miss(f"crew task for '{agent.role}'")
+            return self.fallback.kickoff(agent, task)
+        self.hits += 1
+        response, latency = recorded
+        time.sleep(latency * self.scale)
+        return response
+
+
+_backend: Optional[ModelBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_model_backend() -> ModelBackend:
+    """Return the process-wide backend for config.MODEL_BACKEND (gemini, record, replay or fake)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if config.MODEL_BACKEND == "fake":
+                _backend = FakeBackend()
+            elif config.MODEL_BACKEND == "replay":
+                _backend = ReplayBackend(fallback=FakeBackend() if config.REPLAY_FALLBACK_TO_FAKE else None)
+            elif config.FILE_SERVICE == "local":
+                # Only the offline backends can read the stand-in service's file:// handles
+                raise ValueError(
+                    f"FILE_SERVICE=local needs MODEL_BACKEND=fake or replay, not {config.MODEL_BACKEND}"
+                )
+            elif config.MODEL_BACKEND == "record":
+                _backend = RecordingBackend(GeminiBackend())
+            else:
+                _backend = GeminiBackend()
+            print(f"🔌 Model backend: {_backend.name}")
+        return _backend
+
+
+def set_model_backend(backend: Optional[ModelBackend]) -> None:
+    """Replace the process-wide backend (None rebuilds it from config on next use)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -4,11 +4,9 @@ Based on: https://www.theunwindai.com/p/build-an-ai-home-renovation-planner-agen
 """
 import sys
 import os
-from datetime import datetime
-from typing import Dict, Any, Optional
-from PIL import Image
-import base64
-import io
+import mimetypes
+from typing import Dict, Any, Optional, Union
+import asyncio
 
 # Fix UTF-8 encoding
 if sys.platform == 'win32':
@@ -18,158 +16,203 @@ if sys.platform == 'win32':
         import codecs
         sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'ignore')
 
-# Try to use google-genai (ADK) first, fallback to google-generativeai
-try:
-    from google import genai
-    from google.genai import types
-    USE_ADK = True
-    print("✅ Using Google GenAI SDK (ADK)")
-except ImportError:
-    import google.generativeai as genai
-    USE_ADK = False
-    print("⚠️ Using google-generativeai (ADK not available)")
-
 import config
+from tools.async_utils import run_sync
+from tools.cache import get_cache, make_key
+from tools.cost import record_usage
+from tools.file_handles import reference_part_async
+from tools.generated_images import save_generated_image_async
+from tools.model_backend import get_model_backend
+from tools.room_image import RoomImage
+from tools.tracing import payload_bytes, record_bytes, set_attribute, traced
 
 class NanoBananaGenerator:
     """Generate transformed room images using Nano Banana (Gemini 2.5 Flash Image)"""
 
     def __init__(self):
-        if USE_ADK:
-            # Using ADK client
-            self.client = genai.Client(api_key=config.GOOGLE_API_KEY)
-            self.model_name = "gemini-2.5-flash-image"
-        else:
-            # Using standard generativeai
-            genai.configure(api_key=config.GOOGLE_API_KEY)
-            self.model = genai.GenerativeModel("gemini-2.5-flash-image")
-            self.model_name = "gemini-2.5-flash-image"
+        # Live calls go through the google-genai async client in the model backend
+        self.backend = get_model_backend()
+        self.model_name = "gemini-2.5-flash-image"
+
+        self.render_cache = get_cache(
+            'renders',
+            max_entries=config.RENDER_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.RENDER_CACHE_TTL_SECONDS
+        ) if config.RENDER_CACHE_ENABLED else None
+        self.render_variants = max(1, config.RENDER_CACHE_VARIANTS)
 
         print(f"✅ Nano Banana initialized: {self.model_name}")
 
-    def generate_image(self, prompt: str, reference_image_path: Optional[str] = None) -> Dict[str, Any]:
-        """Generate image using Nano Banana with optional reference image for transformation"""
+    def _render_cache_key(self, prompt: str, reference: Optional[RoomImage], temperature: float) -> str:
+        """Key a rendering on the reference image content, the full prompt and the generation config"""
+        image_hash = reference.content_hash if reference else None
+
+        generation_config = {
+            "model": self.model_name,
+            "temperature": temperature,
+            "response_modalities": ["IMAGE"]
+        }
+        return make_key(image_hash or "", prompt, generation_config)
+
+    def _pick_cached_variant(self, cache_key: str, entry: Optional[Dict[str, Any]], regenerate: bool) -> Optional[Dict[str, Any]]:
+        """
+        Select a stored variant for this key
+
+        A plain request returns the current variant. "regenerate" rotates to the next
+        stored variant, and only falls through to the API (returns None) once every
+        stored variant has been shown and fewer than RENDER_CACHE_VARIANTS exist.
+        """
+        if not entry:
+            return None
+
+        variants = [v for v in entry.get("variants", []) if os.path.exists(v["image_path"])]
+        if not variants:
+            return None
+
+        cursor = entry.get("cursor", 0) % len(variants)
+        if regenerate:
+            cursor += 1
+            if cursor >= len(variants):
+                if len(variants) < self.render_variants:
+                    return None
+                cursor = 0
+
+        if regenerate or len(variants) != len(entry.get("variants", [])):
+            entry["variants"] = variants
+            entry["cursor"] = cursor
+            self.render_cache.set(cache_key, entry)
+
+        variant = variants[cursor]
+
+        print(f"⚡ Rendering cache hit (variant {cursor + 1}/{len(variants)}) - skipping Nano Banana call")
+        return {
+            "success": True,
+            "image_path": variant["image_path"],
+            # JSON turned the preview widths into strings; entries from before previews have none
+            "previews": {int(width): path for width, path in variant.get("previews", {}).items()},
+            "mime_type": variant.get("mime_type") or mimetypes.guess_type(variant["image_path"])[0],
+            "model": self.model_name,
+            "size": tuple(variant["size"]),
+            "cached": True,
+            "variant": cursor,
+            "variants_cached": len(variants)
+        }
+
+    def _store_variant(self, cache_key: str, entry: Optional[Dict[str, Any]], result: Dict[str, Any]) -> None:
+        """Record a freshly generated image as the newest variant for this key"""
+        entry = entry or {}
+        variants = [v for v in entry.get("variants", []) if os.path.exists(v["image_path"])]
+        variants.append({
+            "image_path": result["image_path"],
+            "previews": result.get("previews", {}),
+            "mime_type": result.get("mime_type"),
+            "size": list(result["size"])
+        })
+        # Keep the newest N variants
+        variants = variants[-self.render_variants:]
+        self.render_cache.set(cache_key, {
+            "variants": variants,
+            "cursor": len(variants) - 1
+        })
+
+    async def _save_image(self, image_bytes: bytes, mime_type: Optional[str]) -> Dict[str, Any]:
+        """Encode a generated image in the configured output format and write it to disk"""
+        saved = await save_generated_image_async(image_bytes, mime_type, prefix="nano_banana")
+
+        print(f"✅ Image generated successfully!")
+        print(f"📁 Saved to: {saved['image_path']}")
+        print(f"📏 Size: {saved['size'][0]}x{saved['size'][1]} ({saved['source_bytes'] // 1024} KB → {saved['bytes'] // 1024} KB)")
+
+        return {
+            "success": True,
+            "image_path": saved["image_path"],
+            "previews": saved["previews"],
+            "mime_type": saved["mime_type"],
+            "model": self.model_name,
+            "size": saved["size"]
+        }
+
+    def generate_image(
+        self,
+        prompt: str,
+        reference_image_path: Optional[Union[str, RoomImage]] = None,
+        temperature: float = 0.4,
+        regenerate: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Generate image using Nano Banana with optional reference image for transformation
+
+        Args:
+            prompt: Full generation prompt
+            reference_image_path: Optional photo to transform (path or RoomImage)
+            temperature: Sampling temperature
+            regenerate: Ask for a different variant than last time (served from the
+                rendering cache while it still holds unseen variants)
+        """
+        return run_sync(self.generate_image_async(prompt, reference_image_path, temperature, regenerate))
+
+    @traced("nano_banana.generate")
+    async def generate_image_async(
+        self,
+        prompt: str,
+        reference_image_path: Optional[Union[str, RoomImage]] = None,
+        temperature: float = 0.4,
+        regenerate: bool = False
+    ) -> Dict[str, Any]:
+        """Async version of generate_image - awaits the Gemini async client instead of holding a thread"""
         try:
+            reference = None
+            if reference_image_path:
+                reference = await asyncio.to_thread(RoomImage.coerce, reference_image_path)
+
+            cache_key = None
+            cache_entry = None
+            if self.render_cache:
+                cache_key = await asyncio.to_thread(
+                    self._render_cache_key, prompt, reference, temperature
+                )
+                cache_entry = await asyncio.to_thread(self.render_cache.get, cache_key)
+                cached = await asyncio.to_thread(self._pick_cached_variant, cache_key, cache_entry, regenerate)
+                if cached:
+                    set_attribute("cache_hit", True)
+                    return cached
+
             print(f"\n🎨 Generating image with Nano Banana...")
             print(f"📝 Prompt: {prompt[:150]}...")
 
-            if reference_image_path:
-                print(f"🖼️ Using reference image: {reference_image_path}")
-
-            if USE_ADK:
-                # Use ADK approach from the article
-                parts = [types.Part.from_text(text=prompt)]
-
-                # Add reference image if provided
-                if reference_image_path:
-                    try:
-                        with open(reference_image_path, 'rb') as f:
-                            image_bytes = f.read()
-
-                        # Add image to parts
-                        parts.append(types.Part.from_bytes(
-                            data=image_bytes,
-                            mime_type="image/jpeg"
-                        ))
-                        print("✅ Reference image added to request")
-                    except Exception as img_error:
-                        print(f"⚠️ Could not load reference image: {img_error}")
-
-                contents = [
-                    types.Content(
-                        role="user",
-                        parts=parts,
-                    ),
-                ]
-
-                config_obj = types.GenerateContentConfig(
-                    response_modalities=["IMAGE"],
-                    temperature=0.4,
-                )
+            if reference:
+                print(f"🖼️ Using reference image: {reference.label}")
 
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=contents,
-                    config=config_obj,
-                )
+            # Prompt plus the reference photo - by file handle when it was uploaded, else inline
+            parts = [prompt]
+            if reference:
+                try:
+                    parts.append(await reference_part_async(reference))
+                    print("✅ Reference image added to request")
+                except Exception as img_error:
+                    print(f"⚠️ Could not load reference image: {img_error}")
 
-            else:
-                # Use standard generativeai approach
-                content_parts = [prompt]
-
-                # Add reference image if provided
-                if reference_image_path:
-                    try:
-                        img = Image.open(reference_image_path)
-                        content_parts.append(img)
-                        print("✅ Reference image added to request")
-                    except Exception as img_error:
-                        print(f"⚠️ Could not load reference image: {img_error}")
-
-                response = self.model.generate_content(
-                    content_parts,
-                    generation_config={
-                        "temperature": 0.4,
-                    }
-                )
+            response = await self.backend.generate(self.model_name, parts, kind="image", temperature=temperature)
+            record_bytes(sent=payload_bytes(parts))
+
+            record_usage(self.model_name, response, images=1 if response.image is not None else 0)
+            if response.image is not None:
+                print("✅ Found image data!")
+                record_bytes(received=len(response.image))
+                # Encoding and the file write run on the encode pool, off the event loop
+                result = await self._save_image(response.image, response.mime_type)
 
-            # Extract image from response
-            print("🔍 Parsing response...")
-
-            if hasattr(response, 'candidates') and response.candidates:
-                candidate = response.candidates[0]
-
-                if hasattr(candidate, 'content') and candidate.content:
-                    if hasattr(candidate.content, 'parts'):
-                        for part in candidate.content.parts:
-                            # Check for inline_data (image)
-                            if hasattr(part, 'inline_data') and part.inline_data:
-                                print("✅ Found image data!")
-
-                                # Get image bytes
-                                if hasattr(part.inline_data, 'data'):
-                                    image_bytes = part.inline_data.data
-                                else:
-                                    # Try different attribute names
-                                    image_bytes = part.inline_data
-
-                                # Convert to PIL Image
-                                image = Image.open(io.BytesIO(image_bytes))
-
-                                # Save image
-                                os.makedirs("output/rendered_images", exist_ok=True)
-                                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                                image_path = f"output/rendered_images/nano_banana_{timestamp}.png"
-
-                                image.save(image_path)
-
-                                print(f"✅ Image generated successfully!")
-                                print(f"📁 Saved to: {image_path}")
-                                print(f"📏 Size: {image.size[0]}x{image.size[1]}")
-
-                                # Encode to base64
-                                buffered = io.BytesIO()
-                                image.save(buffered, format="PNG")
-                                img_base64 = base64.b64encode(buffered.getvalue()).decode()
-
-                                return {
-                                    "success": True,
-                                    "image_path": image_path,
-                                    "image_data": img_base64,
-                                    "model": self.model_name,
-                                    "size": image.size
-                                }
+                if cache_key:
+                    await asyncio.to_thread(self._store_variant, cache_key, cache_entry, result)
+
+                return result
 
             # No image found - return text response for debugging
             print("⚠️ No image data found in response")
-            response_text = ""
-            if hasattr(response, 'text'):
-                response_text = response.text[:500]
-
             return {
                 "success": False,
                 "error": "No image data in response",
-                "response_text": response_text,
+                "response_text": response.text[:500],
                 "model": self.model_name
             }
 
@@ -188,9 +231,41 @@ class NanoBananaGenerator:
         room_analysis: Dict[str, Any],
         style: str,
         custom_prompt: Optional[str] = None,
-        reference_image_path: Optional[str] = None
+        reference_image_path: Optional[Union[str, RoomImage]] = None,
+        temperature: float = 0.4,
+        regenerate: bool = False
     ) -> Dict[str, Any]:
         """Generate transformed room image based on analysis and optional reference image"""
+        return run_sync(self.generate_room_transformation_async(
+            room_analysis, style, custom_prompt, reference_image_path, temperature, regenerate
+        ))
+
+    async def generate_room_transformation_async(
+        self,
+        room_analysis: Dict[str, Any],
+        style: str,
+        custom_prompt: Optional[str] = None,
+        reference_image_path: Optional[Union[str, RoomImage]] = None,
+        temperature: float = 0.4,
+        regenerate: bool = False
+    ) -> Dict[str, Any]:
+        """Async version of generate_room_transformation"""
+        prompt = self._transformation_prompt(room_analysis, style, custom_prompt, reference_image_path)
+        return await self.generate_image_async(
+            prompt,
+            reference_image_path=reference_image_path,
+            temperature=temperature,
+            regenerate=regenerate
+        )
+
+    def _transformation_prompt(
+        self,
+        room_analysis: Dict[str, Any],
+        style: str,
+        custom_prompt: Optional[str],
+        reference_image_path: Optional[Union[str, RoomImage]]
+    ) -> str:
+        """Build the Nano Banana prompt for a room transformation"""
 
         room_type = room_analysis.get('room_type', 'room')
         features = room_analysis.get('features', [])
@@ -269,7 +344,7 @@ REQUIREMENTS:
 - ALL specified furniture and items must be clearly visible
 - No text, watermarks, or overlays"""
 
-        return self.generate_image(prompt, reference_image_path=reference_image_path)
+        return prompt
 
     def _extract_key_items(self, prompt: str) -> list:
         """Extract specific furniture/item mentions from user prompt"""
@@ -0,0 +1,226 @@
+"""
+Perceptual Index - Near-duplicate photo lookup
+Finds previously analyzed photos that survived re-compression or resizing,
+so their stored analysis can be reused instead of another vision call
+"""
+import io
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+import config
+from tools.image_prep import reduce_decode
+
+HASH_BITS = 64
+
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """
+    Compute a 64-bit difference hash (dHash) of an encoded image
+
+    Re-encoding, mild resizing and EXIF rotation leave the hash (nearly) unchanged,
+    so near-duplicates land within a small Hamming distance of each other.
+
+    Args:
+        image_bytes: Encoded image (JPEG, PNG, ...)
+        hash_size: Hash grid size; 8 gives a 64-bit hash
+
+    Returns:
+        Hash as an int
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        # JPEG DCT scaling - decodes at a fraction of full resolution
+        reduce_decode(img, (hash_size * 8, hash_size * 8), mode='L')
+        img = ImageOps.exif_transpose(img)
+        small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return (a ^ b).bit_count()
+
+
+class PerceptualIndex:
+    """
+    Persistent Hamming-radius index of photo hashes and their analyses
+
+    Uses multi-index hashing: the 64-bit hash is split into (max_distance + 1)
+    chunks, and by the pigeonhole principle any hash within max_distance of a
+    query matches it exactly on at least one chunk. Lookups only compare the
+    few entries sharing a chunk, which keeps them well under a millisecond at
+    100k+ indexed photos. Analyses stay on disk; memory holds only hashes and
+    file offsets.
+    """
+
+    def __init__(self, index_path: Optional[str] = None, max_distance: Optional[int] = None):
+        """
+        Args:
+            index_path: Append-only index file (defaults to <CACHE_DIR>/phash_index.tsv)
+            max_distance: Largest Hamming distance treated as a near-duplicate
+        """
+        self.index_path = index_path or os.path.join(config.CACHE_DIR, 'phash_index.tsv')
+        self.max_distance = config.PHASH_MAX_DISTANCE if max_distance is None else max_distance
+
+        self._chunks = self._chunk_layout(self.max_distance + 1)
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._chunks]
+        self._hashes: List[int] = []
+        self._offsets: List[int] = []
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def _chunk_layout(count: int) -> List[Tuple[int, int]]:
+        """Split HASH_BITS into `count` (shift, mask) chunks of near-equal width"""
+        count = max(1, min(count, HASH_BITS))
+        base, extra = divmod(HASH_BITS, count)
+        layout = []
+        shift = 0
+        for i in range(count):
+            width = base + (1 if i < extra else 0)
+            layout.append((shift, (1 << width) - 1))
+            shift += width
+        return layout
+
+    def _insert(self, value: int, offset: int) -> None:
+        entry_id = len(self._hashes)
+        self._hashes.append(value)
+        self._offsets.append(offset)
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault((value >> shift) & mask, []).append(entry_id)
+
+    def _load(self) -> None:
+        """Rebuild the in-memory tables from the index file"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                # Lines are "<16 hex digits>\t<analysis json>\n"; only the hash is parsed here
+                if line.endswith(b'\n') and line[16:17] == b'\t':
+                    try:
+                        self._insert(int(line[:16], 16), offset)
+                    except ValueError:
+                        pass
+                offset += len(line)
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def find(self, value: int) -> Optional[Dict[str, Any]]:
+        """
+        Look up the closest indexed photo within max_distance
+
+        Args:
+            value: dHash of the query photo
+
+        Returns:
+            {"analysis": ..., "distance": int, "hash": str} or None
+        """
+        with self._lock:
+            best_id = None
+            best_distance = self.max_distance + 1
+            seen = set()
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                for entry_id in table.get((value >> shift) & mask, ()):
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    distance = hamming(value, self._hashes[entry_id])
+                    if distance < best_distance:
+                        best_id, best_distance = entry_id, distance
+                        if distance == 0:
+                            break
+                if best_distance == 0:
+                    break
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            analysis = self._read(best_id)
+            if analysis is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return {
+                "analysis": analysis,
+                "distance": best_distance,
+                "hash": f"{self._hashes[best_id]:016x}"
+            }
+
+    def add(self, value: int, analysis: Dict[str, Any]) -> None:
+        """Index a photo hash together with its analysis"""
+        line = f"{value:016x}\t{json.dumps(analysis)}\n".encode('utf-8')
+        with self._lock:
+            with open(self.index_path, 'ab') as f:
+                # End of file when opened; other processes appending before our
+                # write only push the line further on, which _read allows for
+                offset = f.tell()
+                f.write(line)
+            self._insert(value, offset)
+
+    def _read(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Load an entry's analysis, checking that the line found belongs to its hash
+
+        Args:
+            entry_id: Position in the in-memory tables
+
+        Returns:
+            Stored analysis, or None if its line is missing or unreadable
+        """
+        prefix = f"{self._hashes[entry_id]:016x}\t".encode('ascii')
+        offset = self._offsets[entry_id]
+        try:
+            with open(self.index_path, 'rb') as f:
+                f.seek(offset)
+                # Normally the first line; scan on when another writer got in first
+                for line in f:
+                    if line.startswith(prefix) and line.endswith(b'\n'):
+                        self._offsets[entry_id] = offset
+                        return json.loads(line[17:])
+                    offset += len(line)
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._hashes),
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+_index: Optional[PerceptualIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_perceptual_index() -> PerceptualIndex:
+    """Return the process-wide perceptual index, loading it on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PerceptualIndex()
+        return _index
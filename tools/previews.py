@@ -0,0 +1,95 @@
+"""
+Previews - Precomputed downscaled copies of stored images
+Every rendered or uploaded image gets small WebP previews written next to it
+once, so views can show the smallest adequate size instead of the full file
+"""
+import io
+import os
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps
+
+import config
+from tools.image_prep import reduce_decode
+from tools.storage import atomic_write
+
+PREVIEW_DIR_NAME = "previews"
+
+
+def _preview_file(image_path: str, width: int) -> str:
+    directory, name = os.path.split(image_path)
+    stem = os.path.splitext(name)[0]
+    return os.path.join(directory, PREVIEW_DIR_NAME, f"{stem}.{width}.webp")
+
+
+def create_previews(image_path: str) -> Dict[int, str]:
+    """
+    Write the preview pyramid for an image (decoded once, largest size first)
+
+    Args:
+        image_path: Full-resolution image on disk
+
+    Returns:
+        Mapping of preview width to preview file path
+    """
+    sizes = sorted(config.PREVIEW_SIZES, reverse=True)
+    previews = {}
+
+    with Image.open(image_path) as img:
+        # Previews never need more than the largest size, so JPEGs can decode at 1/2-1/8 scale
+        reduce_decode(img, (sizes[0], sizes[0]))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGB')
+
+        os.makedirs(os.path.join(os.path.dirname(image_path), PREVIEW_DIR_NAME), exist_ok=True)
+        for width in sizes:
+            # Each level is downscaled from the previous one, not from the original
+            if img.width > width:
+                img.thumbnail((width, img.height), Image.Resampling.LANCZOS)
+            buffered = io.BytesIO()
+            img.save(buffered, format="WEBP", quality=config.PREVIEW_QUALITY, method=4)
+            # Unique temp file per writer, so concurrent requests for the same preview can't clobber each other
+            previews[width] = atomic_write(_preview_file(image_path, width), buffered.getvalue())
+
+    return previews
+
+
+def remove_previews(image_path: str) -> None:
+    """Delete the previews of an image (when the image itself is removed)"""
+    for width in config.PREVIEW_SIZES:
+        try:
+            os.remove(_preview_file(image_path, width))
+        except FileNotFoundError:
+            pass
+
+
+def preview_path(image_path: Optional[str], width: int) -> Optional[str]:
+    """
+    Smallest stored version of an image that is at least `width` pixels wide
+
+    Previews missing on disk (images saved before previews existed) are created on
+    first request. Falls back to the full image when no preview is large enough.
+
+    Args:
+        image_path: Full-resolution image on disk
+        width: Display width in pixels
+
+    Returns:
+        Path to display, or None if image_path is empty
+    """
+    if not image_path:
+        return None
+
+    candidates = [size for size in sorted(config.PREVIEW_SIZES) if size >= width]
+    if not candidates:
+        return image_path
+
+    path = _preview_file(image_path, candidates[0])
+    if not os.path.exists(path):
+        try:
+            create_previews(image_path)
+        except Exception as e:
+            print(f"⚠️ Could not create previews for {image_path}: {e}")
+            return image_path
+    return path
@@ -0,0 +1,107 @@
+"""
+Room Image - A room photo loaded once and shared across the workflow
+Carries the raw bytes plus lazily derived views (decoded image, MIME type,
+dimensions, content hash, upload payload), each computed at most once
+"""
+import io
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+from tools.cache import hash_bytes
+from tools.image_prep import normalize_image, reduce_decode
+
+
+class RoomImage:
+    """A room photo read from disk (or received as an upload) exactly once"""
+
+    def __init__(self, data: bytes, path: Optional[str] = None, content_hash: Optional[str] = None):
+        """
+        Args:
+            data: Encoded photo bytes
+            path: Optional file the bytes came from (reported in results)
+            content_hash: Optional known SHA-256 of data (e.g. an upload store ID), saves rehashing
+        """
+        self.data = bytes(data)
+        self.path = path
+        self._values: Dict[str, Any] = {}
+        if content_hash:
+            self._values["content_hash"] = content_hash
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    @classmethod
+    def from_path(cls, path: str) -> "RoomImage":
+        """Read a photo from disk"""
+        with open(path, 'rb') as f:
+            return cls(f.read(), path=path)
+
+    @classmethod
+    def coerce(cls, image: Union[str, "RoomImage"]) -> "RoomImage":
+        """Return image unchanged if it is already a RoomImage, else load it from its path"""
+        return image if isinstance(image, RoomImage) else cls.from_path(image)
+
+    def _lazy(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Compute a derived value once, even when several threads ask at the same time"""
+        if name in self._values:
+            return self._values[name]
+        with self._locks_guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._values:
+                self._values[name] = factory()
+        return self._values[name]
+
+    def _header(self) -> Tuple[str, Tuple[int, int]]:
+        # Image.open only parses the header; pixels are not decoded here
+        with Image.open(io.BytesIO(self.data)) as img:
+            return img.format, img.size
+
+    @property
+    def format(self) -> str:
+        """PIL format name (JPEG, PNG, WEBP, ...)"""
+        return self._lazy("header", self._header)[0]
+
+    @property
+    def mime_type(self) -> str:
+        """MIME type detected from the file contents"""
+        return Image.MIME.get(self.format, "application/octet-stream")
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height) as stored, before EXIF orientation"""
+        return self._lazy("header", self._header)[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the encoded photo"""
+        return len(self.data)
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 of the bytes (same value as tools.cache.hash_bytes)"""
+        return self._lazy("content_hash", lambda: hash_bytes(self.data))
+
+    @property
+    def image(self) -> Image.Image:
+        """Full-resolution PIL image (decoded on first access, within config.MAX_DECODE_PIXELS)"""
+        def _decode():
+            img = Image.open(io.BytesIO(self.data))
+            reduce_decode(img)
+            img.load()
+            return img
+        return self._lazy("image", _decode)
+
+    @property
+    def normalized(self) -> Dict[str, Any]:
+        """Upload payload from tools.image_prep.normalize_image, shared by every model call"""
+        return self._lazy("normalized", lambda: normalize_image(self.data))
+
+    @property
+    def label(self) -> str:
+        """Short description for log lines"""
+        return self.path or f"uploaded photo {self.content_hash[:12]}"
+
+    def __repr__(self) -> str:
+        return f"RoomImage({self.label!r}, {self.nbytes} bytes)"
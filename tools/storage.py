@@ -0,0 +1,87 @@
+"""
+Storage - Collision-free, sharded, atomic output files
+Every output gets a unique ID (timestamp + random suffix), lives in a
+hash-sharded subdirectory so no directory grows unbounded, and is written to a
+temp file then renamed so readers never see a partial file
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Union
+
+import config
+
+
+def new_id(prefix: str) -> str:
+    """
+    Unique, time-sortable file ID
+
+    Args:
+        prefix: Kind of output (e.g. "nano_banana", "poc_results")
+
+    Returns:
+        "{prefix}_{YYYYmmdd_HHMMSS}_{12 hex chars}"
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{prefix}_{timestamp}_{uuid.uuid4().hex[:12]}"
+
+
+def shard_dir(root: str, file_id: str) -> str:
+    """Subdirectory of root for file_id, sharded on the ID's random suffix"""
+    suffix = file_id.rsplit("_", 1)[-1]
+    parts = [suffix[i * 2:i * 2 + 2] for i in range(config.STORAGE_SHARD_LEVELS)]
+    return os.path.join(root, *parts)
+
+
+def new_path(root: str, prefix: str, extension: str) -> str:
+    """
+    Fresh path for a new output file, creating its shard directory
+
+    Args:
+        root: Output root (e.g. output/rendered_images)
+        prefix: Kind of output
+        extension: File extension including the dot
+
+    Returns:
+        Path like root/ab/cd/{prefix}_{timestamp}_{abcd...}{extension}
+    """
+    file_id = new_id(prefix)
+    directory = shard_dir(root, file_id)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{file_id}{extension}")
+
+
+def atomic_write(path: str, data: Union[bytes, str]) -> str:
+    """
+    Write a file via temp file + rename
+
+    Args:
+        path: Destination
+        data: bytes, or str (written as UTF-8)
+
+    Returns:
+        path
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data.encode('utf-8') if isinstance(data, str) else data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def save_bytes(data: bytes, root: str, prefix: str, extension: str) -> str:
+    """Write bytes to a new unique, sharded path; returns the path"""
+    return atomic_write(new_path(root, prefix, extension), data)
+
+
+def save_json(obj: Any, root: str, prefix: str) -> str:
+    """Write obj as indented JSON to a new unique, sharded path; returns the path"""
+    return atomic_write(new_path(root, prefix, ".json"), json.dumps(obj, indent=2))
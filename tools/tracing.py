@@ -0,0 +1,278 @@
+"""
+Tracing - Nested timing spans for the design workflow
+Records wall time, CPU time and bytes sent/received around every stage, tool
+and agent call. The span tree is returned with the workflow results and can be
+exported as OpenTelemetry (OTLP/JSON) traces to a local file.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import config
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation; children are the operations it started"""
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent: Optional["Span"] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        measure_cpu: bool = True
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.children: List["Span"] = []
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._perf_start = time.perf_counter()
+        # On the shared event loop the thread's CPU clock also counts every other
+        # coroutine that ran meanwhile, so async spans record no CPU time
+        self._cpu_start = time.thread_time() if measure_cpu else None
+        self.wall_seconds: Optional[float] = None
+        self.cpu_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def finish(self) -> None:
+        self.wall_seconds = time.perf_counter() - self._perf_start
+        # CPU of the thread the span ran on (waits on the model API cost ~0)
+        if self._cpu_start is not None:
+            self.cpu_seconds = time.thread_time() - self._cpu_start
+        self.end_ns = time.time_ns()
+
+    def add_child(self, child: "Span") -> None:
+        with self._lock:
+            self.children.append(child)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Span tree as plain JSON-serializable data (for the results file)"""
+        data = {
+            "name": self.name,
+            "wall_seconds": round(self.wall_seconds, 3) if self.wall_seconds is not None else None,
+            "cpu_seconds": round(self.cpu_seconds, 3) if self.cpu_seconds is not None else None,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.error:
+            data["error"] = self.error
+        with self._lock:
+            children = sorted(self.children, key=lambda c: c.start_ns)
+        if children:
+            data["children"] = [child.to_dict() for child in children]
+        return data
+
+    def walk(self) -> Iterator["Span"]:
+        yield self
+        with self._lock:
+            children = list(self.children)
+        for child in children:
+            yield from child.walk()
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def current_span() -> Optional[Span]:
+    """Innermost open span in this context, if a trace is active"""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a child of the current span
+
+    Does nothing (yields None) when no trace is active, so tools can be traced
+    unconditionally. Spans opened inside a coroutine record wall time only.
+
+    Args:
+        name: Operation name (e.g. "gemini.analyze", "stage:render")
+        **attributes: Extra key/values recorded on the span
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+
+    current = Span(name, parent.trace_id, parent, attributes, measure_cpu=not _on_event_loop())
+    parent.add_child(current)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.finish()
+        _current.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Span]:
+    """
+    Open the root span of a new trace (one workflow run)
+
+    On exit the root span is flagged with exceeded_target_latency and, when
+    config.TRACE_EXPORT_PATH is set, exported in OTLP/JSON.
+    """
+    root = Span(name, secrets.token_hex(16), None, attributes)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        root.finish()
+        _current.reset(token)
+        root.attributes["exceeded_target_latency"] = root.wall_seconds > config.TARGET_LATENCY_SECONDS
+        if config.TRACE_EXPORT_PATH:
+            try:
+                export_otlp(root, config.TRACE_EXPORT_PATH)
+            except OSError as e:
+                print(f"⚠️ Could not export trace: {e}")
+
+
+def traced(name: str) -> Callable:
+    """Decorator running a sync or async function inside span(name)"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """Record a key/value on the current span (no-op outside a trace)"""
+    current = _current.get()
+    if current is not None:
+        current.attributes[key] = value
+
+
+def payload_bytes(*parts: Any) -> int:
+    """Approximate request size of model call parts (text, inline image data, file references)"""
+    total = 0
+    for part in parts:
+        if isinstance(part, str):
+            total += len(part.encode('utf-8'))
+        elif isinstance(part, (bytes, bytearray, memoryview)):
+            total += len(part)
+        elif isinstance(part, dict):
+            total += payload_bytes(*part.values())
+        elif isinstance(part, (list, tuple)):
+            total += payload_bytes(*part)
+        elif getattr(part, "inline_data", None) is not None:
+            total += len(part.inline_data.data or b"")
+        elif getattr(part, "file_data", None) is not None:
+            total += len(part.file_data.file_uri or "")
+        elif getattr(part, "text", None):
+            total += len(part.text.encode('utf-8'))
+        elif getattr(part, "parts", None):
+            total += payload_bytes(*part.parts)
+    return total
+
+
+def record_bytes(sent: int = 0, received: int = 0) -> None:
+    """Add request/response payload sizes to the current span (no-op outside a trace)"""
+    current = _current.get()
+    if current is not None:
+        with current._lock:
+            current.bytes_sent += sent
+            current.bytes_received += received
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(item: Span) -> Dict[str, Any]:
+    attributes = dict(item.attributes)
+    if item.cpu_seconds is not None:
+        attributes["cpu_seconds"] = round(item.cpu_seconds, 6)
+    attributes.update({
+        "bytes_sent": item.bytes_sent,
+        "bytes_received": item.bytes_received
+    })
+    data = {
+        "traceId": item.trace_id,
+        "spanId": item.span_id,
+        "name": item.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(item.start_ns),
+        "endTimeUnixNano": str(item.end_ns or item.start_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+        "status": {"code": 2, "message": item.error} if item.error else {"code": 1}
+    }
+    if item.parent is not None:
+        data["parentSpanId"] = item.parent.span_id
+    return data
+
+
+def to_otlp(root: Span) -> Dict[str, Any]:
+    """Trace as an OTLP/JSON ExportTraceServiceRequest"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": config.TRACE_SERVICE_NAME}}
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": "home_design.tracing"},
+                "spans": [_otlp_span(item) for item in root.walk()]
+            }]
+        }]
+    }
+
+
+_export_lock = threading.Lock()
+
+
+def export_otlp(root: Span, path: str) -> None:
+    """
+    Append a trace to a JSON Lines file (one ExportTraceServiceRequest per line)
+
+    The format is what the OpenTelemetry Collector's otlpjsonfile receiver reads.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    line = json.dumps(to_otlp(root))
+    with _export_lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
@@ -0,0 +1,200 @@
+"""
+Upload Store - Content-addressed storage for user photo uploads
+Each distinct photo is written once under its SHA-256, which is also the key
+the analysis and rendering caches use, so a re-upload is a cache hit end to end
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import config
+from tools.cache import hash_bytes
+from tools.image_prep import check_source_size
+from tools.previews import create_previews, remove_previews
+from tools.room_image import RoomImage
+from tools.storage import atomic_write
+
+_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "HEIF": ".heic", "GIF": ".gif"}
+
+
+class UploadStore:
+    """Deduplicating upload directory with size-capped LRU cleanup"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            directory: Where uploads are kept (defaults to config.UPLOAD_DIR)
+            max_bytes: Total size kept before the least recently used uploads are removed
+        """
+        self.directory = directory or config.UPLOAD_DIR
+        self.max_bytes = config.UPLOAD_STORE_MAX_BYTES if max_bytes is None else max_bytes
+        self.writes = 0
+        self.dedup_hits = 0
+        self.removed = 0
+        self._lock = threading.Lock()
+        self._cleanup_thread: Optional[threading.Thread] = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _find(self, upload_id: str) -> Optional[str]:
+        for ext in set(_EXTENSIONS.values()) | {""}:
+            path = os.path.join(self.directory, f"{upload_id}{ext}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, data: bytes, filename: str = "") -> str:
+        """
+        Store an upload, writing it only if this content is new
+
+        Args:
+            data: Uploaded file bytes
+            filename: Original file name (only used when the format can't be detected)
+
+        Returns:
+            Upload ID (SHA-256 of the content)
+
+        Raises:
+            DecodeLimitError: If the image exceeds config.MAX_SOURCE_PIXELS (checked from the header)
+        """
+        upload_id = hash_bytes(data)
+        room = RoomImage(data, content_hash=upload_id)
+        try:
+            header = room.format, room.size
+        except Exception:
+            header = None
+        if header:
+            check_source_size(header[1])
+
+        with self._lock:
+            existing = self._find(upload_id)
+            if existing:
+                # Refresh mtime so cleanup keeps photos that are still being used
+                os.utime(existing, None)
+                self.dedup_hits += 1
+                return upload_id
+
+            ext = _EXTENSIONS.get(header[0], "") if header else os.path.splitext(filename)[1].lower()
+
+            path = os.path.join(self.directory, f"{upload_id}{ext}")
+            # Atomic publish - readers never see a half-written upload
+            atomic_write(path, data)
+            self.writes += 1
+
+        try:
+            create_previews(path)
+        except Exception as e:
+            print(f"⚠️ Could not create upload previews: {e}")
+
+        return upload_id
+
+    def path(self, upload_id: str) -> Optional[str]:
+        """File path of an upload, or None if it was never stored or has been cleaned up"""
+        return self._find(upload_id)
+
+    def load(self, upload_id: str) -> RoomImage:
+        """
+        Read an upload as a RoomImage keyed by its upload ID
+
+        Raises:
+            FileNotFoundError: If the upload is not (or no longer) stored
+        """
+        path = self._find(upload_id)
+        if path is None:
+            raise FileNotFoundError(f"Upload {upload_id} not found in {self.directory}")
+        os.utime(path, None)
+        with open(path, 'rb') as f:
+            return RoomImage(f.read(), path=path, content_hash=upload_id)
+
+    def cleanup(self) -> int:
+        """
+        Remove least recently used uploads until the store fits in max_bytes
+
+        Returns:
+            Number of uploads removed
+        """
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if not os.path.isfile(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith('.tmp'):
+                    # Leftover from a crashed write
+                    if time.time() - st.st_mtime > 3600:
+                        os.remove(path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            while entries and total > self.max_bytes:
+                _, size, path = entries.pop(0)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                remove_previews(path)
+                total -= size
+                removed += 1
+
+            self.removed += removed
+            return removed
+
+    def start_cleanup(self, interval_seconds: Optional[float] = None) -> threading.Thread:
+        """Run cleanup() periodically in a daemon thread (idempotent)"""
+        interval = interval_seconds or config.UPLOAD_CLEANUP_INTERVAL_SECONDS
+
+        def _loop():
+            while True:
+                try:
+                    removed = self.cleanup()
+                    if removed:
+                        print(f"🧹 Upload store: removed {removed} old uploads")
+                except Exception as e:
+                    print(f"⚠️ Upload cleanup failed: {e}")
+                time.sleep(interval)
+
+        with self._lock:
+            if self._cleanup_thread is None:
+                self._cleanup_thread = threading.Thread(target=_loop, name="upload-cleanup", daemon=True)
+                self._cleanup_thread.start()
+            return self._cleanup_thread
+
+    def stats(self) -> Dict[str, Any]:
+        """Upload counts and disk usage"""
+        sizes = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.tmp') and os.path.isfile(path):
+                try:
+                    sizes.append(os.path.getsize(path))
+                except OSError:
+                    pass
+        return {
+            "uploads": len(sizes),
+            "bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+            "writes": self.writes,
+            "dedup_hits": self.dedup_hits,
+            "removed": self.removed
+        }
+
+
+_store: Optional[UploadStore] = None
+_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    """Return the process-wide upload store, starting its background cleanup on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = UploadStore()
+            _store.start_cleanup()
+        return _store